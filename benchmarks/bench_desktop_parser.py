@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Compares the configparser-based .desktop parsing the launcher used to do with
+the streaming Desktop Entry parser, on a synthetic corpus of heavily translated
+entries with several [Desktop Action ...] groups each.
+
+Both parsers must agree on the name, icon and exec of every entry.
+
+Usage:
+    python benchmarks/bench_desktop_parser.py [--entries 3000] [--translations 150] [--repeat 3]
+"""
+
+import argparse
+import configparser
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Allow running from the project root without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thunderstruck.modes.launcher_mode.desktop_entry import load_application_entries, locale_candidates
+
+
+def build_corpus(root, entries, translations):
+    """Writes entries .desktop files shaped like the ones shipped by large desktop apps."""
+    locales = [f"x{i}" for i in range(translations)]
+    paths = []
+    for i in range(entries):
+        lines = ["[Desktop Entry]", "Type=Application", "Version=1.0", f"Name=Application {i}"]
+        lines += [f"Name[{loc}]=Application {i} ({loc})" for loc in locales]
+        lines += [f"GenericName[{loc}]=Generic ({loc})" for loc in locales]
+        lines += [f"Comment[{loc}]=Does things in {loc}" for loc in locales]
+        lines += [f"Exec=app-{i} --new-window %U", f"Icon=app-{i}", "Keywords=tool;utility;", "Terminal=false"]
+        if i % 20 == 0:
+            lines.append("NoDisplay=true")
+        for action in range(4):
+            lines += ["", f"[Desktop Action action{action}]", f"Name=Action {action}"]
+            lines += [f"Name[{loc}]=Action {action} ({loc})" for loc in locales]
+            lines.append(f"Exec=app-{i} --action {action}")
+        path = os.path.join(root, f"app-{i}.desktop")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        paths.append(path)
+    return paths
+
+
+def configparser_entry(parser, filepath):
+    """The previous implementation, kept here as the baseline."""
+    parser.clear()
+    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
+        parser.read_file(f)
+    if not parser.has_section("Desktop Entry"):
+        return None
+    entry = parser["Desktop Entry"]
+    if entry.get("NoDisplay", "").lower() == "true" or entry.get("Hidden", "").lower() == "true":
+        return None
+    if entry.get("Type", "Application") != "Application":
+        return None
+    name, exec_cmd = entry.get("Name"), entry.get("Exec")
+    if name and exec_cmd:
+        return {"source": filepath, "name": name, "icon": entry.get("Icon"), "exec": exec_cmd}
+    return None
+
+
+def time_runs(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=3000)
+    parser.add_argument("--translations", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="thunderstruck-bench-")
+    try:
+        paths = build_corpus(root, args.entries, args.translations)
+        print(f"Synthetic corpus: {args.entries} entries, {args.translations} translations per key")
+
+        # The baseline does not resolve translations, compare against the unlocalized values
+        candidates = locale_candidates("C")
+        config = configparser.ConfigParser(interpolation=None, strict=False)
+        runs = {
+            "configparser": lambda: [configparser_entry(config, p) for p in paths],
+            "streaming": lambda: load_application_entries(paths, candidates),
+        }
+
+        results = {}
+        for label, func in runs.items():
+            timings, results[label] = time_runs(func, args.repeat)
+            print(f"{label:<26} median {statistics.median(timings):9.2f} ms   min {min(timings):9.2f} ms")
+
+        def displayed(entries):
+            keys = ("source", "name", "icon", "exec")
+            return [entry and {key: entry[key] for key in keys} for entry in entries]
+
+        baseline = displayed(results["configparser"])
+        for label, result in results.items():
+            result = displayed(result)
+            if result != baseline:
+                mismatches = sum(1 for a, b in zip(result, baseline) if a != b)
+                print(f"WARNING: {label} disagrees with configparser on {mismatches} entries")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
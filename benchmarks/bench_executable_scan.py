@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Compares the ripgrep-based executable indexing the launcher used to do with
+the in-process os.scandir scanner, on a synthetic PATH.
+
+Usage:
+    python benchmarks/bench_executable_scan.py [--binaries 5000] [--dirs 10] [--repeat 5]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Allow running from the project root without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thunderstruck.modes.launcher_mode.executables import scan_directories
+
+
+def build_path_tree(root, binaries, dirs):
+    """Creates dirs PATH directories holding binaries files, mostly executable."""
+    path_dirs = []
+    for d in range(dirs):
+        path_dir = os.path.join(root, f"bin{d}")
+        os.makedirs(path_dir)
+        path_dirs.append(path_dir)
+    for i in range(binaries):
+        path = os.path.join(path_dirs[i % dirs], f"tool-{i:05d}")
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\n")
+        # Every tenth file is a plain data file, like the odd README in /usr/bin
+        os.chmod(path, 0o644 if i % 10 == 0 else 0o755)
+    return path_dirs
+
+
+def rg_scan(path_dir):
+    """The previous implementation: one rg process per directory, then access() and isdir() per line."""
+    result = subprocess.run(
+        ["rg", "--files", "--no-ignore", "--hidden", "--max-depth", "1", path_dir],
+        capture_output=True, text=True, check=False, encoding="utf-8", errors="ignore",
+    )
+    executables = []
+    for line in result.stdout.strip().split("\n"):
+        path = line.strip()
+        if path.startswith(path_dir + os.sep) and os.access(path, os.X_OK) and not os.path.isdir(path):
+            executables.append(path)
+    return executables
+
+
+def time_runs(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--binaries", type=int, default=5000)
+    parser.add_argument("--dirs", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="thunderstruck-bench-")
+    try:
+        path_dirs = build_path_tree(root, args.binaries, args.dirs)
+        print(f"Synthetic PATH: {args.dirs} directories, {args.binaries} files")
+
+        runs = {
+            "scandir": lambda: [paths for _, paths in scan_directories(path_dirs)],
+        }
+        if shutil.which("rg"):
+            runs["ripgrep (per directory)"] = lambda: [rg_scan(d) for d in path_dirs]
+        else:
+            print("rg not found, skipping the ripgrep baseline")
+
+        counts = set()
+        for label, func in runs.items():
+            timings, result = time_runs(func, args.repeat)
+            found = sum(len(paths) for paths in result)
+            counts.add(found)
+            print(f"{label:<26} median {statistics.median(timings):8.2f} ms   "
+                  f"min {min(timings):8.2f} ms   ({found} executables)")
+        if len(counts) > 1:
+            print("WARNING: the scanners disagree on the number of executables")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
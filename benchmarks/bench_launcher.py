@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+End-to-end launcher benchmark on synthetic corpora.
+
+For every corpus size a tree of .desktop files and a set of PATH directories
+is generated (a fifth of the entries are applications, the rest executables),
+then the launcher's GTK-free indexing and search code is measured:
+
+  * desktop and executable indexing, cold (empty cache) and warm (cache hit)
+  * building the in-memory AppIndex and its memory per entry
+  * writing the index as a mapped index file, and mapping it again with the
+    time to the first search result, as on a start without changes
+  * precomputing the prefix tables, like the launcher does once indexing is done
+  * per-keystroke search latency while typing a set of queries (p50/p99)
+  * the time to spawn a launch plan and to prewarm one (resolving the
+    program's shared libraries and advising them), once, independent of the corpus
+
+Runs headless. Results are printed as a table and, with --json, written as
+JSON so they can be compared between releases.
+
+Usage:
+    python benchmarks/bench_launcher.py [--sizes 1000,10000,50000] [--json results.json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Allow running from the project root without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thunderstruck.modes.launcher_mode.app_index import AppIndex
+from thunderstruck.modes.launcher_mode.index_cache import LauncherIndexCache
+from thunderstruck.modes.launcher_mode.indexer import LauncherIndexer
+from thunderstruck.modes.launcher_mode.launch_plan import executable_launch_plan, spawn_plan
+from thunderstruck.modes.launcher_mode.mapped_index import open_index, write_index
+from thunderstruck.modes.launcher_mode.prewarm import advise_willneed, resolve_prewarm_files
+from thunderstruck.modes.launcher_mode.search import SearchEngine
+
+RESULTS_FORMAT_VERSION = 1
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ri", "so", "ta", "vu", "xe", "zo", "bra", "fel", "gor", "pix", "tron"]
+CATEGORIES = ["Editor", "Browser", "Player", "Viewer", "Manager", "Terminal", "Monitor", "Office", "Studio"]
+PATH_DIRS = 8
+TRANSLATIONS = 20
+
+
+def make_word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def build_corpus(root, entries, rng):
+    """Writes the synthetic applications directory and PATH directories. Returns (desktop_dirs, path_dirs, names)."""
+    desktop_dir = os.path.join(root, "applications")
+    os.makedirs(desktop_dir)
+    path_dirs = [os.path.join(root, f"bin{d}") for d in range(PATH_DIRS)]
+    for path_dir in path_dirs:
+        os.makedirs(path_dir)
+
+    apps = entries // 5
+    names = []
+    for i in range(apps):
+        name = f"{make_word(rng).capitalize()} {rng.choice(CATEGORIES)}"
+        names.append(name)
+        lines = ["[Desktop Entry]", "Type=Application", f"Name={name}"]
+        lines += [f"Name[l{t}]={name} {t}" for t in range(TRANSLATIONS)]
+        lines += [
+            f"GenericName={rng.choice(CATEGORIES)}",
+            f"Comment=Work with {make_word(rng)} and {make_word(rng)} files",
+            f"Keywords={make_word(rng)};{make_word(rng)};{make_word(rng)};",
+            f"Icon=app-{i % 300}",
+            f"Exec=/opt/app{i}/bin/run %U",
+            "",
+            "[Desktop Action new-window]",
+            "Name=New Window",
+            f"Exec=/opt/app{i}/bin/run --new-window",
+        ]
+        with open(os.path.join(desktop_dir, f"app{i:05d}.desktop"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    for i in range(entries - apps):
+        name = f"{make_word(rng)}-{i}"
+        names.append(name)
+        path = os.path.join(path_dirs[i % PATH_DIRS], name)
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\n")
+        os.chmod(path, 0o755)
+    return [desktop_dir], path_dirs, names
+
+
+def make_queries(names, rng, count):
+    """Picks queries a user could type: name prefixes, fuzzy abbreviations, field words and misses."""
+    queries = []
+    for _ in range(count):
+        name = rng.choice(names).lower()
+        kind = rng.randrange(4)
+        if kind == 0:
+            queries.append(name[:rng.randint(3, 8)])
+        elif kind == 1:
+            queries.append("".join(name[i] for i in sorted(rng.sample(range(len(name)), min(4, len(name))))))
+        elif kind == 2:
+            queries.append(rng.choice(CATEGORIES).lower())
+        else:
+            queries.append("qqzz" + name[:2])
+    return queries
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def run_indexing(indexer):
+    """Runs both indexers like the launcher does. Returns (desktop ms, executable ms, entries)."""
+    desktop_ms, desktop = timed(lambda: list(indexer.desktop_sections()))
+    known = [entry for _, entries in desktop for entry in entries]
+    exec_ms, executables = timed(lambda: list(indexer.executable_sections()))
+    entries = known + [entry for _, section in executables for entry in section]
+    return desktop_ms, exec_ms, entries
+
+
+def bench_size(size, args, rng):
+    root = tempfile.mkdtemp(prefix="thunderstruck-bench-")
+    try:
+        desktop_dirs, path_dirs, names = build_corpus(root, size, rng)
+        cache_path = os.path.join(root, "cache", "launcher-index.json")
+
+        # Cold: nothing cached yet, every file is listed and parsed
+        cache = LauncherIndexCache(path=cache_path)
+        indexer = LauncherIndexer(cache, (), desktop_dirs=desktop_dirs, search_path=path_dirs)
+        desktop_cold, exec_cold, entries = run_indexing(indexer)
+        cache.save()
+
+        # Warm: a new process loading the cache written above
+        warm_cache = LauncherIndexCache(path=cache_path)
+        load_ms, _ = timed(warm_cache.load)
+        warm_indexer = LauncherIndexer(warm_cache, (), desktop_dirs=desktop_dirs, search_path=path_dirs)
+        desktop_warm, exec_warm, _ = run_indexing(warm_indexer)
+
+        # Index build time and memory per entry
+        build_ms, index = timed(lambda: _build_index(entries))
+        gc.collect()
+        tracemalloc.start()
+        measured = _build_index(entries)
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del measured
+
+        # Mapped index: written once, then mapped and searched like a start without changes
+        mapped_path = os.path.join(root, "cache", "launcher-index.bin")
+        write_ms, _ = timed(lambda: write_index(mapped_path, index.snapshot(), {}))
+        open_ms, mapped = timed(lambda: open_index(mapped_path))
+        mapped_search_ms, _ = timed(lambda: SearchEngine(mapped).search(names[0][:4].lower(), args.limit))
+
+        # Typing: every query is entered one character at a time, like search-changed fires
+        engine = SearchEngine(index)
+        tables_ms, _ = timed(lambda: engine.build_prefix_tables(index.snapshot()))
+        latencies = []
+        for query in make_queries(names, rng, args.queries):
+            for end in range(1, len(query) + 1):
+                elapsed, _ = timed(lambda: engine.search(query[:end], args.limit))
+                latencies.append(elapsed)
+            engine.search("", args.limit) # Clearing the entry between queries
+
+        return {
+            "entries": len(entries),
+            "desktop_index_cold_ms": desktop_cold,
+            "desktop_index_warm_ms": desktop_warm,
+            "executable_index_cold_ms": exec_cold,
+            "executable_index_warm_ms": exec_warm,
+            "cache_load_ms": load_ms,
+            "index_build_ms": build_ms,
+            "memory_bytes_per_entry": memory / max(1, len(entries)),
+            "mapped_write_ms": write_ms,
+            "mapped_open_ms": open_ms,
+            "mapped_first_search_ms": mapped_search_ms,
+            "mapped_bytes_per_entry": os.path.getsize(mapped_path) / max(1, len(entries)),
+            "prefix_tables_ms": tables_ms,
+            "prefix_table_hits": engine.stats["table_hits"],
+            "keystrokes": len(latencies),
+            "keystroke_p50_ms": percentile(latencies, 0.50),
+            "keystroke_p99_ms": percentile(latencies, 0.99),
+            "keystroke_max_ms": max(latencies),
+        }
+    finally:
+        shutil.rmtree(root)
+
+
+def bench_spawn(repeat):
+    """Median time for spawn_plan() to return for a trivial program, in ms."""
+    plan = executable_launch_plan("true")
+    timings = []
+    for _ in range(repeat):
+        elapsed, pid = timed(lambda: spawn_plan(plan))
+        os.waitpid(pid, 0)
+        timings.append(elapsed)
+    return statistics.median(timings)
+
+
+def bench_prewarm(repeat):
+    """Median time to resolve and advise the files of the Python interpreter's plan, in ms, and their count."""
+    plan = executable_launch_plan(sys.executable)
+    timings = []
+    files = []
+    for _ in range(repeat):
+        elapsed, files = timed(lambda: resolve_prewarm_files(plan))
+        advise_ms, _ = timed(lambda: advise_willneed(files))
+        timings.append(elapsed + advise_ms)
+    return statistics.median(timings), len(files)
+
+
+def _build_index(entries):
+    index = AppIndex()
+    index.splice(0, 0, entries)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=50, help="Queries typed per corpus")
+    parser.add_argument("--limit", type=int, default=10, help="Results per search, like launcher-max-results")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="FILE", help="Write the results as JSON to FILE ('-' for stdout)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        result = bench_size(size, args, rng)
+        results.append(result)
+        print(
+            f"{result['entries']:>6} entries: "
+            f"desktop {result['desktop_index_cold_ms']:8.1f} / {result['desktop_index_warm_ms']:6.1f} ms   "
+            f"exec {result['executable_index_cold_ms']:7.1f} / {result['executable_index_warm_ms']:6.1f} ms   "
+            f"build {result['index_build_ms']:7.1f} ms   "
+            f"{result['memory_bytes_per_entry']:6.0f} B/entry   "
+            f"mapped open {result['mapped_open_ms']:5.2f} ms + search {result['mapped_first_search_ms']:6.1f} ms   "
+            f"tables {result['prefix_tables_ms']:7.1f} ms   "
+            f"keystroke p50 {result['keystroke_p50_ms']:6.2f} ms  p99 {result['keystroke_p99_ms']:6.2f} ms",
+            file=sys.stderr if args.json == "-" else sys.stdout,
+        )
+
+    spawn_ms = bench_spawn(20)
+    print(f"spawn_plan median {spawn_ms:.2f} ms", file=sys.stderr if args.json == "-" else sys.stdout)
+    prewarm_ms, prewarm_files = bench_prewarm(20)
+    print(f"prewarm median {prewarm_ms:.2f} ms ({prewarm_files} files)", file=sys.stderr if args.json == "-" else sys.stdout)
+
+    if args.json:
+        report = {
+            "format": RESULTS_FORMAT_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "queries": args.queries,
+            "limit": args.limit,
+            "spawn_ms": spawn_ms,
+            "prewarm_ms": prewarm_ms,
+            "prewarm_files": prewarm_files,
+            "results": results,
+        }
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
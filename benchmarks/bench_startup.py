@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Import-time report for application startup.
+
+Imports the modules Thunderstruck loads at startup in fresh interpreters
+running with -X importtime, and summarizes the output: the total import
+time, the self time per top-level package (gi, requests, google, ...) and
+the slowest single modules. Watched packages, like the AI provider SDKs
+that are only needed once AI Chat is used, are reported as imported or not.
+
+Usage:
+    python benchmarks/bench_startup.py [--module thunderstruck.mode_manager] [--repeat 5] [--json results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported by mode_manager at startup, and with it every mode
+DEFAULT_MODULE = "thunderstruck.mode_manager"
+# Packages that should not be imported at startup
+WATCHED_PACKAGES = ["requests", "urllib3", "vertexai", "google"]
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Parses -X importtime output.
+
+    Returns:
+        list: (module name, self us, cumulative us, nesting level) per imported module.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue # The header line
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        level = (len(name) - len(stripped) - 1) // 2
+        modules.append((stripped, int(fields[0]), int(fields[1]), level))
+    return modules
+
+
+def measure(module: str) -> list:
+    """Imports module in a new interpreter with -X importtime and returns the parsed report."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in [PROJECT_ROOT, env.get("PYTHONPATH")] if p)
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+    )
+    if process.returncode != 0:
+        errors = [line for line in process.stderr.splitlines() if not line.startswith("import time:")]
+        raise SystemExit(f"Importing {module} failed:\n" + "\n".join(errors[-10:]))
+    return parse_importtime(process.stderr)
+
+
+def summarize(runs: list, top: int) -> dict:
+    """Medians over the runs: total, per top-level package and per module, all in ms."""
+    totals = []
+    packages = {}
+    modules = {}
+    for run in runs:
+        totals.append(sum(cumulative for _, _, cumulative, level in run if level == 0) / 1000)
+        run_packages = {}
+        for name, self_us, _, _ in run:
+            package = name.split(".", 1)[0]
+            run_packages[package] = run_packages.get(package, 0) + self_us
+            modules.setdefault(name, []).append(self_us / 1000)
+        for package, self_us in run_packages.items():
+            packages.setdefault(package, []).append(self_us / 1000)
+
+    package_ms = {package: statistics.median(values) for package, values in packages.items()}
+    module_ms = {name: statistics.median(values) for name, values in modules.items()}
+    imported = {name.split(".", 1)[0] for name in modules}
+    return {
+        "total_ms": statistics.median(totals),
+        "modules_imported": len(modules),
+        "packages": dict(sorted(package_ms.items(), key=lambda item: -item[1])[:top]),
+        "slowest_modules": dict(sorted(module_ms.items(), key=lambda item: -item[1])[:top]),
+        "watched": {package: package in imported for package in WATCHED_PACKAGES},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default=DEFAULT_MODULE, help="Module imported at startup")
+    parser.add_argument("--repeat", type=int, default=5, help="Interpreters started, medians are reported")
+    parser.add_argument("--top", type=int, default=15, help="Packages and modules listed")
+    parser.add_argument("--json", metavar="FILE", help="Write the results as JSON to FILE ('-' for stdout)")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    summary = summarize(runs, args.top)
+    out = sys.stderr if args.json == "-" else sys.stdout
+    print(f"import {args.module}: {summary['total_ms']:.1f} ms, {summary['modules_imported']} modules "
+          f"(median of {args.repeat})", file=out)
+    print("self time by package:", file=out)
+    for package, ms in summary["packages"].items():
+        print(f"  {package:<32}{ms:8.1f} ms", file=out)
+    print("slowest modules:", file=out)
+    for name, ms in summary["slowest_modules"].items():
+        print(f"  {name:<48}{ms:8.1f} ms", file=out)
+    for package, imported in summary["watched"].items():
+        print(f"{package}: {'imported at startup' if imported else 'not imported'}", file=out)
+
+    if args.json:
+        report = dict(summary, module=args.module, repeat=args.repeat,
+                      python=platform.python_version(), platform=platform.platform())
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""Tests of the Desktop Entry parser against the freedesktop.org Desktop Entry spec."""
+
+import pytest
+
+from thunderstruck.modes.launcher_mode.desktop_entry import (
+    current_desktops, load_application_entry, locale_candidates, parse_desktop_entry,
+    read_desktop_entry, shown_in, split_list, unescape_value
+)
+from thunderstruck.modes.launcher_mode.token_index import (
+    FIELD_GENERIC_NAME, FIELD_KEYWORDS, FIELD_NAME, entry_field_tokens
+)
+
+
+def write_entry(tmp_path, text, name="app.desktop"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+# --- Escapes ---
+
+@pytest.mark.parametrize("raw, expected", [
+    (r"a\sb", "a b"),
+    (r"a\nb", "a\nb"),
+    (r"a\tb", "a\tb"),
+    (r"a\rb", "a\rb"),
+    (r"a\\b", "a\\b"),
+    (r"a\\sb", "a\\sb"), # An escaped backslash does not start another escape
+    (r"a\;b", r"a\;b"), # \; only means something in lists
+    (r"a\qb", r"a\qb"), # Unknown escapes are kept
+    ("trailing\\", "trailing\\"),
+    ("plain", "plain"),
+])
+def test_unescape_value(raw, expected):
+    assert unescape_value(raw) == expected
+
+
+# --- Lists ---
+
+@pytest.mark.parametrize("raw, expected", [
+    ("a;b;c;", ["a", "b", "c"]),
+    ("a;b;c", ["a", "b", "c"]), # The trailing separator is optional
+    (r"a\;b;c;", ["a;b", "c"]),
+    (r"a\\;b;", ["a\\", "b"]), # An escaped backslash before the separator
+    (r"one\stwo;three;", ["one two", "three"]),
+    ("a;;b;", ["a", "b"]),
+    ("", []),
+])
+def test_split_list(raw, expected):
+    assert split_list(raw) == expected
+
+
+# --- Locale matching ---
+
+@pytest.mark.parametrize("locale, expected", [
+    ("sr_RS.UTF-8@latin", ("sr_RS@latin", "sr_RS", "sr@latin", "sr")),
+    ("de_DE.UTF-8", ("de_DE", "de")),
+    ("sr@latin", ("sr@latin", "sr")),
+    ("fr", ("fr",)),
+    ("C", ()),
+    ("POSIX", ()),
+    ("", ()),
+])
+def test_locale_candidates(locale, expected):
+    assert locale_candidates(locale) == expected
+
+
+TRANSLATED_NAME = [
+    "[Desktop Entry]",
+    "Name[sr]=lang",
+    "Name[sr@latin]=lang@MODIFIER",
+    "Name[sr_RS]=lang_COUNTRY",
+    "Name[sr_RS@latin]=lang_COUNTRY@MODIFIER",
+    "Name=unlocalized",
+]
+
+
+@pytest.mark.parametrize("locale, expected", [
+    ("sr_RS.UTF-8@latin", "lang_COUNTRY@MODIFIER"),
+    ("sr_RS.UTF-8", "lang_COUNTRY"),
+    ("sr_ME@latin", "lang@MODIFIER"),
+    ("sr_ME", "lang"),
+    ("de_DE", "unlocalized"),
+    ("C", "unlocalized"),
+])
+def test_localized_key_fallback(locale, expected):
+    assert parse_desktop_entry(TRANSLATED_NAME, locale_candidates(locale))["Name"] == expected
+
+
+def test_localized_key_order_in_file_does_not_matter():
+    lines = ["[Desktop Entry]"] + TRANSLATED_NAME[:0:-1] # Same keys, best match first
+    assert parse_desktop_entry(lines, locale_candidates("sr_RS@latin"))["Name"] == "lang_COUNTRY@MODIFIER"
+    assert parse_desktop_entry(lines, locale_candidates("sr_ME"))["Name"] == "lang"
+
+
+def test_localized_key_without_unlocalized_value():
+    values = parse_desktop_entry(["[Desktop Entry]", "Comment[de]=Kommentar"], locale_candidates("de_DE"))
+    assert values["Comment"] == "Kommentar"
+
+
+# --- Groups, comments and blank lines ---
+
+def test_parsing_stops_at_next_group():
+    values = parse_desktop_entry([
+        "[Desktop Entry]",
+        "Name=App",
+        "[Desktop Action new-window]",
+        "Name=New Window",
+        "Exec=app --new-window",
+    ])
+    assert values == {"Name": "App"}
+
+
+def test_groups_before_desktop_entry_are_skipped():
+    values = parse_desktop_entry([
+        "[X-Other Group]",
+        "Name=Other",
+        "[Desktop Entry]",
+        "Name=App",
+    ])
+    assert values == {"Name": "App"}
+
+
+def test_missing_desktop_entry_group():
+    assert parse_desktop_entry(["[Desktop Action new-window]", "Name=New Window"]) is None
+    assert parse_desktop_entry(["Name=App"]) is None
+
+
+def test_comments_and_blank_lines_are_ignored():
+    values = parse_desktop_entry([
+        "# A comment before the group",
+        "",
+        "[Desktop Entry]",
+        "# Name=Commented out",
+        "",
+        "Name=App",
+        "Not a key-value pair",
+        "Exec = app",
+    ])
+    assert values == {"Name": "App", "Exec": "app"}
+
+
+def test_values_are_returned_raw():
+    values = parse_desktop_entry(["[Desktop Entry]", r"Keywords=a\;b;c;", r"Comment=one\stwo"])
+    assert values["Keywords"] == r"a\;b;c;"
+    assert values["Comment"] == r"one\stwo"
+
+
+def test_read_desktop_entry_stops_at_next_group(tmp_path):
+    path = write_entry(tmp_path, (
+        "# Comment\n"
+        "\n"
+        "[Desktop Entry]\n"
+        "Name=App\n"
+        "Exec=app\n"
+        "\n"
+        "[Desktop Action new-window]\n"
+        "Name=New Window\n"
+        "Exec=app --new-window\n"
+    ))
+    assert read_desktop_entry(path) == {"Name": "App", "Exec": "app"}
+
+
+def test_read_desktop_entry_ignores_group_name_inside_values(tmp_path):
+    path = write_entry(tmp_path, (
+        "[Desktop Entry]\n"
+        "Comment=Not a group: [Desktop Entry]\n"
+        "Name=App\n"
+    ))
+    assert read_desktop_entry(path)["Name"] == "App"
+
+
+# --- Launcher entries ---
+
+MINIMAL = "[Desktop Entry]\nType=Application\nName=App\nExec=/usr/bin/app %U\n"
+
+
+def test_load_application_entry(tmp_path):
+    path = write_entry(tmp_path, MINIMAL + "Icon=app.png\nKeywords=one\\stwo;three;\nComment=Line\\nbreak\n")
+    entry = load_application_entry(path)
+    assert entry["source"] == path
+    assert entry["name"] == "App"
+    assert entry["icon"] == "app"
+    assert entry["keywords"] == ["one two", "three"]
+    assert entry["comment"] == "Line\nbreak"
+    assert "only_show_in" not in entry and "not_show_in" not in entry
+
+
+def test_load_application_entry_unescapes_name(tmp_path):
+    path = write_entry(tmp_path, "[Desktop Entry]\nName=Two\\sWords\\\\\nExec=app\n")
+    assert load_application_entry(path)["name"] == "Two Words\\"
+
+
+@pytest.mark.parametrize("extra", [
+    "Hidden=true\n",
+    "NoDisplay=true\n",
+    "NoDisplay=True\n",
+])
+def test_hidden_entries_are_not_listed(tmp_path, extra):
+    assert load_application_entry(write_entry(tmp_path, MINIMAL + extra)) is None
+
+
+@pytest.mark.parametrize("extra", [
+    "Hidden=false\n",
+    "NoDisplay=false\n",
+])
+def test_explicitly_visible_entries_are_listed(tmp_path, extra):
+    assert load_application_entry(write_entry(tmp_path, MINIMAL + extra)) is not None
+
+
+def test_hidden_key_of_an_action_group_is_ignored(tmp_path):
+    path = write_entry(tmp_path, MINIMAL + "[Desktop Action new]\nName=New\nExec=app\nNoDisplay=true\n")
+    assert load_application_entry(path) is not None
+
+
+@pytest.mark.parametrize("text", [
+    "[Desktop Entry]\nType=Link\nName=App\nURL=https://example.org\n",
+    "[Desktop Entry]\nType=Application\nExec=app\n",
+    "[Desktop Entry]\nType=Application\nName=App\n",
+    "[Desktop Action new]\nName=App\nExec=app\n",
+])
+def test_incomplete_or_other_entries_are_not_listed(tmp_path, text):
+    assert load_application_entry(write_entry(tmp_path, text)) is None
+
+
+def test_missing_file_is_not_listed(tmp_path):
+    assert load_application_entry(str(tmp_path / "missing.desktop")) is None
+
+
+# --- OnlyShowIn / NotShowIn ---
+
+@pytest.mark.parametrize("value, expected", [
+    ("ubuntu:GNOME", ("ubuntu", "GNOME")),
+    ("KDE", ("KDE",)),
+    ("", ()),
+])
+def test_current_desktops(value, expected):
+    assert current_desktops(value) == expected
+
+
+def test_current_desktops_from_environment(monkeypatch):
+    monkeypatch.setenv("XDG_CURRENT_DESKTOP", "ubuntu:GNOME")
+    assert current_desktops() == ("ubuntu", "GNOME")
+    monkeypatch.delenv("XDG_CURRENT_DESKTOP")
+    assert current_desktops() == ()
+
+
+@pytest.mark.parametrize("extra, desktops, expected", [
+    ("", ("GNOME",), True),
+    ("", (), True),
+    ("OnlyShowIn=GNOME;XFCE;\n", ("GNOME",), True),
+    ("OnlyShowIn=GNOME;XFCE;\n", ("ubuntu", "GNOME"), True),
+    ("OnlyShowIn=GNOME;XFCE;\n", ("KDE",), False),
+    ("OnlyShowIn=GNOME;\n", ("gnome",), False), # Case-sensitive
+    ("OnlyShowIn=GNOME;\n", (), False),
+    ("NotShowIn=KDE;\n", ("KDE",), False),
+    ("NotShowIn=KDE;\n", ("GNOME", "KDE"), False),
+    ("NotShowIn=KDE;\n", ("GNOME",), True),
+    ("NotShowIn=KDE;\n", (), True),
+])
+def test_shown_in(tmp_path, extra, desktops, expected):
+    entry = load_application_entry(write_entry(tmp_path, MINIMAL + extra))
+    assert shown_in(entry, desktops) is expected
+
+
+# --- Untranslated values ---
+
+def test_replaced_unlocalized_value_is_kept():
+    values = parse_desktop_entry([
+        "[Desktop Entry]",
+        "Name=Files",
+        "Name[de]=Dateien",
+        "Comment=Same",
+        "Comment[de]=Same",
+    ], locale_candidates("de_DE"))
+    assert values["Name"] == "Dateien"
+    assert values["Name[]"] == "Files"
+    assert "Comment[]" not in values # Nothing was replaced
+
+
+def test_untranslated_words_stay_searchable(tmp_path):
+    path = write_entry(tmp_path, (
+        "[Desktop Entry]\nType=Application\nExec=nautilus\n"
+        "Name=Files\nName[de]=Dateien\n"
+        "GenericName=File Manager\nGenericName[de]=Dateiverwaltung\n"
+        "Keywords=folder;explorer;\nKeywords[de]=Ordner;\n"
+    ))
+    entry = load_application_entry(path, locale_candidates("de_DE.UTF-8"))
+    assert entry["name"] == "Dateien"
+    assert entry["unlocalized"] == {"name": "Files", "generic_name": "File Manager", "keywords": ["folder", "explorer"]}
+
+    tokens = entry_field_tokens(entry)
+    assert tokens["dateien"] & FIELD_NAME
+    assert tokens["files"] & FIELD_NAME
+    assert tokens["manager"] & FIELD_GENERIC_NAME
+    assert tokens["ordner"] & FIELD_KEYWORDS and tokens["folder"] & FIELD_KEYWORDS
+
+
+def test_unlocalized_entry_has_no_untranslated_values(tmp_path):
+    assert "unlocalized" not in load_application_entry(write_entry(tmp_path, MINIMAL), locale_candidates("de_DE"))
@@ -45,9 +45,37 @@ class WelcomeWindow(Adw.Window):
         else:
             print("Warning: status_label not found during __init__.")
 
+        # Show launcher indexing progress below the status label
+        self._indexing_status = None
+        self._indexing_handler_id = None
+        self.index_label = Gtk.Label(halign=Gtk.Align.CENTER)
+        self.index_label.add_css_class("caption")
+        if self.status_label and self.status_label.get_parent():
+            self.status_label.get_parent().append(self.index_label)
+        self._connect_indexing_status()
+
         # Start the animation sequence shortly after initialization
         GLib.idle_add(self._start_animation_sequence)
 
+    def _connect_indexing_status(self):
+        """Follows the launcher's 'indexing-progress' signal, if the Launcher mode is loaded."""
+        mode_manager = getattr(self.application, "mode_manager", None)
+        launcher_mode = mode_manager.get_mode_by_name("Launcher") if mode_manager else None
+        status = getattr(launcher_mode, "indexing_status", None)
+        if status is None:
+            self.index_label.set_visible(False)
+            return
+        self._indexing_status = status
+        self._on_indexing_progress(status, status.indexed, status.finished)
+        self._indexing_handler_id = status.connect("indexing-progress", self._on_indexing_progress)
+
+    def _on_indexing_progress(self, status, indexed, finished):
+        """Updates the index label with the launcher indexing progress."""
+        if finished:
+            self.index_label.set_label(f"Indexed {indexed} applications and commands")
+        else:
+            self.index_label.set_label(f"Indexing applications and commands... ({indexed})")
+
     def _start_animation_sequence(self):
         """Starts the initial animation timeout."""
         if self._animation_timeout_id:
@@ -118,6 +146,9 @@ class WelcomeWindow(Adw.Window):
     def _on_fade_out_done(self, animation):
         """Called when the fade-out animation completes."""
         print("Fade-out complete. Closing Welcome, Showing Main.")
+        if self._indexing_handler_id is not None:
+            self._indexing_status.disconnect(self._indexing_handler_id)
+            self._indexing_handler_id = None
         if self.application:
             self.application.show_main_window()
         self.close()
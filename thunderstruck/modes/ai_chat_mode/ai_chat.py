@@ -3,23 +3,30 @@ gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 from gi.repository import Gtk, Adw, GObject, GLib, Gio
 
+import importlib.util
+import json
 import os
 import threading
-import requests # Dependency: Add 'requests' to requirements.txt
-try:
-    # Dependency: Add 'google-cloud-aiplatform' to requirements.txt
-    import vertexai
-    from vertexai.generative_models import GenerativeModel # Or specific model class
-    from google.api_core import exceptions as google_exceptions
-    # ADC is preferred, but attempting to use API key if provided
-    # from google.oauth2 import service_account # For service account keys
-    # from google.auth.transport.requests import Request # For explicit key usage (complex)
-    VERTEX_AI_AVAILABLE = True
-except ImportError:
-    VERTEX_AI_AVAILABLE = False
-    print("Vertex AI SDK not found. Install google-cloud-aiplatform.")
+import time
 
 from thunderstruck.modes.base_mode import BaseMode
+from thunderstruck.modes.ai_chat_mode.request_executor import RequestExecutor
+
+
+def module_available(name: str) -> bool:
+    """Checks that a top-level module can be imported, without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+# The provider SDKs are heavy (the Google Cloud SDK alone takes hundreds of ms to import),
+# so they are only imported on first use, off the GTK thread; see AiChatMode.prepare_providers().
+# Dependency: Add 'google-cloud-aiplatform' to requirements.txt
+VERTEX_AI_AVAILABLE = module_available("vertexai")
+if not VERTEX_AI_AVAILABLE:
+    print("Vertex AI SDK not found. Install google-cloud-aiplatform.")
 # Import APP_ID from the main script where it's defined
 # Use try-except for potential circular import issues during initialization,
 # though it should be fine here. A better approach might be a dedicated config module.
@@ -35,11 +42,134 @@ except ImportError:
 # Define placeholder constants (replace with actual values or config)
 openrouter_API_URL = "https://openrouter.ai/api/v1/chat/completions" # Example URL
 openrouter_MODEL = "mistralai/mistral-7b-instruct:free" # Example model
-VERTEX_PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT") # Or get from config/settings
-VERTEX_LOCATION = os.environ.get("GOOGLE_CLOUD_LOCATION", "us-central1") # Or get from config/settings
+VERTEX_DEFAULT_LOCATION = "us-central1"
 VERTEX_MODEL_NAME = "gemini-1.5-flash-001" # Example model
 
 
+def vertex_target() -> tuple:
+    """
+    Returns the (project, location, model name) Vertex AI prompts go to.
+    Read from the environment on every call, so a changed environment is noticed.
+    """
+    project = os.environ.get("GOOGLE_CLOUD_PROJECT") # Or get from config/settings
+    location = os.environ.get("GOOGLE_CLOUD_LOCATION", VERTEX_DEFAULT_LOCATION) # Or get from config/settings
+    return project, location, VERTEX_MODEL_NAME
+
+
+# Streamed text is handed to the GTK thread at most once per frame (60 Hz)
+STREAM_FLUSH_MS = 16
+
+
+def iter_sse_data(lines):
+    """
+    Yields the data of each server-sent event from an iterable of decoded lines.
+
+    Comment lines (e.g. OpenRouter's ': OPENROUTER PROCESSING' keep-alives)
+    and fields other than 'data' are skipped; multi-line data is joined with
+    newlines, as the SSE spec says.
+    """
+    data = []
+    for line in lines:
+        if not line: # A blank line ends the event
+            if data:
+                yield "\n".join(data)
+                data = []
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if field == "data":
+            data.append(value[1:] if value.startswith(" ") else value)
+    if data:
+        yield "\n".join(data)
+
+
+class StreamingReply:
+    """
+    Carries a streamed AI response from the API worker thread to the GTK thread.
+
+    The worker append()s text deltas as they arrive and calls finish() once.
+    Deltas are buffered and delivered in batches, at most one per
+    STREAM_FLUSH_MS, so a fast stream does not flood the main loop with one
+    idle callback per token. on_text(text) and on_finished(full_text, error)
+    are called on the GTK thread, on_finished after the last text.
+
+    The reply is also the request's cancellation token: after cancel(),
+    nothing more is delivered, and the worker stops at its next check of
+    'cancelled'.
+    """
+
+    def __init__(self, on_text, on_finished):
+        self.on_text = on_text
+        self.on_finished = on_finished
+        self.started_at = time.monotonic()
+        self.first_text_at = None
+        self._lock = threading.Lock()
+        self._pending = []
+        self._received = []
+        self._finished = False
+        self._error = None
+        self._flush_scheduled = False
+        self.cancelled = False
+
+    def cancel(self):
+        """Drops the rest of the response: later text and the outcome are not delivered."""
+        with self._lock:
+            self.cancelled = True
+            self._pending = []
+
+    def append(self, text: str):
+        """Adds a text delta (worker thread)."""
+        if not text:
+            return
+        with self._lock:
+            if self.cancelled:
+                return
+            if self.first_text_at is None:
+                self.first_text_at = time.monotonic()
+            self._pending.append(text)
+            self._received.append(text)
+            self._schedule_flush()
+
+    @property
+    def text(self) -> str:
+        """All text received so far."""
+        with self._lock:
+            return "".join(self._received)
+
+    def finish(self, error_message: str = None):
+        """Ends the response, with an error message if it failed (worker thread)."""
+        with self._lock:
+            if self.cancelled:
+                return
+            self._finished = True
+            self._error = error_message
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        # Called with the lock held
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            GLib.timeout_add(STREAM_FLUSH_MS, self._flush)
+
+    def _flush(self):
+        with self._lock:
+            text = "".join(self._pending)
+            self._pending = []
+            finished = self._finished
+            self._flush_scheduled = False
+            if self.cancelled: # Stale, e.g. stopped or superseded by a new prompt
+                return GLib.SOURCE_REMOVE
+        if text:
+            self.on_text(text)
+        if finished:
+            if self.first_text_at is not None: # Time to first token is the latency the user perceives
+                print(f"AI response: first text after {(self.first_text_at - self.started_at) * 1000:.0f} ms, "
+                      f"complete after {(time.monotonic() - self.started_at) * 1000:.0f} ms")
+            self.on_finished(self.text, self._error)
+        return GLib.SOURCE_REMOVE
+
+
 # Helper function to create a message label
 def create_message_label(text: str, is_user: bool, is_error: bool = False) -> Gtk.Box:
     # Use a Box to hold the label and allow for potential icons later
@@ -79,6 +209,17 @@ class AiChatWidget(Gtk.Box):
         super().__init__()
         self.mode_handler: AiChatMode = mode_handler # Reference to AiChatMode instance
         self.message_entry.connect("apply", self._on_message_send)
+        # Shown again (e.g. the window was opened): get the provider connection ready
+        self.connect("map", lambda widget: self.mode_handler.prepare_providers())
+        # Hidden: a response nobody sees is stopped
+        self.connect("unmap", lambda widget: self.mode_handler.cancel_request())
+        # Stops the response being received. The template has no place for it, it goes below the spinner.
+        self.stop_button = Gtk.Button(label="Stop", halign=Gtk.Align.CENTER, visible=False)
+        self.stop_button.connect("clicked", lambda button: self.mode_handler.cancel_request())
+        self.insert_child_after(self.stop_button, self.spinner)
+        # Label of the AI message that is being streamed, and its text so far
+        self._live_label: Gtk.Label | None = None
+        self._live_text = ""
 
     def _on_message_send(self, entry: Adw.EntryRow):
         prompt = entry.get_text().strip()
@@ -86,12 +227,11 @@ class AiChatWidget(Gtk.Box):
             entry.set_text("")
             self.add_message(prompt, is_user=True)
             self.show_loading(True)
-            # Decide which API to call (e.g., based on config or a dropdown later)
-            # For now, let's default to Vertex AI if available, else openrouter
-            if VERTEX_AI_AVAILABLE and self.mode_handler._vertex_api_key:
+            api_target = self.mode_handler.preferred_api_target()
+            if api_target == 'vertex':
                  print("Sending to Vertex AI...")
                  self.mode_handler.send_prompt(prompt, api_target='vertex')
-            elif self.mode_handler._openrouter_api_key:
+            elif api_target == 'openrouter':
                  print("Sending to openrouter...")
                  self.mode_handler.send_prompt(prompt, api_target='openrouter')
             else:
@@ -102,6 +242,28 @@ class AiChatWidget(Gtk.Box):
     def add_message(self, text: str, is_user: bool, is_error: bool = False):
         message_widget = create_message_label(text, is_user, is_error)
         self.chat_box.append(message_widget)
+        self._scroll_to_end()
+
+    def append_ai_text(self, text: str):
+        """Appends streamed text to the AI message being received, creating it with the first text."""
+        if self._live_label is None:
+            message_widget = create_message_label("", is_user=False)
+            self._live_label = message_widget.get_first_child()
+            self._live_text = ""
+            self.chat_box.append(message_widget)
+            if self.spinner: # The answer itself shows progress now, the entry stays disabled
+                self.spinner.stop()
+                self.spinner.set_visible(False)
+        self._live_text += text
+        self._live_label.set_text(self._live_text.strip())
+        self._scroll_to_end()
+
+    def end_ai_message(self):
+        """Ends the streamed AI message; the next text starts a new one."""
+        self._live_label = None
+        self._live_text = ""
+
+    def _scroll_to_end(self):
         # Try to scroll down (best effort)
         # Getting the scrolled window requires knowing the parent structure.
         # If this widget is directly inside a ScrolledWindow:
@@ -119,6 +281,7 @@ class AiChatWidget(Gtk.Box):
                 self.spinner.start()
             else:
                 self.spinner.stop()
+        self.stop_button.set_visible(show)
         self.message_entry.set_sensitive(not show) # Disable entry while loading
 
 
@@ -129,6 +292,8 @@ class AiChatMode(BaseMode):
     SETTINGS_SCHEMA = APP_ID # Use the main app ID
     VERTEX_API_KEY_SETTING = "vertex-ai-api-key"
     openrouter_API_KEY_SETTING = "openrouter-api-key"
+    STREAMING_SETTING = "ai-chat-streaming"
+    PREWARM_SETTING = "ai-chat-prewarm"
 
     def __init__(self):
         super().__init__()
@@ -136,13 +301,30 @@ class AiChatMode(BaseMode):
         self._settings: Gio.Settings | None = None
         self._vertex_api_key: str | None = None
         self._openrouter_api_key: str | None = None
+        self._streaming = True # Show responses as they are generated
+        self._prewarm = True # Connect to the provider when the mode is shown
+        # Pooled keep-alive client, built for the current key on first use
+        self._openrouter_client = None # providers.OpenRouterClient
+        # Client -> number of worker calls using it; a replaced client is closed when it drops to 0
+        self._client_users = {}
+        self._client_lock = threading.Lock()
+        # Initialized Vertex AI model (providers.VertexModelCache), built in the background on first activation
+        self._vertex_models = None
+        # Provider calls run on a few worker threads; the reply of the prompt in progress cancels it
+        self._executor = RequestExecutor()
+        self._current_reply: StreamingReply | None = None
+        self._preparing = False
 
         try:
             self._settings = Gio.Settings.new(self.SETTINGS_SCHEMA)
             self._load_api_keys()
+            self._streaming = self._settings.get_boolean(self.STREAMING_SETTING)
+            self._prewarm = self._settings.get_boolean(self.PREWARM_SETTING)
             # Connect to changes (optional but good practice)
             self._settings.connect(f"changed::{self.VERTEX_API_KEY_SETTING}", self._on_setting_changed)
             self._settings.connect(f"changed::{self.openrouter_API_KEY_SETTING}", self._on_setting_changed)
+            self._settings.connect(f"changed::{self.STREAMING_SETTING}", self._on_streaming_changed)
+            self._settings.connect(f"changed::{self.PREWARM_SETTING}", self._on_prewarm_changed)
         except GLib.Error as e:
             print(f"Error loading GSettings schema '{self.SETTINGS_SCHEMA}': {e}")
             self._settings = None # Ensure it's None if schema fails
@@ -159,8 +341,108 @@ class AiChatMode(BaseMode):
 
     def _on_setting_changed(self, settings, key):
         print(f"Setting changed: {key}")
+        openrouter_api_key = self._openrouter_api_key
+        vertex_api_key = self._vertex_api_key
         self._load_api_keys()
+        if self._vertex_api_key != vertex_api_key and self._vertex_models is not None:
+            self._vertex_models.invalidate()
         # Potentially notify the user or re-validate state if needed
+        if self._openrouter_api_key != openrouter_api_key:
+            # The pooled client sends the old key, the next prompt builds a new one.
+            # A prompt still streaming on it keeps it open until it releases it.
+            with self._client_lock:
+                client = self._openrouter_client
+                self._openrouter_client = None
+                if client is not None and not self._client_users.get(client):
+                    client.close()
+
+    def _on_prewarm_changed(self, settings, key):
+        self._prewarm = settings.get_boolean(key)
+
+    def _acquire_openrouter_client(self):
+        """
+        Returns the pooled OpenRouter client for the current key, None without
+        a key. The first call imports requests, so it belongs on a worker thread.
+        A returned client must be handed back with _release_openrouter_client().
+        """
+        with self._client_lock:
+            if self._openrouter_client is None and self._openrouter_api_key:
+                from thunderstruck.modes.ai_chat_mode.providers import OpenRouterClient
+                self._openrouter_client = OpenRouterClient(self._openrouter_api_key, openrouter_API_URL)
+            client = self._openrouter_client
+            if client is not None:
+                self._client_users[client] = self._client_users.get(client, 0) + 1
+            return client
+
+    def _release_openrouter_client(self, client):
+        """Ends a use of client, closing it if it was replaced and nothing else uses it."""
+        with self._client_lock:
+            users = self._client_users.get(client, 0) - 1
+            if users > 0:
+                self._client_users[client] = users
+                return
+            self._client_users.pop(client, None)
+            if client is not self._openrouter_client:
+                client.close()
+
+    def _get_vertex_models(self):
+        """Returns the VertexModelCache; importing it is cheap, it imports the SDK when building a model."""
+        with self._client_lock:
+            if self._vertex_models is None:
+                from thunderstruck.modes.ai_chat_mode.providers import VertexModelCache
+                self._vertex_models = VertexModelCache()
+            return self._vertex_models
+
+    def preferred_api_target(self) -> str | None:
+        """Returns the provider prompts are sent to: 'vertex', 'openrouter' or None without a key."""
+        # Decide which API to call (e.g., based on config or a dropdown later)
+        # For now, let's default to Vertex AI if available, else openrouter
+        if VERTEX_AI_AVAILABLE and self._vertex_api_key:
+            return 'vertex'
+        if self._openrouter_api_key:
+            return 'openrouter'
+        return None
+
+    def prepare_providers(self):
+        """
+        Gets the provider of the next prompt ready on a background thread:
+        imports its SDK, initializes Vertex AI and, if enabled, opens the
+        connection to OpenRouter.
+        """
+        api_target = self.preferred_api_target()
+        if self._preparing or api_target is None:
+            return
+        # Set before submitting: the worker may finish, and clear it, before submit() returns
+        self._preparing = True
+        if not self._executor.submit(None, self._prepare_worker, api_target):
+            self._preparing = False
+
+    def _prepare_worker(self, api_target: str):
+        start_time = time.monotonic()
+        try:
+            if api_target == 'vertex':
+                project, location, model_name = vertex_target()
+                if project:
+                    # Vertex AI setup is kept off the first prompt's critical path
+                    self._get_vertex_models().get(project, location, model_name)
+            elif api_target == 'openrouter':
+                client = self._acquire_openrouter_client()
+                if client:
+                    try:
+                        if self._prewarm:
+                            client.prewarm()
+                    finally:
+                        self._release_openrouter_client(client)
+        except Exception as e: # Reported again by the prompt that needs it
+            print(f"Preparing {api_target} failed: {e}")
+            return
+        finally:
+            self._preparing = False
+        print(f"AI provider {api_target} prepared in {(time.monotonic() - start_time) * 1000:.0f} ms")
+
+    def _on_streaming_changed(self, settings, key):
+        self._streaming = settings.get_boolean(key)
+        print(f"AI Chat streaming {'enabled' if self._streaming else 'disabled'}")
 
     @property
     def name(self) -> str:
@@ -171,6 +453,14 @@ class AiChatMode(BaseMode):
         # Using 'chat-symbolic' as a placeholder icon
         return 'chat-symbolic' # Or 'dialog-question-symbolic'
 
+    def activate(self):
+        """Called when the mode becomes active."""
+        self.prepare_providers()
+
+    def deactivate(self):
+        """Called when the mode becomes inactive; stops the response in progress."""
+        self.cancel_request()
+
     def get_widget(self) -> Gtk.Widget:
         if self._widget is None:
             # Build the UI from the template, passing self (AiChatMode instance)
@@ -179,12 +469,38 @@ class AiChatMode(BaseMode):
 
     # --- API Call Handling ---
     def send_prompt(self, prompt: str, api_target: str):
-        """Starts the API call in a separate thread."""
-        thread = threading.Thread(target=self._api_worker, args=(prompt, api_target), daemon=True)
-        thread.start()
+        """Starts the API call on a worker thread, superseding the prompt in progress."""
+        if self._current_reply is not None:
+            self._current_reply.cancel() # Its response would be stale
+            if self._widget:
+                self._widget.end_ai_message()
+        reply = StreamingReply(self._handle_stream_text, self._handle_stream_finished)
+        self._current_reply = reply
+        if not self._executor.submit(reply, self._api_worker, prompt, api_target, reply, self._streaming):
+            reply.finish("Error: Too many AI requests in progress.")
+
+    def cancel_request(self):
+        """Stops the prompt in progress, if any; what it still returns is dropped."""
+        reply = self._current_reply
+        if reply is None:
+            return
+        self._current_reply = None
+        reply.cancel()
+        print("AI request cancelled.")
+        if self._widget:
+            self._widget.end_ai_message()
+            self._widget.show_loading(False)
+
+    def _api_worker(self, prompt: str, api_target: str, reply: StreamingReply, stream: bool = True):
+        """
+        Worker function executed in a separate thread.
 
-    def _api_worker(self, prompt: str, api_target: str):
-        """Worker function executed in a separate thread."""
+        Args:
+            prompt: The user's message.
+            api_target: 'vertex' or 'openrouter'.
+            reply: Receives the response text (in deltas when streaming) and the outcome.
+            stream: Request the response as a stream of deltas instead of in one piece.
+        """
         api_key = None
         response_text = None
         error_message = None
@@ -196,25 +512,36 @@ class AiChatMode(BaseMode):
                     error_message = "Error: Vertex AI API key not configured."
                 elif not VERTEX_AI_AVAILABLE:
                      error_message = "Error: google-cloud-aiplatform library not installed."
-                elif not VERTEX_PROJECT_ID:
+                elif not vertex_target()[0]:
                      error_message = "Error: GOOGLE_CLOUD_PROJECT environment variable not set."
                 else:
                     # --- Vertex AI Call ---
-                    print(f"Calling Vertex AI (Project: {VERTEX_PROJECT_ID}, Location: {VERTEX_LOCATION})")
+                    project, location, model_name = vertex_target()
+                    print(f"Calling Vertex AI (Project: {project}, Location: {location})")
                     # Note: Using API key directly with client library is non-standard.
                     # ADC (gcloud auth application-default login) is preferred.
                     # This implementation attempts it but might require adjustments
                     # depending on how Vertex AI auth handles keys for this specific API.
                     # Consider setting GOOGLE_API_KEY env var if client supports it,
                     # or using specific credentials object if init allows.
+                    from google.api_core import exceptions as google_exceptions
                     try:
                         # os.environ['GOOGLE_API_KEY'] = api_key # Might work for some APIs? Unreliable.
-                        # Initialize client (might implicitly use ADC or GOOGLE_API_KEY if set)
-                        vertexai.init(project=VERTEX_PROJECT_ID, location=VERTEX_LOCATION)
-                        model = GenerativeModel(VERTEX_MODEL_NAME)
-                        response = model.generate_content(prompt)
-                        response_text = response.text
-                        print("Vertex AI call successful.")
+                        # Initialized once per (project, location, model), reused by every prompt
+                        model = self._get_vertex_models().get(project, location, model_name)
+                        if stream:
+                            for chunk in model.generate_content(prompt, stream=True):
+                                if reply.cancelled:
+                                    break # Closing the generator ends the stream
+                                try:
+                                    reply.append(chunk.text)
+                                except ValueError:
+                                    pass # A chunk without text, e.g. only the finish reason
+                            response_text = reply.text
+                        else:
+                            response_text = model.generate_content(prompt).text
+                            reply.append(response_text)
+                        print("Vertex AI request cancelled." if reply.cancelled else "Vertex AI call successful.")
                     except google_exceptions.PermissionDenied as e:
                         print(f"Vertex AI Permission Denied: {e}")
                         error_message = "Error: Vertex AI permission denied. Check API key or ADC setup."
@@ -223,36 +550,43 @@ class AiChatMode(BaseMode):
                         error_message = f"Error calling Vertex AI: {e}"
 
             elif api_target == 'openrouter':
-                api_key = self._openrouter_api_key
-                if not api_key:
+                import requests # Dependency: Add 'requests' to requirements.txt
+                client = self._acquire_openrouter_client()
+                if not client:
                     error_message = "Error: openrouter API key not configured."
                 else:
                     # --- openrouter Call ---
                     print(f"Calling openrouter API (Model: {openrouter_MODEL})")
-                    headers = {
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json"
-                    }
                     # Basic payload structure - adjust based on actual API spec
                     payload = {
                         "model": openrouter_MODEL,
-                        "messages": [{"role": "user", "content": prompt}]
+                        "messages": [{"role": "user", "content": prompt}],
+                        "stream": stream,
                     }
                     try:
-                        response = requests.post(openrouter_API_URL, headers=headers, json=payload, timeout=30)
-                        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-                        # Extract response - adjust based on actual API spec
-                        # Assuming OpenAI-like structure
-                        data = response.json()
-                        if data.get("choices") and len(data["choices"]) > 0:
-                            message = data["choices"][0].get("message")
-                            if message and message.get("content"):
-                                response_text = message["content"].strip()
-                                print("openrouter call successful.")
+                        # With stream, the timeout applies to every read, not to the whole answer.
+                        # Closing the fully read response returns its connection to the pool.
+                        with client.post_chat(payload, stream=stream, timeout=30) as response:
+                            response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+                            if stream:
+                                response_text, error_message = self._read_openrouter_stream(response, reply)
                             else:
-                                error_message = "Error: Unexpected response format from openrouter."
-                        else:
-                            error_message = "Error: No response choices found from openrouter."
+                                # Extract response - adjust based on actual API spec
+                                # Assuming OpenAI-like structure
+                                data = response.json()
+                                if data.get("choices") and len(data["choices"]) > 0:
+                                    message = data["choices"][0].get("message")
+                                    if message and message.get("content"):
+                                        response_text = message["content"].strip()
+                                        reply.append(response_text)
+                                    else:
+                                        error_message = "Error: Unexpected response format from openrouter."
+                                else:
+                                    error_message = "Error: No response choices found from openrouter."
+                        if reply.cancelled:
+                            print("openrouter request cancelled.")
+                        elif response_text and not error_message:
+                            print("openrouter call successful.")
                     except requests.exceptions.HTTPError as e:
                          print(f"openrouter HTTP Error: {e.response.status_code} - {e.response.text}")
                          if e.response.status_code == 401:
@@ -267,25 +601,80 @@ class AiChatMode(BaseMode):
                     except Exception as e:
                         print(f"openrouter General Error: {e}")
                         error_message = f"Error processing openrouter request: {e}"
+                    finally:
+                        self._release_openrouter_client(client)
 
             else:
                 error_message = f"Error: Unknown API target '{api_target}'"
 
         finally:
-            # Schedule UI update on the main thread
-            if error_message:
-                GLib.idle_add(self._handle_api_response, error_message, True)
-            elif response_text:
-                GLib.idle_add(self._handle_api_response, response_text, False)
-            else:
+            # The reply hands the outcome to the main thread after the last text
+            if not error_message and not response_text:
                 # Should not happen unless logic error above, but handle defensively
-                GLib.idle_add(self._handle_api_response, "Error: Unknown API failure.", True)
+                error_message = "Error: Unknown API failure."
+            reply.finish(error_message)
+
+    @staticmethod
+    def _read_openrouter_stream(response, reply: StreamingReply):
+        """
+        Reads an OpenRouter server-sent event stream into reply.
+
+        Returns:
+            tuple: (full response text, error message or None)
+        """
+        response.encoding = "utf-8" # SSE is always UTF-8, whatever the headers say
+        # chunk_size=None hands over data as it arrives instead of waiting for full blocks
+        done = False
+        for data in iter_sse_data(response.iter_lines(chunk_size=None, decode_unicode=True)):
+            if reply.cancelled:
+                # Stop reading; closing the unread response drops its connection instead of pooling it
+                return reply.text, None
+            # After [DONE] the stream is read to its end, so the connection can be reused
+            if done or data == "[DONE]":
+                done = True
+                continue
+            try:
+                event = json.loads(data)
+            except ValueError:
+                print(f"openrouter: Ignoring malformed stream event: {data[:100]}")
+                continue
+            if event.get("error"): # Errors after the stream started arrive as events
+                message = event["error"].get("message", "unknown error")
+                return reply.text, f"Error: openrouter stream failed: {message}"
+            choices = event.get("choices") or [{}]
+            reply.append((choices[0].get("delta") or {}).get("content") or "")
+        text = reply.text
+        if not text.strip():
+            return None, "Error: No response choices found from openrouter."
+        return text, None
+
+    def _handle_stream_text(self, text: str):
+        """Shows streamed response text on the main GTK thread."""
+        if self._widget:
+            self._widget.append_ai_text(text)
+
+    def _handle_stream_finished(self, text: str, error_message: str | None):
+        """Ends a response on the main GTK thread, after its last text was shown."""
+        self._current_reply = None
+        if self._widget:
+            self._widget.end_ai_message()
+        if error_message:
+            self._handle_api_response(error_message, True)
+        else:
+            self._handle_api_response(text, False, shown=True)
 
+    def _handle_api_response(self, text: str, is_error: bool, shown: bool = False):
+        """
+        Handles the API response on the main GTK thread.
 
-    def _handle_api_response(self, text: str, is_error: bool):
-        """Handles the API response on the main GTK thread."""
+        Args:
+            text: The response, or the error message.
+            is_error: text is an error message.
+            shown: text was already streamed into the chat, only the loading state ends.
+        """
         print(f"API response received (is_error={is_error}): {text[:100]}...") # Log truncated response
         if self._widget:
             self._widget.show_loading(False)
-            self._widget.add_message(text, is_user=False, is_error=is_error)
+            if not shown:
+                self._widget.add_message(text, is_user=False, is_error=is_error)
         return GLib.SOURCE_REMOVE # Ensure idle_add runs only once
\ No newline at end of file
@@ -0,0 +1,132 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connections kept open per host; one prompt runs at a time, a few spare cover prewarms and overlaps
+POOL_SIZE = 4
+# Timeout of a prewarm request, which only exists to open the connection
+PREWARM_TIMEOUT = 5
+# A connection prewarmed this recently is assumed to still be open; servers close idle ones after about a minute
+PREWARM_INTERVAL_S = 30
+
+
+class OpenRouterClient:
+    """
+    Long-lived HTTP client for the OpenRouter API.
+
+    Wraps a requests.Session, so the TCP connection and TLS session to
+    openrouter.ai are kept alive in a small pool and reused by every prompt,
+    instead of being set up again for each one. The API key is sent with
+    every request; a client is built for one key and replaced when it changes.
+
+    prewarm() opens the connection ahead of the first prompt; like the
+    requests themselves, it blocks and belongs on a worker thread.
+    """
+
+    def __init__(self, api_key: str, api_url: str):
+        """
+        Args:
+            api_key: The OpenRouter API key.
+            api_url: The chat completions endpoint.
+        """
+        self.api_url = api_url
+        self.session = requests.Session()
+        # No automatic retries: a failed prompt is reported, not silently sent twice
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+        self._last_used = 0.0 # time.monotonic() of the last request or prewarm
+
+    def post_chat(self, payload: dict, stream: bool = False, timeout: float = 30):
+        """
+        Sends a chat completion request on a pooled connection.
+
+        Returns:
+            requests.Response: Not yet read when stream is True; the connection
+                               returns to the pool once the body was consumed.
+
+        Raises:
+            requests.exceptions.RequestException: On network errors.
+        """
+        self._last_used = time.monotonic()
+        return self.session.post(self.api_url, json=payload, timeout=timeout, stream=stream)
+
+    def prewarm(self):
+        """Opens a pooled connection (DNS, TCP and TLS), unless one was used recently."""
+        if time.monotonic() - self._last_used < PREWARM_INTERVAL_S:
+            return
+        self._last_used = time.monotonic()
+        start_time = time.monotonic()
+        try:
+            # Any answer will do (the endpoint only accepts POST), it leaves the connection in the pool
+            self.session.head(self.api_url, timeout=PREWARM_TIMEOUT)
+            print(f"OpenRouter connection prewarmed in {(time.monotonic() - start_time) * 1000:.0f} ms")
+        except requests.exceptions.RequestException as e:
+            print(f"OpenRouter connection prewarm failed: {e}")
+
+    def close(self):
+        """Closes the pooled connections."""
+        self.session.close()
+
+
+class VertexModelCache:
+    """
+    Keeps an initialized Vertex AI model for the (project, location, model)
+    prompts are sent to.
+
+    Setting up Vertex AI (credential discovery, vertexai.init(), creating the
+    GenerativeModel) happens once instead of on every prompt. get() builds the
+    model on first use, or again when the tuple differs from the cached one,
+    e.g. because the environment changed; invalidate() drops it, e.g. when the
+    key setting changed. The SDK is only imported by the first build, which
+    AiChatMode runs on a background thread when the mode is activated.
+
+    Requires the google-cloud-aiplatform package; the caller checks it is installed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock() # Held while building, so a prompt waits for a build in the background
+        self._key = None # (project, location, model name) of self._model
+        self._model = None
+
+    def get(self, project: str, location: str, model_name: str):
+        """
+        Returns the GenerativeModel for the tuple, initializing Vertex AI if needed.
+
+        Raises:
+            Exception: Whatever vertexai or google.auth raise while initializing.
+        """
+        key = (project, location, model_name)
+        with self._lock:
+            if self._key != key or self._model is None:
+                self._model = None
+                self._model = self._create(project, location, model_name)
+                self._key = key
+            return self._model
+
+    @staticmethod
+    def _create(project, location, model_name):
+        import google.auth
+        import vertexai
+        from vertexai.generative_models import GenerativeModel
+
+        start_time = time.monotonic()
+        # Application Default Credentials are looked up once here, instead of by every new client
+        credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+        vertexai.init(project=project, location=location, credentials=credentials)
+        model = GenerativeModel(model_name)
+        print(f"Vertex AI initialized for {model_name} in {project}/{location} "
+              f"in {(time.monotonic() - start_time) * 1000:.0f} ms")
+        return model
+
+    def invalidate(self):
+        """Drops the cached model; the next get() initializes Vertex AI again."""
+        with self._lock:
+            self._key = None
+            self._model = None
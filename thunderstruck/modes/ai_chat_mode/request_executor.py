@@ -0,0 +1,64 @@
+import queue
+import threading
+
+# Provider calls running at once: a prompt, plus preparing a provider in the background
+MAX_WORKERS = 2
+# Calls waiting for a worker; more are refused instead of piling up
+MAX_QUEUED = 4
+
+
+class RequestExecutor:
+    """
+    Runs AI provider calls on a fixed number of worker threads.
+
+    Unlike a thread per call, at most MAX_WORKERS calls hold a thread and a
+    connection at any time, and at most MAX_QUEUED wait for one. Calls are
+    submitted with a cancellation token (any object with a 'cancelled'
+    attribute, e.g. a StreamingReply); a call whose token was cancelled while
+    it was queued is skipped. A running call checks the token itself.
+
+    The workers are daemon threads, so a request still waiting for the
+    network does not keep the application from exiting.
+    """
+
+    def __init__(self, workers: int = MAX_WORKERS, max_queued: int = MAX_QUEUED):
+        self._workers = workers
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, token, func, *args) -> bool:
+        """
+        Queues func(*args) for a worker thread.
+
+        Args:
+            token: Cancellation token checked before the call starts, or None.
+
+        Returns:
+            bool: False if the queue is full and the call was not queued.
+        """
+        self._start_workers()
+        try:
+            self._queue.put_nowait((token, func, args))
+        except queue.Full:
+            print("AI request queue is full, request refused.")
+            return False
+        return True
+
+    def _start_workers(self):
+        # Started on first use, the mode may never send a prompt
+        with self._lock:
+            while len(self._threads) < self._workers:
+                thread = threading.Thread(target=self._worker, name=f"ai-chat-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _worker(self):
+        while True:
+            token, func, args = self._queue.get()
+            if token is not None and token.cancelled:
+                continue # Cancelled while queued
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"AI request failed unexpectedly: {e}")
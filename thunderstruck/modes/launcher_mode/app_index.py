@@ -0,0 +1,190 @@
+import sys
+
+from thunderstruck.modes.launcher_mode.search import KEY_SEPARATOR, normalize
+from thunderstruck.modes.launcher_mode.token_index import TokenIndex, entry_field_tokens
+
+
+class AppIndex:
+    """
+    Launcher entries stored column-wise in parallel lists.
+
+    Row i is described by sources[i], names[i], icons[i], execs[i] and
+    plans[i], the parsed launch plan of desktop entries (None for plain
+    executables, which are run by path). No per-row object is kept, and icon
+    names, which repeat across thousands of rows, are interned, so a row
+    costs a few list slots plus its strings.
+    search_keys[i] holds the precomputed normalized name (casefolded, without
+    diacritics) used for matching. version changes on every modification.
+
+    Every row also gets an id that stays stable while rows around it move.
+    The words of Name, GenericName, Keywords and Comment are kept in a
+    TokenIndex under that id; a snapshot() maps ids back to rows.
+
+    adopt() serves the rows of a MappedIndex (see mapped_index.py) instead:
+    the columns are then read straight from the mapped file, and are only
+    turned into lists by the first splice().
+    """
+
+    def __init__(self):
+        self.sources = []
+        self.names = []
+        self.icons = []
+        self.execs = []
+        self.plans = []
+        self.search_keys = []
+        self.ids = []
+        self.tokens = TokenIndex()
+        self._entry_tokens = {} # id -> the token dict the entry was indexed with
+        self._next_id = 0
+        self._snapshot = None # Built lazily after a modification
+        self._mapped = None # The adopted MappedIndex, until the first splice()
+        self.version = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def adopt(self, mapped):
+        """Replaces all rows with those of a MappedIndex, without copying them."""
+        self._mapped = mapped
+        self.sources = mapped.sources
+        self.names = mapped.names
+        self.icons = mapped.icons
+        self.execs = mapped.execs
+        self.plans = mapped.plans
+        self.search_keys = mapped.search_keys
+        self.ids = mapped.ids
+        self.tokens = mapped.tokens
+        self._entry_tokens = None
+        self._next_id = len(mapped)
+        self.version += 1
+        mapped.version = self.version
+        self._snapshot = mapped
+
+    def _detach(self, keep_rows: bool):
+        """Turns the columns of an adopted MappedIndex into lists, so they can be modified."""
+        mapped = self._mapped
+        self._mapped = None
+        self.tokens = TokenIndex()
+        self._entry_tokens = {}
+        if not keep_rows:
+            self.sources, self.names, self.icons, self.execs = [], [], [], []
+            self.plans, self.search_keys, self.ids = [], [], []
+            return
+        self.sources = list(mapped.sources)
+        self.names = list(mapped.names)
+        self.icons = [sys.intern(icon) if icon else None for icon in mapped.icons]
+        self.execs = list(mapped.execs)
+        self.plans = list(mapped.plans)
+        self.search_keys = list(mapped.search_keys)
+        self.ids = list(mapped.ids) # Mapped ids are rows
+        self._entry_tokens = {entry_id: {} for entry_id in self.ids}
+        for token, items in mapped.tokens.postings():
+            for entry_id, mask in items:
+                self._entry_tokens[entry_id][token] = mask
+        for entry_id, tokens in self._entry_tokens.items():
+            self.tokens.add(entry_id, tokens)
+
+    def splice(self, position: int, removed: int, entries: list):
+        """Replaces removed rows at position with the given entry dicts."""
+        if self._mapped is not None:
+            # Replacing every row, as a full re-index does, needs no copy of the old ones
+            self._detach(keep_rows=position > 0 or removed < len(self))
+        end = position + removed
+        for entry_id in self.ids[position:end]:
+            self.tokens.remove(entry_id, self._entry_tokens.pop(entry_id))
+        new_ids = list(range(self._next_id, self._next_id + len(entries)))
+        self._next_id += len(entries)
+        for entry_id, entry in zip(new_ids, entries):
+            tokens = entry_field_tokens(entry)
+            self._entry_tokens[entry_id] = tokens
+            self.tokens.add(entry_id, tokens)
+        self.ids[position:end] = new_ids
+        self.sources[position:end] = [entry["source"] for entry in entries]
+        self.names[position:end] = [entry["name"] for entry in entries]
+        self.icons[position:end] = [sys.intern(entry["icon"]) if entry["icon"] else None for entry in entries]
+        self.execs[position:end] = [entry["exec"] for entry in entries]
+        self.plans[position:end] = [entry.get("plan") for entry in entries]
+        self.search_keys[position:end] = [normalize(entry["name"]) for entry in entries]
+        self._snapshot = None
+        self.version += 1
+
+    def entry(self, row: int) -> dict:
+        """Returns the fields of a row as an entry dict."""
+        return {
+            "source": self.sources[row],
+            "name": self.names[row],
+            "icon": self.icons[row],
+            "exec": self.execs[row],
+            "plan": self.plans[row],
+        }
+
+    def snapshot(self):
+        """
+        Returns an immutable AppIndexSnapshot of the current rows.
+
+        Must be called on the thread that modifies the index; the snapshot can
+        then be searched from any thread. It is reused until the next splice.
+        """
+        if self._snapshot is None:
+            self._snapshot = AppIndexSnapshot(self)
+        return self._snapshot
+
+    @property
+    def mapped(self):
+        """The adopted MappedIndex while the rows are served from it, else None."""
+        return self._mapped
+
+
+class AppIndexSnapshot:
+    """
+    Frozen copy of the columns of an AppIndex at one version.
+
+    The columns are tuples, so searching a snapshot on a worker thread is not
+    affected by rows spliced in meanwhile. The TokenIndex is shared with the
+    live index and not copied: tokens_version records its version, and once
+    it moved on, its postings may lack entries of the snapshot or hold newer
+    ones, so SearchEngine does not use it for this snapshot any more.
+    """
+
+    def __init__(self, index: AppIndex):
+        self.version = index.version
+        self.sources = tuple(index.sources)
+        self.names = tuple(index.names)
+        self.icons = tuple(index.icons)
+        self.execs = tuple(index.execs)
+        self.plans = tuple(index.plans)
+        self.search_keys = tuple(index.search_keys)
+        self.ids = tuple(index.ids)
+        self.tokens = index.tokens
+        self.tokens_version = index.tokens.version
+        self._rows_by_id = None
+        self._rows_by_source = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def row_of(self, entry_id: int):
+        """Returns the row of an entry id in this snapshot, or None if it is not part of it."""
+        if self._rows_by_id is None:
+            self._rows_by_id = {entry_id: row for row, entry_id in enumerate(self.ids)}
+        return self._rows_by_id.get(entry_id)
+
+    def row_of_source(self, source: str):
+        """Returns the row of the entry with the given source, or None."""
+        if self._rows_by_source is None:
+            self._rows_by_source = {source: row for row, source in enumerate(self.sources)}
+        return self._rows_by_source.get(source)
+
+    def joined_keys(self):
+        """
+        Returns the search keys joined by KEY_SEPARATOR, with the offset each key starts at.
+
+        Returns:
+            tuple: (joined string, list of start offsets in row order).
+        """
+        starts = []
+        offset = 0
+        for key in self.search_keys:
+            starts.append(offset)
+            offset += len(key) + 1
+        return KEY_SEPARATOR.join(self.search_keys), starts
@@ -0,0 +1,115 @@
+import logging
+import time
+
+from thunderstruck.modes.launcher_mode.app_index import AppIndex
+from thunderstruck.modes.launcher_mode.desktop_entry import locale_candidates
+from thunderstruck.modes.launcher_mode.index_cache import LauncherIndexCache
+from thunderstruck.modes.launcher_mode.indexer import LauncherIndexer
+from thunderstruck.modes.launcher_mode.mapped_index import default_index_path, open_index, write_index
+from thunderstruck.modes.launcher_mode.search import SearchEngine
+
+
+class LauncherCore:
+    """
+    The launcher backend, without GTK: the index, its on-disk caches and the
+    search engine.
+
+    LauncherMode drives it from its indexing threads and the GTK main loop,
+    the thunderstruck-index command uses it directly. sections(), open_mapped()
+    and the save methods may run on a worker thread; self.index must only be
+    modified on the thread that owns it.
+    """
+
+    def __init__(self, usage=None, cache_path: str = None, mapped_path: str = None,
+                 desktop_dirs: list = None, search_path: list = None, locale: str = None):
+        """
+        Args:
+            usage: A UsageStore for frecency ranking, or None.
+            cache_path: The JSON entry cache, default_cache_path() if None.
+            mapped_path: The mapped index file, default_index_path() if None.
+            desktop_dirs: Applications directories, default_desktop_dirs() if None.
+            search_path: Directories to scan for executables, $PATH if None.
+            locale: Locale localized keys are resolved for, the environment's if None.
+        """
+        self.candidates = locale_candidates(locale)
+        self.cache = LauncherIndexCache(path=cache_path, locale=";".join(self.candidates))
+        self.indexer = LauncherIndexer(self.cache, self.candidates, desktop_dirs, search_path)
+        self.mapped_path = mapped_path or default_index_path()
+        self.index = AppIndex()
+        self.usage = usage
+        self.engine = SearchEngine(self.index, usage)
+        # Indexer fingerprint of the last sections() pass, stored with the mapped index
+        self.fingerprint = None
+        # Milliseconds spent in each stage, e.g. 'desktop_ms', of the latest run of that stage
+        self.timings = {}
+        self._cache_loaded = False
+
+    @property
+    def watch_dirs(self) -> list:
+        """Every directory visited by the last sections() pass."""
+        return self.indexer.watch_dirs
+
+    def open_mapped(self):
+        """
+        Maps the index file written by an earlier run, if nothing changed since.
+
+        Returns:
+            MappedIndex | None: None if the file is missing, unreadable or out of date.
+        """
+        start_time = time.perf_counter()
+        mapped = open_index(self.mapped_path)
+        if mapped is not None and not self.indexer.is_current(mapped.metadata.get("fingerprint", {})):
+            logging.info("Mapped launcher index is out of date, indexing again.")
+            mapped = None
+        self.timings["map_ms"] = (time.perf_counter() - start_time) * 1000
+        return mapped
+
+    def load_cache(self):
+        """Loads the on-disk entry cache, once."""
+        if not self._cache_loaded:
+            start_time = time.perf_counter()
+            self.cache.load()
+            self._cache_loaded = True
+            self.timings["cache_load_ms"] = (time.perf_counter() - start_time) * 1000
+
+    def sections(self, cold: bool = False, changed_paths=()):
+        """
+        Runs the indexers through the entry cache and yields their
+        (directory, entries) sections in store order.
+
+        Once the pass is complete, self.watch_dirs and self.fingerprint describe it.
+
+        Args:
+            cold: Ignore the stored entry cache, so every directory is scanned and parsed.
+            changed_paths: Files reported as changed, e.g. by a file monitor;
+                           they are read again whatever the cache recorded for them.
+        """
+        if cold:
+            self._cache_loaded = True
+        self.load_cache()
+        self.cache.invalidate(changed_paths)
+        yield from self.indexer.sections()
+        self.fingerprint = self.indexer.fingerprint()
+        self.timings.update(self.indexer.timings)
+
+    def save_cache(self):
+        """Writes the entry cache if the last pass changed it."""
+        start_time = time.perf_counter()
+        self.cache.save()
+        self.timings["cache_save_ms"] = (time.perf_counter() - start_time) * 1000
+
+    def save_mapped(self, snapshot, still_valid=None) -> bool:
+        """
+        Writes a snapshot of the index as the mapped index file, with the
+        fingerprint of the last pass; see mapped_index.write_index().
+
+        Returns:
+            bool: True if the file was written.
+        """
+        if self.fingerprint is None:
+            return False # Nothing was indexed, the snapshot cannot be checked later
+        metadata = {"fingerprint": self.fingerprint, "timings": dict(self.timings)}
+        start_time = time.perf_counter()
+        written = write_index(self.mapped_path, snapshot, metadata, still_valid)
+        self.timings["mapped_write_ms"] = (time.perf_counter() - start_time) * 1000
+        return written
@@ -0,0 +1,292 @@
+import logging
+import os
+
+from thunderstruck.modes.launcher_mode.launch_plan import desktop_launch_plan
+
+DESKTOP_ENTRY_GROUP = "[Desktop Entry]"
+
+# Escape sequences allowed in string values by the Desktop Entry spec
+_ESCAPES = {'s': ' ', 'n': '\n', 't': '\t', 'r': '\r', '\\': '\\'}
+
+# Image file extensions some Icon= values carry although the spec asks for bare names
+ICON_FILE_EXTENSIONS = ('.png', '.svg', '.xpm')
+
+
+def locale_candidates(locale: str = None) -> tuple:
+    """
+    Returns the locale suffixes to look up for localized keys, best match first.
+
+    Follows the Desktop Entry spec matching order for lang_COUNTRY.ENCODING@MODIFIER:
+    lang_COUNTRY@MODIFIER, lang_COUNTRY, lang@MODIFIER, lang.
+    """
+    if locale is None:
+        locale = os.environ.get("LC_ALL") or os.environ.get("LC_MESSAGES") or os.environ.get("LANG") or ""
+    locale, _, modifier = locale.partition('@')
+    locale = locale.partition('.')[0] # The encoding is ignored for matching
+    lang, _, country = locale.partition('_')
+    if not lang or lang in ("C", "POSIX"):
+        return ()
+
+    candidates = []
+    if country and modifier:
+        candidates.append(f"{lang}_{country}@{modifier}")
+    if country:
+        candidates.append(f"{lang}_{country}")
+    if modifier:
+        candidates.append(f"{lang}@{modifier}")
+    candidates.append(lang)
+    return tuple(candidates)
+
+
+def current_desktops(value: str = None) -> tuple:
+    """
+    Returns the names of the running desktop environment, e.g. ('ubuntu', 'GNOME'),
+    from the colon-separated $XDG_CURRENT_DESKTOP.
+    """
+    if value is None:
+        value = os.environ.get("XDG_CURRENT_DESKTOP", "")
+    return tuple(name for name in value.split(':') if name)
+
+
+def shown_in(entry: dict, desktops: tuple) -> bool:
+    """
+    Tells whether an entry from load_application_entry() is shown in the
+    desktop environment named by desktops (see current_desktops()), following
+    its OnlyShowIn and NotShowIn keys. Names are compared case-sensitively.
+    """
+    only_show_in = entry.get("only_show_in")
+    if only_show_in is not None and not any(desktop in only_show_in for desktop in desktops):
+        return False
+    not_show_in = entry.get("not_show_in")
+    return not (not_show_in and any(desktop in not_show_in for desktop in desktops))
+
+
+def unescape_value(value: str) -> str:
+    """Expands the \\s, \\n, \\t, \\r and \\\\ escapes of a string value."""
+    if '\\' not in value:
+        return value
+    result = []
+    i = 0
+    length = len(value)
+    while i < length:
+        char = value[i]
+        if char == '\\' and i + 1 < length:
+            escaped = value[i + 1]
+            if escaped in _ESCAPES:
+                result.append(_ESCAPES[escaped])
+                i += 2
+                continue
+        result.append(char)
+        i += 1
+    return ''.join(result)
+
+
+def split_list(value: str) -> list:
+    """
+    Splits a ';'-separated (locale)string list, honouring the \\; escape.
+
+    Expects the raw value, before unescape_value() was applied.
+    """
+    items = []
+    current = []
+    i = 0
+    length = len(value)
+    while i < length:
+        char = value[i]
+        if char == '\\' and i + 1 < length:
+            if value[i + 1] == ';':
+                current.append(';')
+            else:
+                current.append(value[i:i + 2])
+            i += 2
+            continue
+        if char == ';':
+            items.append(unescape_value(''.join(current)))
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    if current:
+        items.append(unescape_value(''.join(current)))
+    return [item for item in items if item]
+
+
+def parse_desktop_entry(lines, candidates: tuple = ()) -> dict:
+    """
+    Parses the [Desktop Entry] group from an iterable of lines (without line endings).
+
+    Parsing stops at the first group header after [Desktop Entry], so
+    [Desktop Action ...] groups are never looked at. Localized keys are only
+    kept when they match one of candidates, and the best match replaces the
+    unlocalized value, which is then kept as 'Key[]' (e.g. 'Name[]'), a key
+    no file can set. Values are returned raw (escapes not expanded), so list
+    values can still be split with split_list().
+
+    Returns:
+        dict | None: Key -> raw value, or None if there is no [Desktop Entry] group.
+    """
+    in_group = False
+    values = {}
+    localized = {} # key -> (rank, value)
+    for line in lines:
+        if not line or line[0] == '#':
+            continue
+        if line[0] == '[':
+            if in_group:
+                break # Everything after the main group is irrelevant
+            in_group = line.rstrip() == DESKTOP_ENTRY_GROUP
+            continue
+        if not in_group:
+            continue
+
+        separator = line.find('=')
+        if separator == -1:
+            continue # Not a key-value pair, ignore like other parsers do
+        bracket = line.find('[', 0, separator)
+        if bracket == -1:
+            values[line[:separator].strip()] = line[separator + 1:].strip()
+            continue
+
+        # Most lines in real files are translations, skip them before slicing anything
+        if not candidates:
+            continue
+        locale_end = line.rfind(']', bracket, separator)
+        if locale_end == -1:
+            continue
+        try:
+            rank = candidates.index(line[bracket + 1:locale_end])
+        except ValueError:
+            continue # A translation we don't need
+        key = line[:bracket].strip()
+        previous = localized.get(key)
+        if previous is None or rank < previous[0]:
+            localized[key] = (rank, line[separator + 1:].strip())
+
+    if not in_group:
+        return None
+    for key, (_, value) in localized.items():
+        unlocalized = values.get(key)
+        if unlocalized is not None and unlocalized != value:
+            values[f"{key}[]"] = unlocalized
+        values[key] = value
+    return values
+
+
+def read_desktop_entry(filepath: str, candidates: tuple = ()) -> dict:
+    """Reads and parses the [Desktop Entry] group of a file. See parse_desktop_entry()."""
+    # Read with UTF-8 encoding, ignore errors for robustness
+    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+        text = f.read()
+    # Cut the text down to the main group, so action groups are not even split into lines
+    start = text.find(DESKTOP_ENTRY_GROUP)
+    if start == 0 or (start > 0 and text[start - 1] == '\n'):
+        end = text.find('\n[', start)
+        text = text[start:end] if end != -1 else text[start:]
+    return parse_desktop_entry(text.splitlines(), candidates)
+
+
+def load_application_entry(filepath: str, candidates: tuple = ()) -> dict:
+    """
+    Parses a .desktop file into a launcher entry.
+
+    Returns:
+        dict | None: The entry fields (source, name, icon, exec, the launch plan,
+                     plus the searchable generic_name, comment and keywords, and
+                     as unlocalized the untranslated name, generic_name and keywords
+                     that a translation replaced),
+                     or None if the file should not be shown in the launcher.
+                     OnlyShowIn and NotShowIn depend on the running desktop, they
+                     are returned as only_show_in and not_show_in when set; see shown_in().
+    """
+    try:
+        entry = read_desktop_entry(filepath, candidates)
+    except OSError as e:
+        logging.warning(f"Could not read {filepath}: {e}")
+        return None
+    if entry is None:
+        return None
+
+    # Skip if NoDisplay or Hidden is true (case-insensitive check)
+    if entry.get("NoDisplay", "").lower() == 'true' or \
+       entry.get("Hidden", "").lower() == 'true':
+        return None
+
+    # Skip if Type is not Application (if Type exists)
+    if entry.get("Type", "Application") != "Application":
+        return None
+
+    name = unescape_value(entry.get("Name", ""))
+    exec_cmd = unescape_value(entry.get("Exec", ""))
+    icon = normalize_icon(unescape_value(entry.get("Icon", "")))
+
+    # Only add if essential fields are present
+    if not (name and exec_cmd):
+        return None
+    # Parse the command line once here instead of on every launch
+    plan = desktop_launch_plan(
+        exec_cmd, name, icon, filepath,
+        path=unescape_value(entry.get("Path", "")),
+        terminal=entry.get("Terminal", "").lower() == 'true',
+    )
+    if plan is None:
+        return None
+    result = {
+        "source": filepath,
+        "name": name,
+        "icon": icon,
+        "exec": exec_cmd,
+        "plan": plan,
+        # Only searched, never displayed; localized like Name
+        "generic_name": unescape_value(entry.get("GenericName", "")),
+        "comment": unescape_value(entry.get("Comment", "")),
+        "keywords": split_list(entry.get("Keywords", "")),
+    }
+    # Translations are displayed, but the untranslated words stay searchable:
+    # "files" still finds Name[de]=Dateien
+    unlocalized = {}
+    if "Name[]" in entry:
+        unlocalized["name"] = unescape_value(entry["Name[]"])
+    if "GenericName[]" in entry:
+        unlocalized["generic_name"] = unescape_value(entry["GenericName[]"])
+    if "Keywords[]" in entry:
+        unlocalized["keywords"] = split_list(entry["Keywords[]"])
+    if unlocalized:
+        result["unlocalized"] = unlocalized
+    if "OnlyShowIn" in entry:
+        result["only_show_in"] = split_list(entry["OnlyShowIn"])
+    if "NotShowIn" in entry:
+        result["not_show_in"] = split_list(entry["NotShowIn"])
+    return result
+
+
+def normalize_icon(value: str):
+    """
+    Classifies an Icon= value, returning an absolute file path or an icon name.
+
+    Relative values with an image extension ('foo.png') are reduced to the
+    icon name, as the spec requires names without extension. Returns None for
+    an empty value.
+    """
+    if not value:
+        return None
+    if os.path.isabs(value):
+        return value
+    root, extension = os.path.splitext(value)
+    if extension.lower() in ICON_FILE_EXTENSIONS and '/' not in value:
+        return root
+    return value
+
+
+def load_application_entries(filepaths: list, candidates: tuple = ()) -> list:
+    """
+    Parses many .desktop files, see load_application_entry().
+
+    Files are parsed one after the other. Parsing is CPU-bound and holds the
+    GIL, so a thread pool was measured slower than this loop
+    (benchmarks/bench_desktop_parser.py), and a process pool would have to
+    spawn workers, as forking a multithreaded GTK process is unsafe.
+
+    Returns:
+        list: The entry (or None) for each path, in the order of filepaths.
+    """
+    return [load_application_entry(filepath, candidates) for filepath in filepaths]
@@ -0,0 +1,121 @@
+import logging
+import os
+import stat
+
+# Used when $PATH is unset or empty
+DEFAULT_SEARCH_PATH = [
+    os.path.expanduser("~/bin"),
+    os.path.expanduser("~/.local/bin"),
+    "/usr/local/sbin",
+    "/usr/local/bin",
+    "/usr/sbin",
+    "/usr/bin",
+    "/sbin",
+    "/bin",
+    "/snap/bin", # Common on Ubuntu systems
+    "/var/lib/flatpak/exports/bin",
+]
+
+
+def executable_search_path(path_env: str = None) -> list:
+    """
+    Returns the directories to scan for executables, in $PATH order.
+
+    Relative entries are ignored, and directories reached through more than one
+    entry (e.g. /bin -> /usr/bin on merged-/usr systems) are only listed once.
+    """
+    if path_env is None:
+        path_env = os.environ.get("PATH", "")
+    entries = [p for p in path_env.split(os.pathsep) if p] or DEFAULT_SEARCH_PATH
+
+    directories = []
+    seen = set()
+    for entry in entries:
+        directory = os.path.normpath(os.path.expanduser(entry))
+        if not os.path.isabs(directory):
+            logging.debug(f"Ignoring relative PATH entry: {entry}")
+            continue
+        real_directory = os.path.realpath(directory)
+        if real_directory in seen:
+            continue
+        seen.add(real_directory)
+        directories.append(directory)
+    return directories
+
+
+def _is_executable(st, uid: int, groups: set) -> bool:
+    """Checks the execute permission bits of a stat result for the current user."""
+    if not stat.S_ISREG(st.st_mode):
+        return False
+    if uid == 0:
+        # root may execute anything with at least one execute bit set
+        return bool(st.st_mode & (stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH))
+    if st.st_uid == uid:
+        return bool(st.st_mode & stat.S_IXUSR)
+    if st.st_gid in groups:
+        return bool(st.st_mode & stat.S_IXGRP)
+    return bool(st.st_mode & stat.S_IXOTH)
+
+
+def scan_executables(directory: str, ctimes: dict = None) -> list:
+    """
+    Lists the executables directly inside directory with a single os.scandir pass.
+
+    Directory entries are classified from the d_type returned by the listing,
+    and executable files need one stat each (cached on the DirEntry), instead of
+    separate access() and isdir() calls per file. Symlinks are followed.
+
+    Args:
+        ctimes: If given, filled with the ctime of every file looked at, executable
+                or not, so a cache can tell when one of them was modified or chmod'ed.
+
+    Raises:
+        OSError: If the directory cannot be listed.
+    """
+    uid = os.geteuid()
+    groups = set(os.getgroups())
+    groups.add(os.getegid())
+
+    executables = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            try:
+                # No syscall for plain files and directories, one stat for symlinks
+                if entry.is_dir():
+                    continue
+                st = entry.stat()
+                if ctimes is not None:
+                    ctimes[entry.path] = st.st_ctime_ns
+                if _is_executable(st, uid, groups):
+                    executables.append(entry.path)
+            except OSError as e:
+                # Dangling symlinks and races with package managers
+                logging.debug(f"Skipping {entry.path}: {e}")
+    return executables
+
+
+def scan_directories(directories: list, scan_dir=scan_executables) -> list:
+    """
+    Scans several directories, one after the other.
+
+    A thread pool was measured slower than this loop
+    (benchmarks/bench_executable_scan.py): a scan takes a few milliseconds,
+    mostly stat() calls holding the GIL in between, less than starting and
+    feeding the workers saves.
+
+    Args:
+        directories: Directories to scan.
+        scan_dir: Callable taking a directory and returning its executables.
+
+    Returns:
+        list: (directory, executables) tuples in the order of directories.
+              Directories that could not be scanned map to an empty list.
+    """
+    scanned = []
+    for directory in directories:
+        try:
+            scanned.append((directory, scan_dir(directory)))
+        except OSError as e:
+            logging.debug(f"Cannot scan {directory}: {e}")
+            scanned.append((directory, []))
+    return scanned
@@ -0,0 +1,95 @@
+import logging
+import os
+from collections import OrderedDict
+
+import gi
+gi.require_version("Gtk", "4.0")
+from gi.repository import Gtk, Gio, GLib
+
+# Shown when an entry has no icon or its icon cannot be found
+FALLBACK_ICON = "application-x-executable"
+# Legacy location of icons referenced by bare file names
+PIXMAPS_DIR = "/usr/share/pixmaps"
+PIXMAP_EXTENSIONS = (".png", ".svg", ".xpm")
+# Resolved paintables kept, keyed by (icon, size, scale)
+ICON_CACHE_SIZE = 512
+# Icons resolved per idle callback while pre-warming
+PREWARM_BATCH_SIZE = 8
+
+
+class IconResolver:
+    """
+    Resolves launcher icons to paintables, with an LRU cache.
+
+    Icon values were normalized at index time (see desktop_entry.normalize_icon),
+    so a value is either an absolute file path or an icon name. Names missing
+    from the icon theme fall back to PIXMAPS_DIR and then to FALLBACK_ICON,
+    instead of ending up as 'image-missing'. Every outcome, fallbacks
+    included, is cached, so rebinding rows while scrolling does no lookups.
+
+    The cache is cleared when the icon theme changes. prewarm() resolves icons
+    ahead of time from low priority idle callbacks.
+    """
+
+    def __init__(self, display):
+        self.theme = Gtk.IconTheme.get_for_display(display)
+        self.theme.connect("changed", self._on_theme_changed)
+        self._cache = OrderedDict() # (icon, size, scale) -> Gtk.IconPaintable
+        self._prewarm_queue = []
+        self._prewarm_source_id = None
+        self.stats = {"hits": 0, "misses": 0}
+
+    def lookup(self, icon: str, size: int, scale: int = 1):
+        """Returns the Gtk.IconPaintable for an icon value (or None) at size and scale."""
+        key = (icon, size, scale)
+        paintable = self._cache.get(key)
+        if paintable is not None:
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return paintable
+
+        self.stats["misses"] += 1
+        paintable = self._resolve(icon, size, scale)
+        self._cache[key] = paintable
+        if len(self._cache) > ICON_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return paintable
+
+    def _resolve(self, icon, size, scale):
+        if icon:
+            if icon.startswith("/"):
+                if os.path.isfile(icon):
+                    return self._lookup_file(icon, size, scale)
+            elif self.theme.has_icon(icon):
+                return self.theme.lookup_icon(icon, None, size, scale, Gtk.TextDirection.NONE, 0)
+            else:
+                for extension in PIXMAP_EXTENSIONS:
+                    path = os.path.join(PIXMAPS_DIR, icon + extension)
+                    if os.path.isfile(path):
+                        return self._lookup_file(path, size, scale)
+            logging.debug(f"Icon '{icon}' not found, using {FALLBACK_ICON}.")
+        return self.theme.lookup_icon(FALLBACK_ICON, None, size, scale, Gtk.TextDirection.NONE, 0)
+
+    def _lookup_file(self, path, size, scale):
+        gicon = Gio.FileIcon.new(Gio.File.new_for_path(path))
+        return self.theme.lookup_by_gicon(gicon, size, scale, Gtk.TextDirection.NONE, 0)
+
+    def prewarm(self, icons, size: int, scale: int = 1):
+        """Resolves icons into the cache from low priority idle callbacks, a few at a time."""
+        self._prewarm_queue = [(icon, size, scale) for icon in icons if (icon, size, scale) not in self._cache]
+        if self._prewarm_queue and self._prewarm_source_id is None:
+            self._prewarm_source_id = GLib.idle_add(self._prewarm_step, priority=GLib.PRIORITY_LOW)
+
+    def _prewarm_step(self):
+        batch = self._prewarm_queue[:PREWARM_BATCH_SIZE]
+        del self._prewarm_queue[:PREWARM_BATCH_SIZE]
+        for icon, size, scale in batch:
+            self.lookup(icon, size, scale)
+        if self._prewarm_queue:
+            return GLib.SOURCE_CONTINUE
+        self._prewarm_source_id = None
+        return GLib.SOURCE_REMOVE
+
+    def _on_theme_changed(self, theme):
+        logging.info("Icon theme changed, clearing the launcher icon cache.")
+        self._cache.clear()
@@ -0,0 +1,251 @@
+import json
+import logging
+import os
+
+# Bump whenever the layout of cached entries changes so stale caches are ignored
+CACHE_VERSION = 10
+CACHE_FILENAME = "launcher-index.json"
+
+
+def default_cache_path() -> str:
+    """Returns the launcher index cache location under $XDG_CACHE_HOME."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "thunderstruck", CACHE_FILENAME)
+
+
+def _mtime_ns(path: str):
+    """Returns the mtime of path in nanoseconds, or None if it cannot be stat'ed."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _ctime_ns(path: str):
+    """
+    Returns the change time of path in nanoseconds, or None if it cannot be
+    stat'ed. Unlike the mtime it also changes on chmod, and it cannot be set
+    back by tools that preserve timestamps.
+    """
+    try:
+        return os.stat(path).st_ctime_ns
+    except OSError:
+        return None
+
+
+class LauncherIndexCache:
+    """
+    Persistent on-disk cache for the launcher index.
+
+    Parsed desktop entries are stored per file together with the file ctime,
+    and every scanned directory is stored with its own mtime. A directory mtime
+    only changes when files are added, removed or renamed, so every cached file
+    is stat'ed as well: a directory whose mtime and files are all unchanged is
+    served straight from the cache without listing it; otherwise it is listed
+    again and only files with a new ctime are re-parsed. $PATH directories
+    record the ctime of every file they hold, so a chmod is noticed too.
+
+    Entries depend on the locale their localized keys were resolved for, so a
+    cache written for a different locale is discarded.
+    """
+
+    def __init__(self, path: str = None, locale: str = ""):
+        self.path = path or default_cache_path()
+        self.locale = locale
+        # directory -> {"dirs": {subdir: mtime}, "files": {filepath: {"ctime": int, "entry": dict | None}}}
+        self._desktop_dirs = {}
+        # directory -> {"mtime": int, "paths": [executable paths], "files": {filepath: ctime}}
+        self._exec_dirs = {}
+        self._dirty = False
+        self.stats = {"dirs_cached": 0, "dirs_rescanned": 0, "files_parsed": 0}
+
+    def load(self) -> bool:
+        """Loads the cache file. Returns False if it is missing, stale or unreadable."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            logging.info(f"No launcher index cache at {self.path}, building from scratch.")
+            return False
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable launcher index cache {self.path}: {e}")
+            return False
+
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            logging.info("Launcher index cache has an old format, rebuilding.")
+            return False
+        if data.get("locale") != self.locale:
+            logging.info("Launcher index cache was built for another locale, rebuilding.")
+            return False
+
+        self._desktop_dirs = data.get("desktop_dirs", {})
+        self._exec_dirs = data.get("exec_dirs", {})
+        self._dirty = False
+        return True
+
+    def save(self):
+        """Writes the cache atomically if anything changed since it was loaded."""
+        if not self._dirty:
+            return
+        data = {
+            "version": CACHE_VERSION,
+            "locale": self.locale,
+            "desktop_dirs": self._desktop_dirs,
+            "exec_dirs": self._exec_dirs,
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            logging.info(f"Saved launcher index cache to {self.path}")
+        except OSError as e:
+            logging.warning(f"Could not write launcher index cache {self.path}: {e}")
+
+    def desktop_files(self, directory: str, parse_files) -> list:
+        """
+        Returns every .desktop file below directory with its parsed entry.
+
+        Args:
+            directory: Top-level applications directory (walked recursively).
+            parse_files: Callable taking a list of file paths and returning, for
+                         each, an entry dict or None if the file should not be listed.
+                         Only new and modified files are passed, all in one call.
+
+        Returns:
+            list: (file path, entry dict or None) pairs. Files that are not listed
+                  are included, as they still override files of the same desktop file ID.
+        """
+        if not os.path.isdir(directory):
+            if self._desktop_dirs.pop(directory, None) is not None:
+                self._dirty = True
+            return []
+
+        cached = self._desktop_dirs.get(directory)
+        if (cached and all(_mtime_ns(d) == mtime for d, mtime in cached["dirs"].items())
+                and all(_ctime_ns(filepath) == f["ctime"] for filepath, f in cached["files"].items())):
+            self.stats["dirs_cached"] += 1
+            return [(filepath, f["entry"]) for filepath, f in cached["files"].items()]
+
+        self.stats["dirs_rescanned"] += 1
+        old_files = cached["files"] if cached else {}
+        dirs = {}
+        files = {}
+        to_parse = []
+        for root, _, filenames in os.walk(directory):
+            dirs[root] = _mtime_ns(root)
+            for filename in filenames:
+                if not filename.lower().endswith(".desktop"):
+                    continue
+                filepath = os.path.join(root, filename)
+                ctime = _ctime_ns(filepath)
+                if ctime is None:
+                    continue
+                old = old_files.get(filepath)
+                if old and old["ctime"] == ctime:
+                    files[filepath] = old
+                else:
+                    files[filepath] = {"ctime": ctime, "entry": None}
+                    to_parse.append(filepath)
+
+        # Parse everything that changed in one call to the parser
+        for filepath, entry in zip(to_parse, parse_files(to_parse) if to_parse else []):
+            files[filepath]["entry"] = entry
+        self.stats["files_parsed"] += len(to_parse)
+
+        self._desktop_dirs[directory] = {"dirs": dirs, "files": files}
+        self._dirty = True
+        return [(filepath, f["entry"]) for filepath, f in files.items()]
+
+    def desktop_subdirs(self, directory: str) -> list:
+        """Returns every directory walked below directory during the last scan."""
+        cached = self._desktop_dirs.get(directory)
+        return list(cached["dirs"]) if cached else []
+
+    def directory_mtimes(self, directories: list) -> dict:
+        """
+        Returns the mtime each directory had when its contents were last read.
+
+        Returns:
+            dict: directory -> mtime in nanoseconds, None if it was missing or never read.
+        """
+        mtimes = {}
+        for cached in self._desktop_dirs.values():
+            mtimes.update(cached["dirs"])
+        for directory, cached in self._exec_dirs.items():
+            mtimes[directory] = cached["mtime"]
+        return {directory: mtimes.get(directory) for directory in directories}
+
+    @staticmethod
+    def directories_unchanged(mtimes: dict) -> bool:
+        """Tells whether every directory still has the mtime recorded by directory_mtimes()."""
+        return all(_mtime_ns(directory) == mtime for directory, mtime in mtimes.items())
+
+    def file_ctimes(self, directories: list) -> dict:
+        """
+        Returns the ctime every file in directories had when it was last read:
+        the .desktop files below the applications directories, and all files
+        directly inside the $PATH directories.
+
+        Returns:
+            dict: file path -> ctime in nanoseconds.
+        """
+        ctimes = {}
+        for directory in directories:
+            cached = self._desktop_dirs.get(directory)
+            if cached:
+                ctimes.update((filepath, f["ctime"]) for filepath, f in cached["files"].items())
+            cached = self._exec_dirs.get(directory)
+            if cached:
+                ctimes.update(cached["files"])
+        return ctimes
+
+    @staticmethod
+    def files_unchanged(ctimes: dict) -> bool:
+        """Tells whether every file still has the ctime recorded by file_ctimes()."""
+        return all(_ctime_ns(filepath) == ctime for filepath, ctime in ctimes.items())
+
+    def invalidate(self, paths):
+        """
+        Marks files as changed, e.g. ones a file monitor reported, so the next
+        pass reads them again even if their ctime and directory look unchanged.
+        """
+        for path in paths:
+            directory = os.path.dirname(path)
+            if self._exec_dirs.pop(directory, None) is not None:
+                self._dirty = True
+            for cached in self._desktop_dirs.values():
+                if path in cached["files"]:
+                    cached["files"][path]["ctime"] = None
+                    self._dirty = True
+
+    def executables(self, directory: str, scan_dir) -> list:
+        """
+        Returns the executable paths found directly inside directory.
+
+        Args:
+            directory: A PATH-style directory (not walked recursively).
+            scan_dir: Callable taking the directory and a dict, returning a list
+                      of executable paths and filling the dict with the ctime of
+                      every file it looked at, see executables.scan_executables().
+                      Exceptions propagate and nothing is cached.
+        """
+        mtime = _mtime_ns(directory)
+        if mtime is None:
+            if self._exec_dirs.pop(directory, None) is not None:
+                self._dirty = True
+            return []
+
+        cached = self._exec_dirs.get(directory)
+        if cached and cached["mtime"] == mtime and self.files_unchanged(cached["files"]):
+            self.stats["dirs_cached"] += 1
+            return cached["paths"]
+
+        files = {}
+        paths = scan_dir(directory, files)
+        self.stats["dirs_rescanned"] += 1
+        self._exec_dirs[directory] = {"mtime": mtime, "paths": paths, "files": files}
+        self._dirty = True
+        return paths
@@ -0,0 +1,243 @@
+"""
+thunderstruck-index: builds, inspects and queries the launcher index without a display.
+
+Uses the same LauncherCore as the launcher, with the same cache files unless
+--cache-dir points elsewhere, so it doubles as a scripting surface and as a
+profiling target for indexing and search:
+
+    thunderstruck-index build [--cold]
+    thunderstruck-index stats
+    thunderstruck-index query firefox "lib wri" --keystrokes --repeat 5
+    thunderstruck-index --profile query fi
+    thunderstruck-index --json stats
+"""
+
+import argparse
+import cProfile
+import json
+import logging
+import os
+import pstats
+import statistics
+import sys
+import time
+
+from thunderstruck.modes.launcher_mode.core import LauncherCore
+from thunderstruck.modes.launcher_mode.index_cache import CACHE_FILENAME
+from thunderstruck.modes.launcher_mode.mapped_index import INDEX_FILENAME, open_index
+from thunderstruck.modes.launcher_mode.search import match_ranges
+from thunderstruck.modes.launcher_mode.usage_store import UsageStore
+
+# Functions listed by --profile
+PROFILE_LINES = 30
+
+
+def _timed(func):
+    start_time = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - start_time) * 1000, result
+
+
+def _split_dirs(value):
+    return [directory for directory in value.split(os.pathsep) if directory] if value is not None else None
+
+
+def make_core(args, usage=None) -> LauncherCore:
+    """Creates the LauncherCore described by the common command-line options."""
+    cache_path = mapped_path = None
+    if args.cache_dir:
+        cache_path = os.path.join(args.cache_dir, CACHE_FILENAME)
+        mapped_path = os.path.join(args.cache_dir, INDEX_FILENAME)
+    return LauncherCore(usage=usage, cache_path=cache_path, mapped_path=mapped_path,
+                        desktop_dirs=_split_dirs(args.desktop_dirs), search_path=_split_dirs(args.path),
+                        locale=args.locale)
+
+
+def build_index(core: LauncherCore, cold: bool = False) -> dict:
+    """
+    Indexes into core.index and writes the entry cache and the mapped index,
+    like a launcher start that finds its files out of date.
+
+    Returns:
+        dict: Entry counts and the timings of every stage in ms.
+    """
+    entries = []
+    for _, section in core.sections(cold=cold):
+        entries.extend(section)
+    core.timings["index_build_ms"], _ = _timed(lambda: core.index.splice(0, len(core.index), entries))
+    core.save_cache()
+    core.save_mapped(core.index.snapshot())
+    return {
+        "entries": len(entries),
+        "desktop_entries": sum(1 for entry in entries if entry["source"].endswith(".desktop")),
+        "cache_stats": dict(core.cache.stats),
+        "timings": dict(core.timings),
+    }
+
+
+def load_index(core: LauncherCore) -> str:
+    """Fills core.index the way the launcher starts: mapped if current, indexed otherwise. Returns which."""
+    mapped = core.open_mapped()
+    if mapped is not None:
+        core.index.adopt(mapped)
+        return "mapped"
+    build_index(core)
+    return "indexed"
+
+
+def command_build(args) -> dict:
+    core = make_core(args)
+    report = build_index(core, cold=args.cold)
+    report["cache_path"] = core.cache.path
+    report["mapped_path"] = core.mapped_path
+    report["mapped_bytes"] = os.path.getsize(core.mapped_path) if os.path.exists(core.mapped_path) else 0
+    return report
+
+
+def command_stats(args) -> dict:
+    core = make_core(args)
+    open_ms, mapped = _timed(lambda: open_index(core.mapped_path))
+    if mapped is None:
+        raise SystemExit(f"No mapped launcher index at {core.mapped_path}, run 'thunderstruck-index build' first.")
+    report = mapped.stats()
+    report["desktop_entries"] = sum(1 for source in mapped.sources if source.endswith(".desktop"))
+    report["executables"] = report["entries"] - report["desktop_entries"]
+    report["mapped_path"] = core.mapped_path
+    report["cache_bytes"] = os.path.getsize(core.cache.path) if os.path.exists(core.cache.path) else 0
+    report["current"] = core.indexer.is_current(mapped.metadata.get("fingerprint", {}))
+    report["open_ms"] = open_ms
+    report["build_timings"] = mapped.metadata.get("timings", {})
+    return report
+
+
+def command_query(args) -> dict:
+    usage = None
+    if not args.no_usage:
+        usage = UsageStore()
+        usage.load()
+    core = make_core(args, usage)
+    load_ms, source = _timed(lambda: load_index(core))
+    engine = core.engine
+    report = {"index": source, "entries": len(core.index), "load_ms": load_ms, "queries": []}
+    if args.prefix_tables:
+        report["prefix_tables_ms"], report["prefix_tables"] = _timed(
+            lambda: engine.build_prefix_tables(core.index.snapshot()))
+
+    for query in args.queries:
+        # With --keystrokes every prefix is searched in turn, like typing fires search-changed
+        typed = [query[:end] for end in range(1, len(query) + 1)] if args.keystrokes else [query]
+        for text in typed:
+            timings = []
+            for _ in range(args.repeat):
+                if args.repeat > 1:
+                    engine.clear_caches() # Time every run from scratch, except the prefix tables below
+                    if args.prefix_tables:
+                        engine.build_prefix_tables(core.index.snapshot())
+                stats_before = dict(engine.stats)
+                elapsed, rows = _timed(lambda: engine.search(text, args.limit))
+                timings.append(elapsed)
+            report["queries"].append({
+                "query": text,
+                "ms": statistics.median(timings),
+                "min_ms": min(timings),
+                "engine": {key: engine.stats[key] - stats_before[key] for key in engine.stats},
+                "results": [
+                    {
+                        "name": core.index.names[row],
+                        "source": core.index.sources[row],
+                        "matched": match_ranges(core.index.names[row], text),
+                    }
+                    for row in rows
+                ],
+            })
+    return report
+
+
+def _format_ms(ms):
+    return f"{ms:8.2f} ms"
+
+
+def print_report(command, report):
+    """Prints a report for humans."""
+    if command == "build":
+        print(f"{report['entries']} entries ({report['desktop_entries']} from .desktop files)")
+        print(f"cache {report['cache_path']}: {report['cache_stats']}")
+        print(f"mapped index {report['mapped_path']}: {report['mapped_bytes']} bytes")
+        for stage, ms in sorted(report["timings"].items()):
+            print(f"  {stage:<18}{_format_ms(ms)}")
+    elif command == "stats":
+        print(f"{report['mapped_path']} ({'current' if report['current'] else 'out of date'})")
+        print(f"{report['entries']} entries: {report['desktop_entries']} applications, {report['executables']} executables")
+        print(f"{report['tokens']} tokens, {report['typo_variants']} typo variants")
+        print(f"{report['bytes']} bytes mapped in {report['open_ms']:.2f} ms, entry cache {report['cache_bytes']} bytes")
+        for name, size in sorted(report["section_bytes"].items(), key=lambda item: -item[1]):
+            print(f"  {name:<28}{size:>10} bytes")
+        if report["build_timings"]:
+            print("last build:")
+            for stage, ms in sorted(report["build_timings"].items()):
+                print(f"  {stage:<18}{_format_ms(ms)}")
+    elif command == "query":
+        print(f"{report['entries']} entries {report['index']} in {report['load_ms']:.2f} ms")
+        if "prefix_tables_ms" in report:
+            print(f"{report['prefix_tables']} prefix tables built in {report['prefix_tables_ms']:.2f} ms")
+        for result in report["queries"]:
+            engine = ", ".join(f"{key} {value}" for key, value in result["engine"].items() if value)
+            print(f"{result['query']!r}: {len(result['results'])} results in {result['ms']:.3f} ms"
+                  + (f" ({engine})" if engine else ""))
+            for rank, row in enumerate(result["results"], 1):
+                print(f"  {rank:>3}. {row['name']}  {row['source']}")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="thunderstruck-index", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cache-dir", help="Directory of the index files, default $XDG_CACHE_HOME/thunderstruck")
+    parser.add_argument("--desktop-dirs", help="Applications directories, separated by ':'")
+    parser.add_argument("--path", help="Directories to scan for executables, separated by ':', default $PATH")
+    parser.add_argument("--locale", help="Locale for localized names, default from the environment")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--profile", action="store_true", help="Run the command under cProfile and print the hot spots")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log progress")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Index now and write the entry cache and the mapped index")
+    build.add_argument("--cold", action="store_true", help="Ignore the entry cache, parse everything")
+
+    commands.add_parser("stats", help="Show counts, sizes and build timings of the mapped index")
+
+    query = commands.add_parser("query", help="Search the index and time every query")
+    query.add_argument("queries", nargs="+", metavar="QUERY")
+    query.add_argument("--limit", type=int, default=10, help="Results per query, like launcher-max-results")
+    query.add_argument("--keystrokes", action="store_true", help="Search every prefix of each query, as when typing")
+    query.add_argument("--repeat", type=int, default=1, help="Runs per query from empty caches, the median is shown")
+    query.add_argument("--prefix-tables", action="store_true", help="Precompute the prefix tables first, as the launcher does")
+    query.add_argument("--no-usage", action="store_true", help="Ignore the launch history when ranking")
+    return parser.parse_args(argv)
+
+
+COMMANDS = {"build": command_build, "stats": command_stats, "query": command_query}
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(levelname)s: %(message)s")
+    command = COMMANDS[args.command]
+    if args.profile:
+        profiler = cProfile.Profile()
+        report = profiler.runcall(command, args)
+    else:
+        report = command(args)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(args.command, report)
+    if args.profile:
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
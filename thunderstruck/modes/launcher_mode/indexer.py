@@ -0,0 +1,243 @@
+import logging
+import os
+import time
+
+from thunderstruck.modes.launcher_mode.desktop_entry import current_desktops, load_application_entries, shown_in
+from thunderstruck.modes.launcher_mode.index_cache import CACHE_VERSION
+from thunderstruck.modes.launcher_mode.executables import executable_search_path, scan_directories, scan_executables
+
+# Icon shown for bare executables found in $PATH
+EXECUTABLE_ICON = "application-x-executable-symbolic"
+
+
+# Used when $XDG_DATA_DIRS is unset or empty, as the Base Directory spec says
+DEFAULT_DATA_DIRS = "/usr/local/share/:/usr/share/"
+
+
+def default_desktop_dirs() -> list:
+    """
+    Returns the applications directories of the XDG data directories, most
+    important first: $XDG_DATA_HOME, then every $XDG_DATA_DIRS entry in order
+    (which includes the Flatpak exports where Flatpak is installed).
+    """
+    data_home = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    data_dirs = os.environ.get("XDG_DATA_DIRS") or DEFAULT_DATA_DIRS
+    desktop_dirs = []
+    seen = set()
+    for data_dir in [data_home] + data_dirs.split(os.pathsep):
+        if not data_dir or not os.path.isabs(data_dir):
+            continue
+        directory = os.path.join(os.path.normpath(data_dir), "applications")
+        real_directory = os.path.realpath(directory)
+        if real_directory not in seen: # Listed twice, or reached through a symlink
+            seen.add(real_directory)
+            desktop_dirs.append(directory)
+    return desktop_dirs
+
+
+def desktop_file_id(directory: str, filepath: str) -> str:
+    """
+    Returns the desktop file ID of a file below an applications directory:
+    its relative path with '/' replaced by '-', e.g. 'kde4-konsole.desktop'.
+    """
+    return os.path.relpath(filepath, directory).replace(os.sep, "-")
+
+
+class LauncherIndexer:
+    """
+    Collects launcher entries from .desktop files and $PATH executables.
+
+    Does not depend on GTK, so it can run on a worker thread, in benchmarks or
+    from the command line. Results are produced as (directory, entries)
+    sections in a fixed order: the applications directories first, then the
+    $PATH directories.
+
+    Desktop entries are resolved by desktop file ID: of all files with the
+    same ID only the one in the most important directory counts, so a user's
+    copy in ~/.local/share/applications replaces (or, with Hidden=true or
+    NoDisplay=true, removes) the system one, and an application exported by
+    several installations is listed once. Entries whose OnlyShowIn or
+    NotShowIn exclude the running desktop are not listed either; the cache
+    keeps them, as they do not depend on the desktop until this check.
+    """
+
+    def __init__(self, cache, candidates: tuple = (), desktop_dirs: list = None, search_path: list = None,
+                 desktops: tuple = None):
+        """
+        Args:
+            cache: The LauncherIndexCache serving unchanged directories.
+            candidates: Locale suffixes for localized keys, see desktop_entry.locale_candidates().
+            desktop_dirs: Applications directories, default_desktop_dirs() if None.
+            search_path: Directories to scan for executables, $PATH if None.
+            desktops: Names of the running desktop, see desktop_entry.current_desktops(), which is used if None.
+        """
+        self.cache = cache
+        self.candidates = candidates
+        self.desktops = desktops if desktops is not None else current_desktops()
+        self.desktop_dirs = desktop_dirs
+        self.search_path = search_path
+        # Every directory visited by the last sections() pass, for file monitors
+        self.watch_dirs = []
+        # Desktop file ID -> the entry that won it in the last desktop pass (None if not listed)
+        self.desktop_ids = {}
+        # Milliseconds spent in each stage of the last pass, not counting the consumer
+        self.timings = {}
+
+    def sections(self):
+        """
+        Runs both indexers and yields their (directory, entries) sections in order.
+
+        Every visited directory is recorded in self.watch_dirs once the pass is complete.
+        """
+        watch_dirs = []
+        for directory, entries in self.desktop_sections(): # Populate with .desktop files first
+            watch_dirs.append(directory)
+            watch_dirs.extend(d for d in self.cache.desktop_subdirs(directory) if d != directory)
+            yield directory, entries
+        for directory, entries in self.executable_sections(): # Then add executables from PATH
+            watch_dirs.append(directory)
+            yield directory, entries
+        self.watch_dirs = watch_dirs
+
+    def root_dirs(self) -> list:
+        """Returns the configured applications directories followed by the $PATH directories."""
+        desktop_dirs = self.desktop_dirs if self.desktop_dirs is not None else default_desktop_dirs()
+        search_path = self.search_path if self.search_path is not None else executable_search_path()
+        return list(desktop_dirs) + list(search_path)
+
+    def fingerprint(self) -> dict:
+        """
+        Describes what the last sections() pass read: the configuration, the
+        mtime of every visited directory and the ctime of every file in them.
+        Stored with a MappedIndex, and checked with is_current() before the
+        index is reused.
+        """
+        return {
+            "cache_version": CACHE_VERSION,
+            "locale": self.cache.locale,
+            "desktops": list(self.desktops),
+            "roots": self.root_dirs(),
+            "dirs": self.cache.directory_mtimes(self.watch_dirs),
+            "files": self.cache.file_ctimes(self.watch_dirs),
+        }
+
+    def is_current(self, fingerprint: dict) -> bool:
+        """Tells whether a sections() pass now would produce the same entries as the one fingerprinted."""
+        return (
+            fingerprint.get("cache_version") == CACHE_VERSION
+            and fingerprint.get("locale") == self.cache.locale
+            and fingerprint.get("desktops") == list(self.desktops)
+            and fingerprint.get("roots") == self.root_dirs()
+            and self.cache.directories_unchanged(fingerprint.get("dirs", {}))
+            # Edited in place or chmod'ed files leave their directory's mtime alone
+            and self.cache.files_unchanged(fingerprint.get("files", {}))
+        )
+
+    def desktop_sections(self):
+        """
+        Finds and parses .desktop files from the applications directories,
+        keeping the first file of every desktop file ID, in one pass over the
+        directories in order of importance. The winners are left in
+        self.desktop_ids.
+
+        Yields:
+            tuple: (directory, entries) for each applications directory, in a fixed order.
+        """
+        logging.info("Starting desktop file indexing...")
+        found_count = 0
+        shadowed_count = 0
+        elapsed = 0.0
+        desktop_ids = {}
+        desktop_dirs = self.desktop_dirs if self.desktop_dirs is not None else default_desktop_dirs()
+        for directory in desktop_dirs:
+            start_time = time.perf_counter()
+            if not os.path.isdir(directory):
+                logging.debug(f"Applications directory not found or not a directory: {directory}")
+            entries = []
+            # Unchanged directories are served from the cache, only modified files get parsed
+            for filepath, entry in self.cache.desktop_files(directory, self._parse_desktop_files):
+                file_id = desktop_file_id(directory, filepath)
+                if file_id in desktop_ids:
+                    shadowed_count += 1 # Overridden by a more important directory
+                    continue
+                if entry and not shown_in(entry, self.desktops):
+                    entry = None # Still overrides less important files with the same ID
+                desktop_ids[file_id] = entry
+                if entry:
+                    entries.append(entry)
+            found_count += len(entries)
+            elapsed += time.perf_counter() - start_time
+            yield directory, entries
+        self.desktop_ids = desktop_ids
+        self.timings["desktop_ms"] = elapsed * 1000
+        logging.info(f"Finished .desktop file indexing. Found {found_count} applications from .desktop files, "
+                     f"{shadowed_count} overridden files skipped.")
+
+    def _parse_desktop_files(self, filepaths):
+        """Parses .desktop files, see desktop_entry.load_application_entries()."""
+        return load_application_entries(filepaths, self.candidates)
+
+    def executable_sections(self, desktop_ids: dict = None):
+        """
+        Finds executables in the $PATH directories.
+
+        Args:
+            desktop_ids: Desktop file ID -> entry of the applications already
+                         indexed, used to skip executables that are launched by
+                         one of them; self.desktop_ids of the last desktop pass if None.
+
+        Yields:
+            tuple: (directory, entries) for each PATH directory, in a fixed order.
+        """
+        logging.info("Starting executable indexing...")
+        start_time = time.perf_counter()
+        # Keep track of added executables to avoid duplicates (using full path)
+        added_executables = set()
+        # Add executables found via .desktop files first to avoid overwriting them
+        # if they also happen to be found in PATH. We use the full path.
+        added_count = 0
+        if desktop_ids is None:
+            desktop_ids = self.desktop_ids
+        for entry in desktop_ids.values():
+            plan = entry.get("plan") if entry else None
+            if plan:
+                # The program of the already parsed launch plan: if it is an absolute path, add it
+                program = plan["argv"][0]
+                if os.path.isabs(program):
+                    added_executables.add(program)
+                # Also add the name itself if it doesn't contain '/' to potentially
+                # catch commands run directly without path (e.g., 'firefox')
+                # This might add false positives if a .desktop name matches an exe name
+                # but it helps prevent adding 'firefox' again if found in /usr/bin
+                elif '/' not in program:
+                    added_executables.add(program)
+
+        # Directories whose mtime and files are unchanged are served from the cache
+        search_path = self.search_path if self.search_path is not None else executable_search_path()
+        scanned = scan_directories(
+            search_path,
+            lambda path_dir: self.cache.executables(path_dir, scan_executables)
+        )
+
+        elapsed = time.perf_counter() - start_time
+        for path_dir, executable_paths in scanned:
+            start_time = time.perf_counter()
+            entries = []
+            for potential_exe_path in executable_paths:
+                # Check if already added (using full path)
+                exe_name = os.path.basename(potential_exe_path)
+                if potential_exe_path not in added_executables and exe_name not in added_executables:
+                    entries.append({
+                        "source": potential_exe_path,
+                        "name": exe_name,
+                        "icon": EXECUTABLE_ICON,
+                        "exec": potential_exe_path # Use the full path as exec_cmd
+                    })
+                    added_executables.add(potential_exe_path)
+                    added_executables.add(exe_name) # Add name too for basic collision check
+            added_count += len(entries)
+            elapsed += time.perf_counter() - start_time
+            yield path_dir, entries
+        self.timings["executables_ms"] = elapsed * 1000
+
+        logging.info(f"Finished executable indexing. Added {added_count} executables from {len(search_path)} PATH directories.")
@@ -0,0 +1,193 @@
+import logging
+import os
+import re
+import shutil
+
+# Field codes of the Desktop Entry spec that expand to files or URLs; the
+# launcher never passes any, so arguments consisting of one are dropped
+FILE_FIELD_CODES = ("%f", "%F", "%u", "%U")
+# Deprecated field codes, removed from the command line as the spec asks
+DEPRECATED_FIELD_CODES = "dDnNvm"
+
+# Terminal emulators tried for Terminal=true entries, with the option that
+# precedes the command to run, in order of preference after $TERMINAL
+TERMINALS = (
+    ("x-terminal-emulator", ["-e"]),
+    ("gnome-terminal", ["--"]),
+    ("kgx", ["-e"]),
+    ("ptyxis", ["--"]),
+    ("konsole", ["-e"]),
+    ("xfce4-terminal", ["-x"]),
+    ("alacritty", ["-e"]),
+    ("kitty", []),
+    ("foot", []),
+    ("xterm", ["-e"]),
+)
+
+_FIELD_CODE_RE = re.compile(r"%(.)")
+_terminal_command = None
+
+
+def split_exec(value: str) -> list:
+    """
+    Splits an Exec value into arguments following the Desktop Entry quoting rules.
+
+    Arguments are separated by spaces. Inside double quotes, a backslash
+    escapes the next character ('"', '`', '$' or '\\'). Expects the value
+    after string escapes (\\s, \\\\, ...) were expanded.
+
+    Raises:
+        ValueError: If a quote is not closed.
+    """
+    args = []
+    current = []
+    in_arg = False
+    quoted = False
+    i = 0
+    length = len(value)
+    while i < length:
+        char = value[i]
+        if quoted:
+            if char == '\\' and i + 1 < length:
+                current.append(value[i + 1])
+                i += 2
+                continue
+            if char == '"':
+                quoted = False
+            else:
+                current.append(char)
+        elif char == '"':
+            quoted = in_arg = True
+        elif char in ' \t\n':
+            if in_arg:
+                args.append(''.join(current))
+                current = []
+                in_arg = False
+        elif char == '\\' and i + 1 < length:
+            current.append(value[i + 1])
+            in_arg = True
+            i += 2
+            continue
+        else:
+            current.append(char)
+            in_arg = True
+        i += 1
+    if quoted:
+        raise ValueError(f"Unterminated quote in Exec value: {value}")
+    if in_arg:
+        args.append(''.join(current))
+    return args
+
+
+def expand_field_codes(args: list, name: str = "", icon: str = None, source: str = "") -> list:
+    """
+    Expands the field codes in split Exec arguments for a launch without files.
+
+    %f/%F/%u/%U arguments are removed, %i becomes '--icon <Icon>', %c the
+    name, %k the desktop file path and %% a literal '%'. Deprecated and
+    unknown codes are removed.
+    """
+    def expand(match):
+        code = match.group(1)
+        if code == '%':
+            return '%'
+        if code == 'c':
+            return name
+        if code == 'k':
+            return source
+        return '' # File codes inside a larger argument, deprecated and unknown codes
+
+    argv = []
+    for arg in args:
+        if arg in FILE_FIELD_CODES:
+            continue
+        if arg == "%i":
+            if icon:
+                argv.extend(["--icon", icon])
+            continue
+        argv.append(_FIELD_CODE_RE.sub(expand, arg) if '%' in arg else arg)
+    return argv
+
+
+def desktop_launch_plan(exec_value: str, name: str, icon: str, source: str, path: str = "", terminal: bool = False) -> dict:
+    """
+    Builds the launch plan of a desktop entry.
+
+    Returns:
+        dict | None: {"argv": [...], "path": str | None, "terminal": bool}, or None if
+                     the Exec value cannot be parsed or is empty.
+    """
+    try:
+        argv = expand_field_codes(split_exec(exec_value), name, icon, source)
+    except ValueError as e:
+        logging.debug(f"Ignoring {source}: {e}")
+        return None
+    if not argv:
+        return None
+    return {"argv": argv, "path": path or None, "terminal": terminal}
+
+
+def executable_launch_plan(path: str) -> dict:
+    """Builds the launch plan of an executable found in $PATH."""
+    return {"argv": [path], "path": None, "terminal": False}
+
+
+def terminal_command() -> list:
+    """
+    Returns the argv prefix that runs a command in a terminal emulator, or None.
+
+    $TERMINAL wins when set; the result is looked up once and then cached.
+    """
+    global _terminal_command
+    if _terminal_command is None:
+        candidates = list(TERMINALS)
+        preferred = os.environ.get("TERMINAL")
+        if preferred:
+            candidates.insert(0, (preferred, dict(TERMINALS).get(os.path.basename(preferred), ["-e"])))
+        for command, run_option in candidates:
+            executable = shutil.which(command)
+            if executable:
+                _terminal_command = [executable] + run_option
+                break
+        else:
+            logging.warning("No terminal emulator found for Terminal=true entries.")
+            return None
+    return _terminal_command
+
+
+def plan_argv(plan: dict) -> list:
+    """
+    Returns the final argv for a plan: the command, run in a terminal for
+    Terminal=true and started in its working directory when Path= is set.
+
+    Raises:
+        FileNotFoundError: If the entry needs a terminal and none is installed.
+    """
+    argv = list(plan["argv"])
+    if plan.get("terminal"):
+        terminal = terminal_command()
+        if terminal is None:
+            raise FileNotFoundError("No terminal emulator found")
+        argv = terminal + argv
+    if plan.get("path"):
+        # posix_spawn cannot change directories, let a shell do it right before exec
+        argv = ["/bin/sh", "-c", 'cd "$0" && exec "$@"', plan["path"]] + argv
+    return argv
+
+
+def spawn_plan(plan: dict) -> int:
+    """
+    Starts a launch plan in a new session, detached from the launcher.
+
+    Uses posix_spawn, which is safe in a multithreaded process and avoids the
+    fork of the whole interpreter. The caller must reap the returned pid,
+    e.g. with GLib.child_watch_add().
+
+    Returns:
+        int: The pid of the started process.
+
+    Raises:
+        OSError: If the program cannot be started (e.g. FileNotFoundError).
+    """
+    argv = plan_argv(plan)
+    return os.posix_spawnp(argv[0], argv, os.environ, setsid=True)
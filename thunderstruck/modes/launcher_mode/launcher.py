@@ -1,6 +1,4 @@
 import gi
-import os
-import configparser
 import logging
 
 gi.require_version("Gtk", "4.0")
@@ -10,11 +8,19 @@ from gi.repository import Gtk, Gio, GObject, GLib, Gdk # Import GLib for idle_ad
 # Define the GSettings schema ID (used by LauncherWidget)
 SCHEMA_ID = "org.example.Thunderstruck"
 
-import subprocess
-import shlex
-import re
+import time
+import threading
+from collections import deque
 
 from thunderstruck.modes.base_mode import BaseMode
+from thunderstruck.modes.launcher_mode.core import LauncherCore
+from thunderstruck.modes.launcher_mode.app_index import AppIndex
+from thunderstruck.modes.launcher_mode.search import SearchCancelled, match_ranges
+from thunderstruck.modes.launcher_mode.search_scheduler import SearchScheduler
+from thunderstruck.modes.launcher_mode.usage_store import UsageStore
+from thunderstruck.modes.launcher_mode.launch_plan import executable_launch_plan, spawn_plan
+from thunderstruck.modes.launcher_mode.icon_resolver import IconResolver
+from thunderstruck.modes.launcher_mode.prewarm import LaunchPrewarmer
 
 # Define the GObject wrapper class for our list items
 class AppItem(GObject.Object):
@@ -23,12 +29,121 @@ class AppItem(GObject.Object):
     name = GObject.Property(type=str, default="")
     icon_name = GObject.Property(type=str, default=None) # Store icon name as string
     exec_cmd = GObject.Property(type=str, default="")
+    source = GObject.Property(type=str, default="") # .desktop file or executable path
 
-    def __init__(self, name, icon_name, exec_cmd):
+    def __init__(self, name, icon_name, exec_cmd, source="", plan=None):
         super().__init__()
         self.name = name
         self.icon_name = icon_name
         self.exec_cmd = exec_cmd
+        self.source = source
+        # Parsed launch plan (see launch_plan.py); None for plain executables
+        self.plan = plan
+
+    @classmethod
+    def for_row(cls, index: AppIndex, row: int):
+        """Materializes an item for one row of an AppIndex, or of one of its snapshots."""
+        return cls(name=index.names[row], icon_name=index.icons[row], exec_cmd=index.execs[row],
+                   source=index.sources[row], plan=index.plans[row])
+
+class AppListModel(GObject.Object, Gio.ListModel):
+    """
+    Gio.ListModel over the whole launcher index.
+
+    Entries live in a column-wise AppIndex, and an AppItem is only created
+    when a row is requested through get_item().
+    """
+    __gtype_name__ = "AppListModel"
+
+    def __init__(self, index: AppIndex):
+        super().__init__()
+        self.index = index
+
+    def do_get_item_type(self):
+        return AppItem.__gtype__
+
+    def do_get_n_items(self):
+        return len(self.index)
+
+    def do_get_item(self, position):
+        if position >= len(self.index):
+            return None
+        return AppItem.for_row(self.index, position)
+
+    def splice(self, position, n_removals, entries):
+        """Replaces n_removals rows at position with the given entry dicts."""
+        self.index.splice(position, n_removals, entries)
+        self.items_changed(position, n_removals, len(entries))
+
+    def remove_all(self):
+        self.splice(0, len(self.index), [])
+
+    def adopt(self, mapped):
+        """Replaces all rows with those of a MappedIndex, see AppIndex.adopt()."""
+        removed = len(self.index)
+        self.index.adopt(mapped)
+        self.items_changed(0, removed, len(mapped))
+
+class AppResultModel(GObject.Object, Gio.ListModel):
+    """
+    Gio.ListModel exposing the current search results as rows of an AppIndex.
+
+    The rows refer to the AppIndexSnapshot they were found in, and items are
+    read from it, so rows spliced into the index before the next search
+    cannot shift them. AppItems are only created for the rows GTK actually
+    asks for (the visible ones), and are kept until the result set changes
+    so repeated lookups return the same object.
+    """
+    __gtype_name__ = "AppResultModel"
+
+    def __init__(self, index: AppIndex):
+        super().__init__()
+        self.index = index
+        self.rows = []
+        self._items = {}
+
+    def do_get_item_type(self):
+        return AppItem.__gtype__
+
+    def do_get_n_items(self):
+        return len(self.rows)
+
+    def do_get_item(self, position):
+        if position >= len(self.rows):
+            return None
+        item = self._items.get(position)
+        if item is None:
+            item = AppItem.for_row(self.index, self.rows[position])
+            self._items[position] = item
+        return item
+
+    def set_rows(self, rows, snapshot):
+        """Replaces the result set with a list of rows of snapshot."""
+        removed = len(self.rows)
+        self.index = snapshot
+        self.rows = rows
+        self._items = {}
+        self.items_changed(0, removed, len(rows))
+
+class IndexingStatus(GObject.Object):
+    """Reports launcher indexing progress and prefix table rebuilds. Signals are always emitted on the main thread."""
+    __gtype_name__ = "LauncherIndexingStatus"
+
+    __gsignals__ = {
+        # Emitted after every indexed batch.
+        # Passes the number of items indexed so far and whether indexing has finished.
+        'indexing-progress': (GObject.SignalFlags.RUN_FIRST, None, (int, bool)),
+        # Emitted when the search engine's prefix tables were rebuilt for the current index.
+        'prefix-tables-ready': (GObject.SignalFlags.RUN_FIRST, None, ()),
+    }
+
+    indexed = GObject.Property(type=int, default=0)
+    finished = GObject.Property(type=bool, default=False)
+
+    def update(self, indexed, finished):
+        self.indexed = indexed
+        self.finished = finished
+        self.emit('indexing-progress', indexed, finished)
 
 @Gtk.Template(resource_path="/org/example/Thunderstruck/ui/launcher.ui")
 class LauncherWidget(Gtk.Box):
@@ -38,6 +153,9 @@ class LauncherWidget(Gtk.Box):
 
     results_list: Gtk.ListView = Gtk.Template.Child() 
 
+    # Pixel size icons are resolved at, matching Gtk.IconSize.LARGE
+    ICON_PIXEL_SIZE = 32
+
     def __init__(self, mode_handler, **kwargs):
         super().__init__(**kwargs)
         self.mode_handler = mode_handler # LauncherMode instance
@@ -50,9 +168,20 @@ class LauncherWidget(Gtk.Box):
         # Read initial max results and connect to changes
         self._max_results = self.settings.get_int("launcher-max-results")
         self.settings.connect("changed::launcher-max-results", self._on_max_results_changed)
+
+        # Resolved icons are cached, and the empty-query icons are pre-warmed while hidden
+        self._icon_resolver = IconResolver(self.get_display())
+        self.connect("unmap", lambda widget: self._prewarm_icons())
         
         # Set up the list view using the model from the mode handler
         self._setup_results_list(self.mode_handler.list_store)
+
+        # Show indexing progress in the search entry until the index is complete
+        self._default_placeholder = self.search_entry.get_placeholder_text()
+        indexing_status = self.mode_handler.indexing_status
+        self._on_indexing_progress(indexing_status, indexing_status.indexed, indexing_status.finished)
+        indexing_status.connect("indexing-progress", self._on_indexing_progress)
+        indexing_status.connect("prefix-tables-ready", lambda status: self._prewarm_icons())
         # Connect search entry signal
         self.search_entry.connect("search-changed", self._on_search_changed)
         self.search_entry.connect("activate", self._execute_selected_item) # Execute on Enter in search
@@ -62,23 +191,35 @@ class LauncherWidget(Gtk.Box):
         self.key_controller.connect("key-pressed", self._on_results_list_key_pressed)
         self.add_controller(self.key_controller) # Attach to the parent widget (self)
 
-    def _setup_results_list(self, list_store: Gio.ListStore):
-        """Sets up the model, filter, factory for the results ListView."""
+    def _setup_results_list(self, list_store: AppListModel):
+        """Sets up the result model, slice and factory for the results ListView."""
         # Store the base list_store reference
         self.list_store = list_store
-
-        # 1. Custom Filter
-        self.custom_filter = Gtk.CustomFilter.new(self._filter_func, None)
-
-        # 2. Filter Model (wraps the base store, uses the custom filter)
-        self.filter_model = Gtk.FilterListModel(model=self.list_store, filter=self.custom_filter)
-
-        
-        # 3. Slice Model (wraps the filter model, applies the limit)
-        self.slice_model = Gtk.SliceListModel(model=self.filter_model, offset=0, size=self._max_results)
+        # Re-run the search when the index changes (batches while indexing, live updates)
+        self._requery_source_id = None
+        self.list_store.connect("items-changed", self._on_index_changed)
+
+        # 1./2. Result Model: the rows matching the search, filtered directly on the index
+        self.result_model = AppResultModel(self.list_store.index)
+        # Large indexes are searched on a background thread, only the latest results are published
+        self._search_scheduler = SearchScheduler(
+            self.mode_handler.search_engine,
+            self.result_model.set_rows,
+            debounce_ms=self.settings.get_int("launcher-search-debounce"),
+        )
+        self.settings.connect("changed::launcher-search-debounce", self._on_search_debounce_changed)
+
+        # 3. Slice Model (wraps the result model, applies the limit)
+        self.slice_model = Gtk.SliceListModel(model=self.result_model, offset=0, size=self._max_results)
         
         # 4. Selection Model (wraps the *slice* model)
         self.selection_model = Gtk.SingleSelection(model=self.slice_model)
+        # A result that stays selected is likely to be launched, its files are prewarmed
+        self._prewarm_enabled = self.settings.get_boolean("launcher-prewarm")
+        self.settings.connect("changed::launcher-prewarm", self._on_prewarm_changed)
+        self.selection_model.connect("notify::selected-item", self._on_selected_item_changed)
+        # Items keep arriving while indexing runs in the background
+        self.slice_model.connect("items-changed", self._on_results_changed)
         
         # 4. Factory
         factory = Gtk.SignalListItemFactory()
@@ -91,6 +232,9 @@ class LauncherWidget(Gtk.Box):
         self.results_list.set_factory(factory)
         self.results_list.set_focusable(True) # Make the list view focusable
 
+        # Show whatever is already indexed
+        self._update_results()
+
     def _on_factory_setup(self, factory, list_item):
         """Creates the widget (a Label) for each list item."""
         # Create a Box container for icon and label
@@ -113,34 +257,52 @@ class LauncherWidget(Gtk.Box):
         label = box.get_last_child() # The Gtk.Label
         item: AppItem = list_item.get_item() # Get the AppItem instance
 
-        # Bind data
-        label.set_label(item.name)
-        # Set icon, handle cases where icon_name might be None or invalid
-        if item.icon_name:
-            # Use Gtk.IconTheme to check if the icon exists? Maybe overkill for now.
-            # Let GTK handle missing icons by setting the name directly.
-            # If it fails, it might show a fallback 'image-missing'.
-            icon.set_from_icon_name(item.icon_name)
+        # Bind data, highlighting the characters matched by the search
+        ranges = match_ranges(item.name, self._search_text) if self._search_text else []
+        if ranges:
+            label.set_markup(self._highlight_markup(item.name, ranges))
         else:
-            icon.set_from_icon_name("application-x-executable") # Default fallback icon
-
-    def _filter_func(self, item: AppItem, user_data):
-        """Custom filter function. Returns True if item should be visible."""
-        if not self._search_text:
-            return True # Show all if search is empty
-        # Case-insensitive search in the name
-        return self._search_text.lower() in item.name.lower()
+            label.set_label(item.name)
+        # Set icon from the resolver cache; missing icons resolve to a fallback once
+        icon.set_from_paintable(
+            self._icon_resolver.lookup(item.icon_name, self.ICON_PIXEL_SIZE, self.get_scale_factor())
+        )
+
+    @staticmethod
+    def _highlight_markup(name: str, ranges: list) -> str:
+        """Builds Pango markup for name with the given (start, end) ranges in bold."""
+        parts = []
+        last = 0
+        for start, end in ranges:
+            parts.append(GLib.markup_escape_text(name[last:start]))
+            parts.append(f"<b>{GLib.markup_escape_text(name[start:end])}</b>")
+            last = end
+        parts.append(GLib.markup_escape_text(name[last:]))
+        return "".join(parts)
+
+    def _update_results(self):
+        """Schedules a search for the current search text; results arrive through the scheduler."""
+        self._search_scheduler.submit(self._search_text, self._max_results)
+
+    def _on_search_debounce_changed(self, settings, key):
+        self._search_scheduler.set_debounce(settings.get_int(key))
+
+    def _on_index_changed(self, model, position, removed, added):
+        """Coalesces index changes (several splices per batch) into one search per main loop pass."""
+        if self._requery_source_id is None:
+            self._requery_source_id = GLib.idle_add(self._on_requery_idle)
+
+    def _on_requery_idle(self):
+        self._requery_source_id = None
+        self._update_results()
+        return GLib.SOURCE_REMOVE
 
     def _on_search_changed(self, search_entry: Gtk.SearchEntry):
         """Handles the 'search-changed' signal from the search entry."""
         self._search_text = search_entry.get_text()
         logging.debug(f"Search text changed: '{self._search_text}'")
-        # Notify the filter model that the filter needs to be re-evaluated
-        # Re-assigning the filter seems to be the documented way,
-        # though changed(DIFFERENT) might work in some GTK versions.
-        self.filter_model.set_filter(None) # Temporarily remove filter
-        self.filter_model.set_filter(self.custom_filter) # Re-apply the filter
-        # Alternative: self.custom_filter.changed(Gtk.FilterChange.DIFFERENT) # Might be simpler if it works reliably
+        # Results are matched on the index arrays, so no per-item filter runs over GObjects
+        self._update_results()
 
         # Select the first item after filtering if search text is not empty and *slice* is not empty
         if self._search_text and self.slice_model.get_n_items() > 0:
@@ -150,6 +312,43 @@ class LauncherWidget(Gtk.Box):
              self.selection_model.set_selected(Gtk.INVALID_LIST_POSITION)
 
 
+    def _on_selected_item_changed(self, selection_model, pspec):
+        """Restarts the prewarm delay for the newly selected result."""
+        item = selection_model.get_selected_item()
+        self.mode_handler.schedule_prewarm(item if self._prewarm_enabled and isinstance(item, AppItem) else None)
+
+    def _on_prewarm_changed(self, settings, key):
+        self._prewarm_enabled = settings.get_boolean(key)
+        logging.info(f"Launcher prewarm {'enabled' if self._prewarm_enabled else 'disabled'}.")
+        self._on_selected_item_changed(self.selection_model, None)
+
+    def _on_results_changed(self, model, position, removed, added):
+        """Keeps the first match selected when results arrive mid-search."""
+        if self._search_text and model.get_n_items() > 0 and \
+           self.selection_model.get_selected() == Gtk.INVALID_LIST_POSITION:
+            self.selection_model.set_selected(0)
+
+    def _on_indexing_progress(self, status, indexed, finished):
+        """Shows the number of indexed items in the search entry while indexing runs."""
+        if finished:
+            self.search_entry.set_placeholder_text(self._default_placeholder)
+        else:
+            self.search_entry.set_placeholder_text(f"Indexing applications and commands... ({indexed})")
+
+    def _prewarm_icons(self):
+        """
+        Resolves the icons of the empty-query results, which are shown when the window opens.
+
+        Only the precomputed prefix table is read, searching here would block the main
+        thread on the engine lock; without a current table this is left to the
+        'prefix-tables-ready' signal.
+        """
+        rows = self.mode_handler.search_engine.table_rows("", self._max_results)
+        if rows is None:
+            return
+        icons = [self.mode_handler.app_index.icons[row] for row in rows]
+        self._icon_resolver.prewarm(icons, self.ICON_PIXEL_SIZE, self.get_scale_factor())
+
     def _on_results_list_key_pressed(self, controller, keyval, keycode, state):
         """Handle key presses on the results list for navigation and execution."""
         print(f"DEBUG: _on_results_list_key_pressed received keyval: {Gdk.keyval_name(keyval)}")
@@ -195,6 +394,9 @@ class LauncherWidget(Gtk.Box):
     def _execute_selected_item(self, *args): # Accept *args for signal handlers like 'activate'
         """Executes the currently selected application, prioritizing explicit selection."""
         print("DEBUG: _execute_selected_item called.") # <<< ADDED LOGGING
+        activated_at = time.perf_counter()
+        # Launch from the results of what was typed, not from a search still in flight
+        self._search_scheduler.flush()
         selected_pos = self.selection_model.get_selected()
         item_to_execute = None
 
@@ -231,38 +433,12 @@ class LauncherWidget(Gtk.Box):
         print(f"Proceeding to execute: {item_to_execute.name} (Exec: {item_to_execute.exec_cmd})")
 
         # --- Execution Logic ---
-        exec_cmd = item_to_execute.exec_cmd
-        print(f"DEBUG: Original exec_cmd: '{exec_cmd}'") # <<< ADDED LOGGING
-        # Clean command (remove % codes) - simple approach
-        cleaned_cmd = re.sub(r' %[a-zA-Z]', '', exec_cmd).strip()
-        print(f"DEBUG: Cleaned command: '{cleaned_cmd}'") # <<< ADDED LOGGING
-        # Basic command splitting (shlex might be better for complex cases)
-        try:
-            command_list = shlex.split(cleaned_cmd)
-        except ValueError as e:
-             print(f"Error splitting command '{cleaned_cmd}': {e}")
-             # Optionally show an error to the user via a dialog
-             return
-
-        if not command_list:
-            print("Error: No command left after cleaning.")
-            return
-
-        print(f"Executing command list: {command_list}")
-        try:
-            print(f"DEBUG: Attempting subprocess.Popen with: {command_list}") # <<< ADDED LOGGING
-            # Use Popen for non-blocking execution
-            subprocess.Popen(command_list, start_new_session=True) # start_new_session detaches from launcher
+        # The command line was parsed into a launch plan at index time
+        if self.mode_handler.launch(item_to_execute, activated_at):
             # Hide the main window after successful launch attempt
             window = self.get_ancestor(Gtk.Window)
             if window:
                 window.hide()
-        except FileNotFoundError:
-            print(f"Error: Command not found: {command_list[0]}")
-            # Optionally show error dialog
-        except Exception as e:
-            print(f"Error executing command {command_list}: {e}")
-            # Optionally show error dialog
 
     def _on_max_results_changed(self, settings, key):
         """Called when the 'launcher-max-results' GSetting changes."""
@@ -271,17 +447,59 @@ class LauncherWidget(Gtk.Box):
         # Update the slice model size
         if hasattr(self, 'slice_model') and self.slice_model:
             self.slice_model.set_size(self._max_results)
+            self._update_results()
         else:
              logging.warning("Slice model not yet initialized when trying to update size.")
 
 
 class LauncherMode(BaseMode):
+    # Number of items handed to the main thread per idle callback while indexing
+    INDEX_BATCH_SIZE = 500
+    # Quiet period after the last file event before the index is refreshed
+    REFRESH_COALESCE_MS = 1000
+    # Number of recent activation-to-spawn latencies kept for instrumentation
+    LAUNCH_LATENCY_HISTORY = 100
+    # Quiet period after the index or the launch history changed before the prefix tables are rebuilt
+    PREFIX_TABLE_DELAY_MS = 1500
+    # Time a result must stay selected before its files are prewarmed
+    PREWARM_DELAY_MS = 300
+
     def __init__(self):
         super().__init__()
-        # Create the ListStore here, owned by the mode
-        self.list_store = Gio.ListStore.new(AppItem)
-        self._index_desktop_files() # Populate with .desktop files first
-        self._index_executables_with_rg() # Then add executables from PATH
+        # Launch history, loaded by the indexing thread and used to rank frecent entries first
+        self.usage_store = UsageStore()
+        # Index, on-disk caches (entries as JSON, the whole index as a mapped binary file)
+        # and ranked fuzzy search, shared with the thunderstruck-index command
+        self.core = LauncherCore(usage=self.usage_store)
+        # Create the list model here, owned by the mode. Entries are stored column-wise
+        # in an AppIndex, AppItems are only created for rows that are displayed.
+        self.app_index = self.core.index
+        self.list_store = AppListModel(self.app_index)
+        self.search_engine = self.core.engine
+        # Emits 'indexing-progress' on the main thread while the store is being filled
+        self.indexing_status = IndexingStatus()
+        self._index_thread = None
+        self._index_generation = 0
+        # directory -> [(source, displayed fields)] in store order, one section per indexed directory;
+        # None while the store serves a mapped index, whose entries are not known per directory
+        self._sections = {}
+        # Directory monitors for live updates, keyed by path
+        self._monitors = {}
+        self._watch_dirs = []
+        self._refresh_pending = False
+        # Files reported by the monitors since the last refresh started, read again by the next one
+        self._changed_paths = set()
+        self._refresh_timeout_id = None
+        # Activation-to-spawn latencies in ms, most recent last
+        self.launch_latencies = deque(maxlen=self.LAUNCH_LATENCY_HISTORY)
+        # Background rebuilds of the search engine's prefix tables
+        self._prefix_table_generation = 0
+        self._prefix_table_timeout_id = None
+        # Speculative readahead of the selected result's program and libraries
+        self.prewarmer = LaunchPrewarmer()
+        self._prewarm_timeout_id = None
+        self._prewarm_item = None
+        self.start_indexing()
 
     @property
     def name(self) -> str:
@@ -311,6 +529,7 @@ class LauncherMode(BaseMode):
     def deactivate(self):
         """Called when the mode becomes inactive."""
         print(f"{self.name} mode deactivated")
+        self.schedule_prewarm(None)
 
     def handle_escape(self) -> bool:
         """
@@ -326,204 +545,363 @@ class LauncherMode(BaseMode):
             return True # Escape always handled by LauncherMode (by clearing or doing nothing if already empty)
         # Return False only if widget/search_entry couldn't be accessed
         return False
-    def _index_desktop_files(self):
-        """Finds and parses .desktop files from standard locations."""
-        logging.info("Starting desktop file indexing...")
-        # Clear the store before indexing
+    def launch(self, item: AppItem, activated_at: float = None) -> bool:
+        """
+        Starts an item from its precomputed launch plan.
+
+        The child is reaped by a GLib child watch, so finished programs do not
+        linger as zombies while the launcher keeps running.
+
+        Args:
+            item: The AppItem to launch.
+            activated_at: time.perf_counter() value of the activation, used to
+                          record the activation-to-spawn latency.
+
+        Returns:
+            bool: True if the process was started.
+        """
+        plan = item.plan or executable_launch_plan(item.exec_cmd)
+        self.schedule_prewarm(None)
+        prewarmed = self.prewarmer.launched_after_prewarm(plan)
+        try:
+            pid = spawn_plan(plan)
+        except FileNotFoundError as e:
+            print(f"Error: Command not found: {plan['argv'][0]} ({e})")
+            return False
+        except OSError as e:
+            print(f"Error executing command {plan['argv']}: {e}")
+            return False
+        GLib.child_watch_add(GLib.PRIORITY_DEFAULT, pid, self._on_child_exited, item.name)
+        # Remember the launch for frecency ranking, written to disk in the background
+        self.usage_store.record(item.source)
+        self._schedule_prefix_tables() # Frecency changed the ranking
+
+        if activated_at is not None:
+            latency_ms = (time.perf_counter() - activated_at) * 1000
+            self.launch_latencies.append(latency_ms)
+            logging.info(f"Launched {item.name} (pid {pid}) {latency_ms:.2f} ms after activation.")
+        if prewarmed is not None:
+            logging.info(f"{item.name} was prewarmed {prewarmed['ms_before_launch']:.0f} ms before launch: "
+                         f"{prewarmed['files']} files, {prewarmed['bytes'] // 1024} KiB advised in "
+                         f"{prewarmed['resolve_ms'] + prewarmed['advise_ms']:.1f} ms.")
+        else:
+            logging.info(f"{item.name} was launched without prewarm.")
+        return True
+
+    def schedule_prewarm(self, item):
+        """
+        Prewarms item's launch plan once it has stayed selected for
+        PREWARM_DELAY_MS. Any earlier pending or running prewarm is cancelled;
+        None only cancels.
+        """
+        if self._prewarm_timeout_id:
+            GLib.source_remove(self._prewarm_timeout_id)
+            self._prewarm_timeout_id = None
+        self.prewarmer.cancel()
+        self._prewarm_item = item
+        if item is not None and self.prewarmer.available:
+            self._prewarm_timeout_id = GLib.timeout_add(self.PREWARM_DELAY_MS, self._on_prewarm_timeout)
+
+    def _on_prewarm_timeout(self):
+        self._prewarm_timeout_id = None
+        item = self._prewarm_item
+        if item is not None:
+            self.prewarmer.prewarm(item.plan or executable_launch_plan(item.exec_cmd))
+        return GLib.SOURCE_REMOVE
+
+    def _on_child_exited(self, pid, status, name):
+        """Child watch callback; GLib has already reaped the process."""
+        logging.debug(f"{name} (pid {pid}) exited with status {status}.")
+
+    def start_indexing(self):
+        """
+        Starts (re)building the index on a background thread.
+
+        The store is cleared and then filled in batches from the main loop,
+        so the window stays responsive and searches update as items arrive.
+        """
+        if self._index_thread and self._index_thread.is_alive():
+            logging.debug("Launcher indexing already running, not starting another pass.")
+            return
         self.list_store.remove_all()
-        desktop_entry_section = "Desktop Entry"
-        standard_dirs = [
-            "/usr/share/applications",
-            "/usr/local/share/applications",
-            os.path.expanduser("~/.local/share/applications"),
-        ]
-
-        # Use strict=False to be more lenient with file format variations
-        # interpolation=None prevents errors with '%' chars often found in Exec lines
-        parser = configparser.ConfigParser(interpolation=None, strict=False)
-
-        for directory in standard_dirs:
-            if not os.path.isdir(directory):
-                logging.warning(f"Standard directory not found or not a directory: {directory}")
-                continue # Skip if directory doesn't exist
-
-            for root, _, files in os.walk(directory):
-                for filename in files:
-                    if filename.lower().endswith(".desktop"):
-                        filepath = os.path.join(root, filename)
-                        try:
-                            # Clear previous file data and read the new one
-                            parser.clear()
-                            # Read with UTF-8 encoding, ignore errors for robustness
-                            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                                parser.read_file(f)
-
-
-                            if parser.has_section(desktop_entry_section):
-                                entry = parser[desktop_entry_section]
-
-                                # Skip if NoDisplay or Hidden is true (case-insensitive check)
-                                if entry.get("NoDisplay", "").lower() == 'true' or \
-                                   entry.get("Hidden", "").lower() == 'true':
-                                    continue
-                                
-                                # Skip if Type is not Application (if Type exists)
-                                app_type = entry.get("Type", "Application") # Default to Application if Type is missing
-                                if app_type != "Application":
-                                    continue
-
-                                name = entry.get("Name")
-                                exec_cmd = entry.get("Exec")
-                                icon = entry.get("Icon")
-                                generic_name = entry.get("GenericName") # Also useful sometimes
-                                comment = entry.get("Comment") # Also useful
-
-                                # Only add if essential fields are present
-                                if name and exec_cmd:
-                                    # Create AppItem and append to the list_store
-                                    app_item = AppItem(
-                                        name=name,
-                                        icon_name=icon, # Pass icon name string directly
-                                        exec_cmd=exec_cmd
-                                    )
-                                    self.list_store.append(app_item)
-
-                        except configparser.Error as e:
-                            # Log specific parsing errors but continue
-                            logging.warning(f"Config parsing error in {filepath}: {e}")
-                        except Exception as e: # Catch other potential errors during file processing
-                            logging.error(f"Unexpected error processing {filepath}: {e}")
-
-        # Sorting is now implicitly handled by how items are added or could be done
-        # on the ListStore if needed, but maybe not necessary for initial display.
-        # If sorting is desired, Gtk.SortListModel could be introduced later.
-        logging.info(f"Finished .desktop file indexing. Found {self.list_store.get_n_items()} applications from .desktop files.")
-
-    def _index_executables_with_rg(self):
-        """Finds executables in common PATH directories using ripgrep (rg)."""
-        logging.info("Starting executable indexing with ripgrep...")
-        # Keep track of added executables to avoid duplicates (using full path)
-        added_executables = set()
-        # Add executables found via .desktop files first to avoid overwriting them
-        # if they also happen to be found by rg. We use the full path.
-        current_items_count = self.list_store.get_n_items() # Count before adding rg results
-        for i in range(current_items_count):
-            item = self.list_store.get_item(i)
-            if isinstance(item, AppItem) and item.exec_cmd:
-                 # Basic check: if exec_cmd starts with an absolute path, add it
-                 # This isn't perfect for complex Exec= lines, but covers simple cases.
-                 cmd_parts = shlex.split(item.exec_cmd)
-                 if cmd_parts and os.path.isabs(cmd_parts[0]):
-                     added_executables.add(cmd_parts[0])
-                 # Also add the name itself if it doesn't contain '/' to potentially
-                 # catch commands run directly without path (e.g., 'firefox')
-                 # This might add false positives if a .desktop name matches an exe name
-                 # but it helps prevent adding 'firefox' again if found in /usr/bin
-                 elif cmd_parts and '/' not in cmd_parts[0]:
-                      added_executables.add(cmd_parts[0])
-
-
-        # Define standard search paths for executables
-        search_paths = [
-            os.path.expanduser("~/bin"),
-            os.path.expanduser("~/.local/bin"),
-            "/usr/local/sbin",
-            "/usr/local/bin",
-            "/usr/sbin",
-            "/usr/bin",
-            "/sbin",
-            "/bin",
-            "/snap/bin", # Common on Ubuntu systems
-            "/var/lib/flatpak/exports/bin",
-        ]
-
-        generic_icon = "application-x-executable-symbolic" # Use a symbolic icon
-
-        rg_found = False # Flag to check if rg was ever found
-
-        for path_dir in search_paths:
-            path_dir = os.path.normpath(path_dir) # Normalize path
-            if not os.path.isdir(path_dir):
-                logging.debug(f"Skipping non-existent or non-directory path: {path_dir}")
-                continue
+        self._sections = {}
+        self.indexing_status.update(0, False)
+        # Batches still queued from an earlier pass are dropped by generation
+        self._index_generation += 1
+        self._index_thread = threading.Thread(target=self._index_worker, args=(self._index_generation,), daemon=True)
+        self._index_thread.start()
+
+    def _index_worker(self, generation):
+        """Worker function executed in a separate thread. Never touches the store directly."""
+        start_time = time.monotonic()
+        self.usage_store.load()
+        mapped = self.core.open_mapped()
+        if mapped is not None:
+            # Nothing changed since the index was written: map it instead of indexing
+            GLib.idle_add(self._adopt_mapped_index, mapped, generation)
+            elapsed_ms = (time.monotonic() - start_time) * 1000
+            logging.info(f"Launcher index mapped from {self.core.mapped_path} in {elapsed_ms:.1f} ms.")
+            return
+        batch = []
+        try:
+            for directory, entries in self._index_sections():
+                batch.extend((directory, entry) for entry in entries)
+                while len(batch) >= self.INDEX_BATCH_SIZE:
+                    GLib.idle_add(self._append_batch, batch[:self.INDEX_BATCH_SIZE], False, generation)
+                    batch = batch[self.INDEX_BATCH_SIZE:]
+            self.core.save_cache()
+        except Exception as e:
+            logging.error(f"Launcher indexing failed: {e}", exc_info=True)
+        finally:
+            # Flush the remainder and report completion on the main thread
+            GLib.idle_add(self._append_batch, batch, True, generation)
+        elapsed_ms = (time.monotonic() - start_time) * 1000
+        logging.info(f"Launcher index ready in {elapsed_ms:.1f} ms ({self.core.cache.stats})")
+
+    def _index_sections(self, changed_paths=()):
+        """
+        Runs both indexers and yields their (directory, entries) sections in store order.
 
-            rg_command = [
-                "rg",
-                "--files",        # List files instead of searching content
-                "--no-ignore",    # Include ignored files (.gitignore, etc.)
-                "--hidden",       # Include hidden files
-                # "--follow",       # Follow symlinks (REMOVED due to potential filesystem loops)
-                "--max-depth", "1", # Only search top-level in these dirs
-                path_dir          # The directory to search
-            ]
+        Every visited directory is recorded in self._watch_dirs for the file monitors.
 
+        Args:
+            changed_paths: Files the monitors reported, parsed or scanned again even if they look unchanged.
+        """
+        yield from self.core.sections(changed_paths=changed_paths)
+        self._watch_dirs = self.core.watch_dirs
+
+    def _adopt_mapped_index(self, mapped, generation):
+        """Serves the store from a mapped index written by an earlier run (main thread)."""
+        if generation != self._index_generation:
+            return GLib.SOURCE_REMOVE
+        self.list_store.adopt(mapped)
+        self._sections = None
+        self._watch_dirs = list(mapped.metadata["fingerprint"]["dirs"])
+        self.indexing_status.update(self.list_store.get_n_items(), True)
+        self._update_monitors()
+        self._schedule_prefix_tables()
+        if self._refresh_pending:
+            self._schedule_refresh()
+        return GLib.SOURCE_REMOVE
+
+    def _save_mapped_index(self):
+        """Writes the current index as a mapped index file from a worker thread (main thread)."""
+        snapshot = self.app_index.snapshot()
+        thread = threading.Thread(
+            target=self.core.save_mapped,
+            args=(snapshot,),
+            # Entries spliced in meanwhile may be missing from the shared token index
+            kwargs={"still_valid": lambda: self.app_index.version == snapshot.version},
+            name="launcher-index-writer", daemon=True)
+        thread.start()
+
+    @staticmethod
+    def _entry_value(entry):
+        """The displayed and searched fields of an entry, used to detect updated items."""
+        plan = entry.get("plan")
+        unlocalized = entry.get("unlocalized") or {}
+        return (entry["name"], entry["icon"], entry["exec"],
+                entry.get("generic_name"), entry.get("comment"), tuple(entry.get("keywords") or ()),
+                unlocalized.get("name"), unlocalized.get("generic_name"), tuple(unlocalized.get("keywords") or ()),
+                (tuple(plan["argv"]), plan["path"], plan["terminal"]) if plan else None)
+
+    def _append_batch(self, batch, finished, generation):
+        """Splices a batch of (directory, entry) pairs into the store (main thread)."""
+        if generation != self._index_generation:
+            return GLib.SOURCE_REMOVE # Left over from a superseded indexing pass
+        for directory, entry in batch:
+            self._sections.setdefault(directory, []).append((entry["source"], self._entry_value(entry)))
+        entries = [entry for _, entry in batch]
+        if entries:
+            self.list_store.splice(self.list_store.get_n_items(), 0, entries)
+        self.indexing_status.update(self.list_store.get_n_items(), finished)
+        if finished:
+            self._update_monitors()
+            self._schedule_prefix_tables()
+            self._save_mapped_index()
+            if self._refresh_pending:
+                self._schedule_refresh()
+        return GLib.SOURCE_REMOVE # Ensure idle_add runs only once
+
+    # --- Live updates ---
+
+    def _update_monitors(self):
+        """Watches every indexed directory, dropping monitors for directories that went away."""
+        watch_dirs = set(self._watch_dirs)
+        for directory in list(self._monitors):
+            if directory not in watch_dirs:
+                self._monitors.pop(directory).cancel()
+        for directory in watch_dirs:
+            if directory in self._monitors:
+                continue
             try:
-                logging.debug(f"Running ripgrep in: {path_dir}")
-                result = subprocess.run(
-                    rg_command,
-                    capture_output=True,
-                    text=True,
-                    check=False, # Don't raise exception on non-zero exit
-                    encoding='utf-8', # Explicitly set encoding
-                    errors='ignore'   # Ignore potential decoding errors
-                )
-                rg_found = True # Mark rg as found if subprocess.run succeeds
-
-                if result.returncode != 0 and result.stderr:
-                     # Log rg errors, but continue (might be permission issues etc.)
-                     logging.warning(f"ripgrep command may have failed in {path_dir} (exit code {result.returncode}): {result.stderr.strip()}")
-                     # Don't 'continue' here, as rg might list some files even with errors
-
-                if result.stdout:
-                    lines = result.stdout.strip().split('\n')
-                    for line in lines:
-                        potential_exe_path = line.strip()
-                        if not potential_exe_path:
-                            continue
-
-                        # Sanity check - ensure the path is within the searched directory
-                        # Prevents issues if rg output includes parent dirs somehow
-                        if not potential_exe_path.startswith(path_dir + os.sep):
-                             continue
-
-
-                        # 1. Check if it's executable and not a directory
-                        try:
-                            is_executable = os.access(potential_exe_path, os.X_OK) and not os.path.isdir(potential_exe_path)
-                        except OSError as oe:
-                            logging.debug(f"OSError checking access for {potential_exe_path}: {oe}")
-                            continue # Skip if we can't access it
-
-                        if is_executable:
-                            # 2. Check if already added (using full path)
-                            exe_name = os.path.basename(potential_exe_path)
-                            if potential_exe_path not in added_executables and exe_name not in added_executables:
-                                try:
-                                    app_item = AppItem(
-                                        name=exe_name,
-                                        icon_name=generic_icon,
-                                        exec_cmd=potential_exe_path # Use the full path as exec_cmd
-                                    )
-                                    self.list_store.append(app_item)
-                                    added_executables.add(potential_exe_path)
-                                    added_executables.add(exe_name) # Add name too for basic collision check
-                                    logging.debug(f"Added executable: {exe_name} ({potential_exe_path})")
-                                except Exception as e:
-                                    logging.error(f"Error creating AppItem for {potential_exe_path}: {e}")
-
-
-            except FileNotFoundError:
-                # Only log the error once if rg is not found at all
-                if not rg_found:
-                    logging.error("ripgrep (rg) command not found. Please install ripgrep to find executables in PATH.")
-                # Stop trying subsequent paths if rg isn't installed
-                break
-            except Exception as e:
-                logging.error(f"Unexpected error running ripgrep or processing results in {path_dir}: {e}")
-
-        final_count = self.list_store.get_n_items()
-        added_count = final_count - current_items_count
-        logging.info(f"Finished executable indexing. Added {added_count} executables via ripgrep.")
+                monitor = Gio.File.new_for_path(directory).monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+            except GLib.Error as e:
+                logging.debug(f"Cannot monitor {directory}: {e}")
+                continue
+            monitor.connect("changed", self._on_index_dir_changed)
+            self._monitors[directory] = monitor
+        logging.debug(f"Monitoring {len(self._monitors)} launcher directories for changes.")
+
+    def _on_index_dir_changed(self, monitor, file, other_file, event_type):
+        """Coalesces bursts of file events (e.g. a package transaction) into one refresh."""
+        if event_type == Gio.FileMonitorEvent.CHANGES_DONE_HINT:
+            return
+        logging.debug(f"Launcher directory change: {file.get_path()} ({event_type.value_nick})")
+        # A file edited in place or chmod'ed leaves its directory's mtime alone, so it is named explicitly
+        for changed_file in (file, other_file):
+            if changed_file is not None and changed_file.get_path():
+                self._changed_paths.add(changed_file.get_path())
+        self._refresh_pending = True
+        if self._index_thread and self._index_thread.is_alive():
+            return # Picked up once the running pass has finished
+        self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        """(Re)starts the coalescing timer, so the refresh runs once events have settled."""
+        if self._refresh_timeout_id:
+            GLib.source_remove(self._refresh_timeout_id)
+        self._refresh_timeout_id = GLib.timeout_add(self.REFRESH_COALESCE_MS, self._on_refresh_timeout)
+
+    def _on_refresh_timeout(self):
+        self._refresh_timeout_id = None
+        if self._index_thread and self._index_thread.is_alive():
+            return GLib.SOURCE_REMOVE # The running pass reschedules when it finishes
+        self._refresh_pending = False
+        changed_paths, self._changed_paths = self._changed_paths, set()
+        self._index_thread = threading.Thread(target=self._refresh_worker, args=(self._index_generation, changed_paths),
+                                              daemon=True)
+        self._index_thread.start()
+        return GLib.SOURCE_REMOVE
+
+    def _refresh_worker(self, generation, changed_paths):
+        """Re-runs the indexers through the cache, so only changed files are parsed or scanned again."""
+        start_time = time.monotonic()
+        try:
+            sections = list(self._index_sections(changed_paths))
+            self.core.save_cache()
+        except Exception as e:
+            logging.error(f"Launcher index refresh failed: {e}", exc_info=True)
+            return # The store keeps what it has
+        # Applied even if empty: every indexed directory may have gone away
+        GLib.idle_add(self._apply_sections, sections, generation)
+        elapsed_ms = (time.monotonic() - start_time) * 1000
+        logging.info(f"Launcher index refreshed in {elapsed_ms:.1f} ms ({self.core.cache.stats})")
+
+    def _apply_sections(self, sections, generation):
+        """
+        Applies a refreshed index to the store (main thread).
+
+        Each section is diffed against what the store holds for that directory:
+        vanished items are removed, changed items replaced in place and new items
+        spliced in at the end of the section.
+        """
+        if generation != self._index_generation:
+            return GLib.SOURCE_REMOVE
+        if self._sections is None:
+            # The store serves a mapped index, which is replaced as a whole
+            entries = [entry for _, section in sections for entry in section]
+            self.list_store.splice(0, self.list_store.get_n_items(), entries)
+            self._sections = {
+                directory: [(entry["source"], self._entry_value(entry)) for entry in section]
+                for directory, section in sections
+            }
+            logging.info(f"Launcher index replaced the mapped index with {len(entries)} entries.")
+            self._finish_update(True)
+            return GLib.SOURCE_REMOVE
+        removed = updated = added = 0
+        # Drop whole sections for directories that are no longer indexed
+        refreshed_dirs = {directory for directory, _ in sections}
+        offset = 0
+        for directory in list(self._sections):
+            count = len(self._sections[directory])
+            if directory in refreshed_dirs:
+                offset += count
+                continue
+            self.list_store.splice(offset, count, [])
+            del self._sections[directory]
+            removed += count
+
+        offset = 0
+        updated_sections = {} # Rebuilt so its order keeps matching the store
+        for directory, entries in sections:
+            old = self._sections.get(directory, [])
+            new_entries = {entry["source"]: entry for entry in entries}
+            # Walk back to front so the positions of earlier items stay valid
+            for pos in range(len(old) - 1, -1, -1):
+                source, value = old[pos]
+                entry = new_entries.get(source)
+                if entry is None:
+                    self.list_store.splice(offset + pos, 1, [])
+                    del old[pos]
+                    removed += 1
+                elif self._entry_value(entry) != value:
+                    self.list_store.splice(offset + pos, 1, [entry])
+                    old[pos] = (source, self._entry_value(entry))
+                    updated += 1
+            known_sources = {source for source, _ in old}
+            new_items = [entry for entry in entries if entry["source"] not in known_sources]
+            if new_items:
+                self.list_store.splice(offset + len(old), 0, new_items)
+                old.extend((entry["source"], self._entry_value(entry)) for entry in new_items)
+                added += len(new_items)
+            updated_sections[directory] = old
+            offset += len(old)
+        self._sections = updated_sections
+
+        logging.info(f"Launcher index updated: {added} added, {removed} removed, {updated} updated.")
+        self._finish_update(bool(added or removed or updated))
+        return GLib.SOURCE_REMOVE
+
+    def _finish_update(self, changed):
+        """Follow-up of an applied refresh (main thread)."""
+        self.indexing_status.update(self.list_store.get_n_items(), True)
+        self._update_monitors()
+        if changed:
+            self._schedule_prefix_tables()
+        # Written even without changes to the entries, so the new directory and file times are recorded
+        self._save_mapped_index()
+        if self._refresh_pending:
+            self._schedule_refresh()
+
+    # --- Prefix tables ---
+
+    def _schedule_prefix_tables(self):
+        """(Re)starts the timer that rebuilds the prefix tables once the index has settled."""
+        if self._prefix_table_timeout_id:
+            GLib.source_remove(self._prefix_table_timeout_id)
+        self._prefix_table_timeout_id = GLib.timeout_add(self.PREFIX_TABLE_DELAY_MS, self._on_prefix_table_timeout)
+
+    def _on_prefix_table_timeout(self):
+        self._prefix_table_timeout_id = None
+        # A build still running for older data stops at its next check
+        self._prefix_table_generation += 1
+        # The snapshot must be taken here, on the thread that modifies the index
+        snapshot = self.app_index.snapshot()
+        thread = threading.Thread(target=self._prefix_table_worker, args=(snapshot, self._prefix_table_generation),
+                                  name="launcher-prefix-tables", daemon=True)
+        thread.start()
+        return GLib.SOURCE_REMOVE
+
+    def _prefix_table_worker(self, snapshot, generation):
+        """Precomputes the results of the empty query and short prefixes (worker thread)."""
+        start_time = time.monotonic()
+        try:
+            count = self.search_engine.build_prefix_tables(
+                snapshot, cancelled=lambda: generation != self._prefix_table_generation)
+        except SearchCancelled:
+            logging.debug("Launcher prefix tables superseded, build stopped.")
+            return
+        except Exception as e:
+            logging.error(f"Building the launcher prefix tables failed: {e}", exc_info=True)
+            return
+        elapsed_ms = (time.monotonic() - start_time) * 1000
+        logging.info(f"Launcher prefix tables ready: {count} queries precomputed in {elapsed_ms:.1f} ms.")
+        GLib.idle_add(self._on_prefix_tables_ready)
+
+    def _on_prefix_tables_ready(self):
+        self.indexing_status.emit('prefix-tables-ready')
+        return GLib.SOURCE_REMOVE
 
 
 # Add other necessary methods like handle_input, etc., later
\ No newline at end of file
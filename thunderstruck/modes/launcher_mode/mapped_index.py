@@ -0,0 +1,370 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from thunderstruck.modes.launcher_mode.search import KEY_SEPARATOR
+from thunderstruck.modes.launcher_mode.token_index import FIELD_NAME, TokenIndex, is_typo_token, single_deletes
+
+# Bump whenever the file layout changes so older files are ignored
+FORMAT_VERSION = 1
+MAGIC = b"TSIX"
+INDEX_FILENAME = "launcher-index.bin"
+# magic, format version, length of the JSON metadata that follows
+_HEADER = struct.Struct("<4sII")
+# Sections start at multiples of this, so the uint32 arrays are aligned
+_ALIGNMENT = 8
+# Posting values pack the row and the field mask (which fits 4 bits) into one uint32
+_MASK_BITS = 4
+
+
+def default_index_path() -> str:
+    """Returns the mapped launcher index location under $XDG_CACHE_HOME."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "thunderstruck", INDEX_FILENAME)
+
+
+def _padded(length: int) -> int:
+    return (length + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class _StringColumn:
+    """
+    Read-only sequence of strings stored as one UTF-8 blob and the byte
+    offsets between them (one more than there are strings).
+
+    A string is only decoded when it is accessed.
+    """
+
+    def __init__(self, data, offsets, convert=None, strip: int = 0):
+        """
+        Args:
+            data: memoryview of the UTF-8 blob.
+            offsets: uint32 memoryview, string i is data[offsets[i]:offsets[i + 1]].
+            convert: Optional callable applied to each decoded string.
+            strip: Bytes dropped from the end of each string (a separator).
+        """
+        self._data = data
+        self._offsets = offsets
+        self._convert = convert
+        self._strip = strip
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("column index out of range")
+        value = str(self._data[self._offsets[i]:self._offsets[i + 1] - self._strip], 'utf-8')
+        return self._convert(value) if self._convert else value
+
+
+class _SortedTable:
+    """Sorted strings, each with a list of uint32 values, as stored in a mapped index."""
+
+    def __init__(self, keys: _StringColumn, ranges, values):
+        self.keys = keys
+        self._ranges = ranges # uint32, the values of key i are values[ranges[i]:ranges[i + 1]]
+        self._values = values
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, key: str):
+        """Returns the position of key, or None."""
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return i
+        return None
+
+    def values_at(self, i: int):
+        return self._values[self._ranges[i]:self._ranges[i + 1]]
+
+    def get(self, key: str):
+        i = self.find(key)
+        return self.values_at(i) if i is not None else ()
+
+
+class MappedTokenIndex(TokenIndex):
+    """
+    TokenIndex read from a mapped file. Entry ids are rows.
+
+    Lookups bisect the sorted token and deletion variant tables of the file
+    instead of Python dicts; add() and remove() are not supported.
+    """
+
+    def __init__(self, tokens: _SortedTable, deletes: _SortedTable):
+        super().__init__()
+        self._tokens = tokens
+        self._deletes_table = deletes
+
+    def add(self, entry_id: int, tokens: dict):
+        raise TypeError("A mapped token index is read-only")
+
+    def remove(self, entry_id: int, tokens: dict):
+        raise TypeError("A mapped token index is read-only")
+
+    def postings(self) -> list:
+        return [(self._tokens.keys[i], self._unpack(self._tokens.values_at(i))) for i in range(len(self._tokens))]
+
+    @staticmethod
+    def _unpack(values) -> list:
+        mask_bits = (1 << _MASK_BITS) - 1
+        return [(value >> _MASK_BITS, value & mask_bits) for value in values]
+
+    def _posting_items(self, token: str) -> list:
+        return self._unpack(self._tokens.get(token))
+
+    def _tokens_with_prefix(self, prefix: str):
+        keys = self._tokens.keys
+        i = bisect_left(keys, prefix)
+        while i < len(keys):
+            token = keys[i]
+            if not token.startswith(prefix):
+                break
+            yield token
+            i += 1
+
+    def _variant_tokens(self, variant: str):
+        keys = self._tokens.keys
+        return [keys[i] for i in self._deletes_table.get(variant)]
+
+
+class MappedIndex:
+    """
+    Launcher index loaded from a binary file with mmap.
+
+    The file holds, per column (sources, names, icons, execs, launch plans and
+    the normalized search keys), one UTF-8 string table with uint32 offsets,
+    plus sorted tables for the tokens, their single-deletion variants and the
+    sources. Opening it reads only the header: pages are faulted in when
+    accessed, and processes mapping the same file share them.
+
+    It offers the columns and search helpers of an AppIndexSnapshot, so a
+    SearchEngine runs on it directly and AppIndex.adopt() serves it to the
+    list models. Strings are decoded on access, no per-entry objects are
+    created up front. metadata holds what write_index() was given, e.g. the
+    indexer fingerprint telling whether the file is still current.
+    """
+
+    def __init__(self, path: str):
+        """
+        Raises:
+            OSError: If the file cannot be opened or mapped.
+            ValueError: If it is not a mapped index of this format.
+        """
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        if len(buffer) < _HEADER.size:
+            raise ValueError("File too short")
+        magic, version, metadata_length = _HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not a launcher index of format {FORMAT_VERSION}")
+        header_end = _HEADER.size + metadata_length
+        header = json.loads(str(buffer[_HEADER.size:header_end], 'utf-8'))
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError("Written on a machine of another byte order")
+        self.metadata = header["metadata"]
+        data_start = _padded(header_end)
+        sections = self._sections = header["sections"]
+
+        def section(name, typecode=None):
+            offset, length = sections[name]
+            view = buffer[data_start + offset:data_start + offset + length]
+            return view.cast(typecode) if typecode else view
+
+        def column(name, convert=None, strip=0):
+            return _StringColumn(section(f"{name}.data"), section(f"{name}.offsets", 'I'), convert, strip)
+
+        def table(name):
+            return _SortedTable(column(f"{name}.keys"), section(f"{name}.ranges", 'I'), section(f"{name}.values", 'I'))
+
+        self.version = 0 # Replaced by AppIndex.adopt()
+        self.sources = column("sources")
+        self.names = column("names")
+        self.icons = column("icons", convert=lambda icon: icon or None)
+        self.execs = column("execs")
+        self.plans = column("plans", convert=lambda plan: json.loads(plan) if plan else None)
+        # Keys are stored with their separator, so the whole blob is the joined key string
+        self.search_keys = column("keys", strip=len(KEY_SEPARATOR))
+        self._keys_data = section("keys.data")
+        self._key_starts = section("keys.starts", 'I')
+        self.ids = range(len(self.names))
+        self.tokens = MappedTokenIndex(table("tokens"), table("deletes"))
+        self.tokens_version = self.tokens.version # Read-only, it never moves on
+        self._sources = table("sources_sorted")
+
+    def __len__(self):
+        return len(self.names)
+
+    def snapshot(self):
+        """A mapped index never changes, so it is its own snapshot."""
+        return self
+
+    def row_of(self, entry_id: int):
+        return entry_id if 0 <= entry_id < len(self) else None
+
+    def row_of_source(self, source: str):
+        rows = self._sources.get(source)
+        return rows[0] if len(rows) else None
+
+    def stats(self) -> dict:
+        """Returns the sizes of the index: entry, token and typo variant counts, bytes per section and in total."""
+        return {
+            "entries": len(self),
+            "tokens": len(self.tokens._tokens),
+            "typo_variants": len(self.tokens._deletes_table),
+            "bytes": len(self._mmap),
+            "section_bytes": {name: length for name, (_, length) in self._sections.items()},
+        }
+
+    def joined_keys(self):
+        """Returns the joined search keys with a single decode, and their start offsets."""
+        return str(self._keys_data[:-len(KEY_SEPARATOR)], 'utf-8') if len(self) else '', self._key_starts
+
+
+class _Writer:
+    """Lays out the sections of a mapped index."""
+
+    def __init__(self):
+        self.sections = {} # name -> (offset, length)
+        self.chunks = []
+        self.size = 0
+
+    def add(self, name: str, data: bytes):
+        self.sections[name] = (self.size, len(data))
+        padding = _padded(len(data)) - len(data)
+        self.chunks.append(data + b"\0" * padding)
+        self.size += len(data) + padding
+
+    def add_column(self, name: str, strings, separator: str = ""):
+        offsets = array('I', [0])
+        parts = []
+        size = 0
+        for string in strings:
+            encoded = (string + separator).encode('utf-8')
+            parts.append(encoded)
+            size += len(encoded)
+            offsets.append(size)
+        self.add(f"{name}.data", b"".join(parts))
+        self.add(f"{name}.offsets", offsets.tobytes())
+
+    def add_table(self, name: str, table: dict):
+        """Adds a str -> list of uint32 dict as a sorted table."""
+        keys = sorted(table)
+        ranges = array('I', [0])
+        values = array('I')
+        for key in keys:
+            values.extend(table[key])
+            ranges.append(len(values))
+        self.add_column(f"{name}.keys", keys)
+        self.add(f"{name}.ranges", ranges.tobytes())
+        self.add(f"{name}.values", values.tobytes())
+
+
+def write_index(path: str, snapshot, metadata: dict, still_valid=None) -> bool:
+    """
+    Writes an AppIndexSnapshot as a mapped index file, atomically.
+
+    Can run on a worker thread. The snapshot's TokenIndex is shared with the
+    live index, so the file is only put in place if still_valid() (when
+    given) confirms the index has not changed while it was written. Replacing
+    the file does not disturb processes that have the old one mapped.
+
+    Args:
+        path: Destination file.
+        snapshot: The AppIndexSnapshot to store.
+        metadata: JSON-serializable dict, available as MappedIndex.metadata.
+        still_valid: Optional callable, returning False discards the file.
+
+    Returns:
+        bool: True if the file was written.
+    """
+    writer = _Writer()
+    writer.add_column("sources", snapshot.sources)
+    writer.add_column("names", snapshot.names)
+    writer.add_column("icons", (icon or "" for icon in snapshot.icons))
+    writer.add_column("execs", snapshot.execs)
+    writer.add_column("plans", (json.dumps(plan, separators=(',', ':')) if plan else "" for plan in snapshot.plans))
+    writer.add_column("keys", snapshot.search_keys, separator=KEY_SEPARATOR)
+    _, starts = snapshot.joined_keys()
+    writer.add("keys.starts", array('I', starts).tobytes())
+
+    tokens = {}
+    deletes = {}
+    for token, items in snapshot.tokens.postings():
+        rows = []
+        name_token = False
+        for entry_id, mask in items:
+            row = snapshot.row_of(entry_id)
+            if row is not None: # Not added after the snapshot was taken
+                rows.append(row << _MASK_BITS | mask)
+                name_token = name_token or bool(mask & FIELD_NAME)
+        if rows:
+            tokens[token] = sorted(rows)
+            if name_token and is_typo_token(token):
+                for variant in single_deletes(token):
+                    deletes.setdefault(variant, []).append(token)
+    token_positions = {token: i for i, token in enumerate(sorted(tokens))}
+    writer.add_table("tokens", tokens)
+    writer.add_table("deletes", {
+        variant: sorted(token_positions[token] for token in variant_tokens)
+        for variant, variant_tokens in deletes.items()
+    })
+    sources = {}
+    for row, source in enumerate(snapshot.sources):
+        sources.setdefault(source, []).append(row)
+    writer.add_table("sources_sorted", sources)
+
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "sections": writer.sections,
+        "metadata": metadata,
+    }, separators=(',', ':')).encode('utf-8')
+    header_end = _HEADER.size + len(header)
+
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            f.write(b"\0" * (_padded(header_end) - header_end))
+            for chunk in writer.chunks:
+                f.write(chunk)
+        if still_valid is not None and not still_valid():
+            os.unlink(tmp_path)
+            logging.debug("Launcher index changed while it was written, discarding the mapped index.")
+            return False
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"Could not write the mapped launcher index {path}: {e}")
+        return False
+    logging.info(f"Saved mapped launcher index with {len(snapshot)} entries to {path}")
+    return True
+
+
+def open_index(path: str = None):
+    """
+    Maps a launcher index file.
+
+    Returns:
+        MappedIndex | None: None if the file is missing, unreadable or of another format.
+    """
+    path = path or default_index_path()
+    try:
+        return MappedIndex(path)
+    except FileNotFoundError:
+        logging.info(f"No mapped launcher index at {path}.")
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Ignoring unreadable mapped launcher index {path}: {e}")
+    return None
@@ -0,0 +1,392 @@
+import glob
+import logging
+import os
+import shutil
+import struct
+import threading
+import time
+
+from thunderstruck.modes.launcher_mode.launch_plan import plan_argv
+
+# Upper bounds for one prewarm: files advised, bytes advised and time spent resolving
+PREWARM_MAX_FILES = 128
+PREWARM_MAX_BYTES = 512 * 1024 * 1024
+PREWARM_BUDGET_MS = 100
+# Shebang interpreters followed from a script, e.g. script -> env -> python3
+MAX_INTERPRETER_DEPTH = 2
+
+# Searched after DT_RPATH, $LD_LIBRARY_PATH and DT_RUNPATH, like ld.so does
+LD_SO_CONF = "/etc/ld.so.conf"
+DEFAULT_LIBRARY_DIRS = ["/lib64", "/usr/lib64", "/lib", "/usr/lib"]
+
+# ELF constants, see elf(5)
+ELF_MAGIC = b"\x7fELF"
+PT_LOAD = 1
+PT_DYNAMIC = 2
+PT_INTERP = 3
+DT_NULL = 0
+DT_NEEDED = 1
+DT_STRTAB = 5
+DT_RPATH = 15
+DT_RUNPATH = 29
+
+_library_dirs = None
+
+
+class PrewarmCancelled(Exception):
+    """Raised inside a prewarm when its token was cancelled."""
+
+
+def _read_cstring(f, offset: int) -> str:
+    data = os.pread(f.fileno(), 256, offset)
+    return data.split(b"\0", 1)[0].decode("utf-8", "replace")
+
+
+def read_elf_dependencies(path: str):
+    """
+    Reads what the dynamic loader needs to start an ELF file.
+
+    Returns:
+        dict | None: {"class": 1 (32-bit) or 2 (64-bit), "interp": str | None,
+                      "needed": [str], "rpath": [str], "runpath": [str]}, or None
+                      if path is not an ELF file or cannot be read.
+    """
+    try:
+        with open(path, "rb") as f:
+            ident = f.read(64)
+            if len(ident) < 52 or not ident.startswith(ELF_MAGIC):
+                return None
+            elf_class = ident[4]
+            endian = "<" if ident[5] == 1 else ">"
+            if elf_class == 2:
+                phoff, = struct.unpack_from(endian + "Q", ident, 32)
+                phentsize, phnum = struct.unpack_from(endian + "HH", ident, 54)
+                phdr_format, dyn_format = endian + "IIQQQQQQ", endian + "qQ"
+            elif elf_class == 1:
+                phoff, = struct.unpack_from(endian + "I", ident, 28)
+                phentsize, phnum = struct.unpack_from(endian + "HH", ident, 42)
+                phdr_format, dyn_format = endian + "IIIIIIII", endian + "iI"
+            else:
+                return None
+
+            loads = [] # (vaddr, filesz, offset) to translate addresses to file offsets
+            dynamic = None # (offset, size)
+            interp = None
+            headers = os.pread(f.fileno(), phentsize * phnum, phoff)
+            for i in range(phnum):
+                fields = struct.unpack_from(phdr_format, headers, i * phentsize)
+                if elf_class == 2:
+                    p_type, _, p_offset, p_vaddr, _, p_filesz = fields[:6]
+                else:
+                    p_type, p_offset, p_vaddr, _, p_filesz = fields[:5]
+                if p_type == PT_LOAD:
+                    loads.append((p_vaddr, p_filesz, p_offset))
+                elif p_type == PT_DYNAMIC:
+                    dynamic = (p_offset, p_filesz)
+                elif p_type == PT_INTERP:
+                    interp = _read_cstring(f, p_offset)
+
+            result = {"class": elf_class, "interp": interp, "needed": [], "rpath": [], "runpath": []}
+            if dynamic is None:
+                return result # Statically linked
+
+            dyn_size = struct.calcsize(dyn_format)
+            data = os.pread(f.fileno(), dynamic[1], dynamic[0])
+            strtab = None
+            names = [] # (tag, string table offset)
+            for offset in range(0, len(data) - dyn_size + 1, dyn_size):
+                tag, value = struct.unpack_from(dyn_format, data, offset)
+                if tag == DT_NULL:
+                    break
+                if tag == DT_STRTAB:
+                    strtab = value
+                elif tag in (DT_NEEDED, DT_RPATH, DT_RUNPATH):
+                    names.append((tag, value))
+            if strtab is None:
+                return result
+            for vaddr, filesz, file_offset in loads:
+                if vaddr <= strtab < vaddr + filesz:
+                    strtab = strtab - vaddr + file_offset
+                    break
+            else:
+                return result
+
+            for tag, value in names:
+                string = _read_cstring(f, strtab + value)
+                if tag == DT_NEEDED:
+                    result["needed"].append(string)
+                else:
+                    result["rpath" if tag == DT_RPATH else "runpath"].extend(d for d in string.split(":") if d)
+            return result
+    except (OSError, struct.error) as e:
+        logging.debug(f"Cannot read ELF headers of {path}: {e}")
+        return None
+
+
+def _parse_ld_so_conf(path: str, seen: set) -> list:
+    directories = []
+    if path in seen:
+        return directories
+    seen.add(path)
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return directories
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith("include "):
+            pattern = line[len("include "):].strip()
+            if not os.path.isabs(pattern):
+                pattern = os.path.join(os.path.dirname(path), pattern)
+            for included in sorted(glob.glob(pattern)):
+                directories.extend(_parse_ld_so_conf(included, seen))
+        elif os.path.isabs(line):
+            directories.append(line)
+    return directories
+
+
+def library_dirs() -> list:
+    """Returns the system library directories from ld.so.conf and the defaults; read once."""
+    global _library_dirs
+    if _library_dirs is None:
+        directories = _parse_ld_so_conf(LD_SO_CONF, set()) + DEFAULT_LIBRARY_DIRS
+        _library_dirs = [d for i, d in enumerate(directories) if d not in directories[:i] and os.path.isdir(d)]
+    return _library_dirs
+
+
+def _elf_class(path: str):
+    try:
+        with open(path, "rb") as f:
+            ident = f.read(5)
+    except OSError:
+        return None
+    return ident[4] if ident.startswith(ELF_MAGIC) else None
+
+
+def _find_library(name: str, elf_class: int, directories: list):
+    if "/" in name:
+        return name if os.path.isfile(name) else None
+    for directory in directories:
+        candidate = os.path.join(directory, name)
+        # Skip libraries of the other word size, as the loader does
+        if os.path.isfile(candidate) and _elf_class(candidate) == elf_class:
+            return candidate
+    return None
+
+
+def _shebang_interpreter(path: str):
+    """Returns the absolute path of a script's interpreter, resolving '#!/usr/bin/env prog'."""
+    try:
+        with open(path, "rb") as f:
+            line = f.readline(256)
+    except OSError:
+        return None
+    if not line.startswith(b"#!"):
+        return None
+    words = line[2:].decode("utf-8", "replace").split()
+    if not words:
+        return None
+    if os.path.basename(words[0]) == "env":
+        args = [word for word in words[1:] if not word.startswith("-") and "=" not in word]
+        return shutil.which(args[0]) if args else None
+    return words[0]
+
+
+def resolve_prewarm_files(plan: dict, check=None, deadline: float = None) -> list:
+    """
+    Returns the files read when a launch plan starts: the program (with its
+    script interpreters), its dynamic loader and its shared libraries,
+    breadth-first, so the most important files come first.
+
+    Args:
+        plan: A launch plan, see launch_plan.py.
+        check: Callable run between files that may raise PrewarmCancelled.
+        deadline: time.perf_counter() value after which the files found so far are returned.
+
+    Returns:
+        list: Real paths, without duplicates, at most PREWARM_MAX_FILES.
+    """
+    try:
+        argv = plan_argv(plan)
+    except FileNotFoundError:
+        return []
+    # Skip the 'sh -c cd' wrapper of entries with a working directory, the shell is warm anyway
+    program = argv[4] if argv[0] == "/bin/sh" and len(argv) > 4 and plan.get("path") else argv[0]
+    program = program if os.path.isabs(program) else shutil.which(program)
+    if not program:
+        return []
+
+    files = []
+    seen = set()
+    queue = [] # ELF files whose dependencies are still to be read
+    for _ in range(MAX_INTERPRETER_DEPTH + 1):
+        real = os.path.realpath(program)
+        if real in seen or not os.path.isfile(real):
+            break
+        seen.add(real)
+        files.append(real)
+        interpreter = _shebang_interpreter(real)
+        if interpreter is None:
+            queue.append(real)
+            break
+        program = interpreter
+
+    ld_library_path = [d for d in os.environ.get("LD_LIBRARY_PATH", "").split(":") if d]
+    while queue and len(files) < PREWARM_MAX_FILES:
+        if check:
+            check()
+        if deadline is not None and time.perf_counter() > deadline:
+            logging.debug(f"Prewarm budget exhausted after {len(files)} files.")
+            break
+        path = queue.pop(0)
+        elf = read_elf_dependencies(path)
+        if elf is None:
+            continue
+        origin = os.path.dirname(path)
+        runpath = [d.replace("${ORIGIN}", origin).replace("$ORIGIN", origin) for d in elf["runpath"]]
+        rpath = [d.replace("${ORIGIN}", origin).replace("$ORIGIN", origin) for d in elf["rpath"]]
+        # DT_RPATH is only used when there is no DT_RUNPATH, and searched before $LD_LIBRARY_PATH
+        directories = ld_library_path + runpath if runpath else rpath + ld_library_path
+        directories += library_dirs()
+        dependencies = ([elf["interp"]] if elf["interp"] else []) + elf["needed"]
+        for name in dependencies:
+            library = _find_library(name, elf["class"], directories)
+            if library is None:
+                continue
+            real = os.path.realpath(library)
+            if real not in seen:
+                seen.add(real)
+                files.append(real)
+                queue.append(real)
+    return files[:PREWARM_MAX_FILES]
+
+
+def advise_willneed(paths: list, check=None, max_bytes: int = PREWARM_MAX_BYTES) -> tuple:
+    """
+    Asks the kernel to read files into the page cache ahead of time with
+    posix_fadvise(POSIX_FADV_WILLNEED), which starts readahead and returns
+    without waiting for it.
+
+    Returns:
+        tuple: (files advised, bytes advised)
+    """
+    advised = 0
+    advised_bytes = 0
+    for path in paths:
+        if check:
+            check()
+        try:
+            fd = os.open(path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+        except OSError:
+            continue
+        try:
+            size = os.fstat(fd).st_size
+            if advised_bytes + size > max_bytes:
+                break
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            advised += 1
+            advised_bytes += size
+        except OSError as e:
+            logging.debug(f"posix_fadvise failed for {path}: {e}")
+        finally:
+            os.close(fd)
+    return advised, advised_bytes
+
+
+class LaunchPrewarmer:
+    """
+    Speculatively reads the files of a launch plan into the page cache before
+    it is launched, so a cold start of a large application does not wait for
+    the disk.
+
+    prewarm() runs on a background thread and supersedes the previous one,
+    which is cancelled at its next file. Each run is bounded by
+    PREWARM_MAX_FILES, PREWARM_MAX_BYTES and PREWARM_BUDGET_MS of resolving.
+    Does nothing on platforms without posix_fadvise.
+
+    The outcome of every run is kept, so the launch of a prewarmed plan can
+    be logged with how long before the launch its prewarm finished.
+    """
+
+    # Finished prewarms remembered for launched_after_prewarm()
+    HISTORY_SIZE = 16
+
+    def __init__(self):
+        self.available = hasattr(os, "posix_fadvise")
+        self._lock = threading.Lock()
+        self._cancel = None # threading.Event of the running prewarm
+        self._results = {} # plan key -> result dict of a finished prewarm
+        self.stats = {"prewarms": 0, "cancelled": 0, "files": 0, "bytes": 0}
+
+    @staticmethod
+    def _key(plan: dict) -> tuple:
+        return (tuple(plan["argv"]), plan.get("path"), plan.get("terminal"))
+
+    def prewarm(self, plan: dict):
+        """Starts prewarming a plan on a background thread, cancelling the running prewarm."""
+        if not self.available or not plan:
+            return
+        self.cancel()
+        cancel = threading.Event()
+        with self._lock:
+            self._cancel = cancel
+        thread = threading.Thread(target=self._worker, args=(plan, cancel), name="launcher-prewarm", daemon=True)
+        thread.start()
+
+    def cancel(self):
+        """Cancels the running prewarm, e.g. because the selection changed."""
+        with self._lock:
+            if self._cancel is not None:
+                self._cancel.set()
+                self._cancel = None
+
+    def _worker(self, plan, cancel):
+        start_time = time.perf_counter()
+
+        def check():
+            if cancel.is_set():
+                raise PrewarmCancelled()
+
+        try:
+            files = resolve_prewarm_files(plan, check, start_time + PREWARM_BUDGET_MS / 1000)
+            resolved_at = time.perf_counter()
+            advised, advised_bytes = advise_willneed(files, check)
+        except PrewarmCancelled:
+            with self._lock:
+                self.stats["cancelled"] += 1
+            logging.debug(f"Prewarm of {plan['argv'][0]} cancelled.")
+            return
+
+        finished_at = time.perf_counter()
+        result = {
+            "files": advised,
+            "bytes": advised_bytes,
+            "resolve_ms": (resolved_at - start_time) * 1000,
+            "advise_ms": (finished_at - resolved_at) * 1000,
+            "finished_at": finished_at,
+        }
+        with self._lock:
+            self._results[self._key(plan)] = result
+            while len(self._results) > self.HISTORY_SIZE:
+                self._results.pop(next(iter(self._results)))
+            self.stats["prewarms"] += 1
+            self.stats["files"] += advised
+            self.stats["bytes"] += advised_bytes
+            if self._cancel is cancel:
+                self._cancel = None
+        logging.debug(f"Prewarmed {plan['argv'][0]}: {advised} files, {advised_bytes} bytes in "
+                      f"{result['resolve_ms']:.1f} + {result['advise_ms']:.1f} ms.")
+
+    def launched_after_prewarm(self, plan: dict):
+        """
+        Returns the result of the last finished prewarm of a plan that is being
+        launched, with 'ms_before_launch' added, or None if it was not prewarmed.
+        """
+        with self._lock:
+            result = self._results.get(self._key(plan))
+        if result is None:
+            return None
+        return dict(result, ms_before_launch=(time.perf_counter() - result["finished_at"]) * 1000)
@@ -0,0 +1,537 @@
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_right
+from collections import OrderedDict
+
+# Separates the keys in the joined search text; cannot appear in names or file names
+KEY_SEPARATOR = '\0'
+
+# Base scores per match kind, best first. Within a kind shorter names and
+# earlier matches win; see SearchEngine.score().
+SCORE_EXACT = 1000
+SCORE_PREFIX = 900
+SCORE_WORD_PREFIX = 800
+SCORE_ACRONYM = 700
+SCORE_SUBSTRING = 600
+SCORE_SUBSEQUENCE = 400
+# Installed applications rank above bare PATH executables with a similar match
+DESKTOP_APP_BONUS = 50
+# Frecency bonus per (decayed) launch and its cap, enough to reorder within
+# a match kind and lift an often used entry over the next kind, but no further
+FRECENCY_BONUS_PER_LAUNCH = 25
+MAX_FRECENCY_BONUS = 150
+
+# Misspelled matches are only looked up when fewer rows than this match as typed
+TYPO_MIN_RESULTS = 3
+
+# Number of recent queries whose candidate rows are kept for refinement
+CANDIDATE_CACHE_SIZE = 32
+# A parent set larger than this fraction of the index is cheaper to re-scan in one pass
+REFINE_MAX_FRACTION = 0.5
+# Long loops check for cancellation once per this many rows
+CANCEL_CHECK_INTERVAL = 512
+# Results precomputed per short query, the largest launcher-max-results
+PREFIX_TABLE_SIZE = 20
+# Two-character queries get a table only for the most common word-start bigrams
+PREFIX_TABLE_MAX_BIGRAMS = 256
+
+
+class SearchCancelled(Exception):
+    """Raised by SearchEngine.search() when its cancelled callback returns True."""
+
+
+def normalize(text: str) -> str:
+    """Casefolds text and strips diacritics, e.g. 'Écran' -> 'ecran'."""
+    folded = text.casefold()
+    if folded.isascii():
+        return folded
+    decomposed = unicodedata.normalize('NFKD', folded)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _normalize_with_offsets(text: str):
+    """Normalizes text and returns, for every normalized char, the index of its source char."""
+    chars = []
+    offsets = []
+    for i, char in enumerate(text):
+        piece = normalize(char)
+        chars.append(piece)
+        offsets.extend([i] * len(piece))
+    return ''.join(chars), offsets
+
+
+def word_starts(text: str) -> list:
+    """
+    Returns the indexes in text where a word starts.
+
+    Words are separated by non-alphanumeric characters, and a lower-to-upper
+    case change starts a new word too ('LibreOffice' -> [0, 5]).
+    """
+    starts = []
+    previous = ''
+    for i, char in enumerate(text):
+        if char.isalnum() and (not previous or not previous.isalnum() or (previous.islower() and char.isupper())):
+            starts.append(i)
+        previous = char
+    return starts
+
+
+def _is_word_start(text: str, i: int) -> bool:
+    """Tells whether a word starts at index i of text, see word_starts()."""
+    char = text[i]
+    if not char.isalnum():
+        return False
+    if i == 0:
+        return True
+    previous = text[i - 1]
+    return not previous.isalnum() or (previous.islower() and char.isupper())
+
+
+def _is_subsequence(query: str, text: str) -> bool:
+    it = iter(text)
+    return all(char in it for char in query)
+
+
+def _subsequence_positions(query: str, text: str) -> list:
+    """Greedy positions of query's characters in text, or None if it is not a subsequence."""
+    positions = []
+    start = 0
+    for char in query:
+        pos = text.find(char, start)
+        if pos == -1:
+            return None
+        positions.append(pos)
+        start = pos + 1
+    return positions
+
+
+def _positions_to_ranges(positions) -> list:
+    """Merges sorted positions into (start, end) ranges, end exclusive."""
+    ranges = []
+    for pos in positions:
+        if ranges and ranges[-1][1] == pos:
+            ranges[-1] = (ranges[-1][0], pos + 1)
+        else:
+            ranges.append((pos, pos + 1))
+    return ranges
+
+
+class SearchEngine:
+    """
+    Ranked search over an AppIndex.
+
+    Candidates are found with one regular expression run over all search keys
+    joined into a single string, so the scan over the index happens in C, and
+    with the index's TokenIndex for words of the other searchable fields.
+    Candidates are then scored (exact, prefix, word prefix, acronym, substring,
+    subsequence) and only the best limit rows are selected with a heap.
+    When fewer than TYPO_MIN_RESULTS rows match, rows whose name words are a
+    typo or two away from the query words (TokenIndex.typo_lookup()) are
+    added after them, so 'fierfox' still finds Firefox.
+
+    The candidate rows of recent queries are cached. Typing another character
+    only narrows the candidates of the query before it, since every key
+    matching 'fir' as a subsequence also matches 'fi', and backspacing finds
+    the shorter query in the cache, ranked results included. The caches are
+    dropped when the index changes, ranked results also when usage changes.
+
+    With a UsageStore, frecently launched entries get a score bonus, and the
+    empty query lists them first.
+
+    Searches run on an AppIndexSnapshot and are serialized by a lock, so a
+    search thread can use the engine while the main thread updates the index.
+
+    build_prefix_tables() precomputes the ranked results of the empty query
+    and of short prefixes in the background; while the tables match the
+    index and usage versions those keystrokes are answered without searching.
+    """
+
+    def __init__(self, index, usage=None):
+        self.index = index # The live AppIndex
+        self.usage = usage # A UsageStore, or None
+        self._snapshot = None # The AppIndexSnapshot the caches below were built for
+        self._lock = threading.Lock()
+        self._joined = ''
+        self._key_starts = []
+        self._initials = []
+        self._version = None
+        self._usage_version = None
+        self._candidate_cache = OrderedDict() # query -> rows, least recently used first
+        self._result_cache = OrderedDict() # (query, limit) -> ranked rows
+        # (index version, usage version, {query: PREFIX_TABLE_SIZE ranked rows})
+        self._prefix_tables = (None, None, {})
+        self.stats = {"cache_hits": 0, "refined": 0, "scanned": 0, "table_hits": 0, "stale_tokens": 0}
+
+    def _refresh(self, snapshot):
+        """Rebuilds the joined key string when searching a new snapshot."""
+        usage_version = self.usage.version if self.usage is not None else None
+        if self._usage_version != usage_version:
+            self._usage_version = usage_version
+            self._result_cache.clear()
+        if self._version == snapshot.version:
+            return
+        self._snapshot = snapshot
+        self._joined, self._key_starts = snapshot.joined_keys()
+        self._initials = [None] * len(snapshot) # Normalized word initials, filled on first use
+        self._version = snapshot.version
+        self._candidate_cache.clear()
+        self._result_cache.clear()
+
+    def clear_caches(self):
+        """Drops cached candidates, results and prefix tables, e.g. to time searches from scratch."""
+        with self._lock:
+            self._candidate_cache.clear()
+            self._result_cache.clear()
+            self._prefix_tables = (None, None, {})
+
+    @staticmethod
+    def _pattern(query: str):
+        """Compiles the subsequence pattern for query, matching within one key only."""
+        gap = f"[^{KEY_SEPARATOR}]*?"
+        return re.compile(gap.join(re.escape(char) for char in query))
+
+    def _cached_parent(self, query: str):
+        """Returns the cached rows of the longest cached prefix of query, or None."""
+        for length in range(len(query) - 1, 0, -1):
+            rows = self._candidate_cache.get(query[:length])
+            if rows is not None:
+                return rows
+        return None
+
+    def _candidates(self, query: str, cancelled) -> list:
+        """Returns every row whose search key contains query as a subsequence, in index order."""
+        rows = self._candidate_cache.get(query)
+        if rows is not None:
+            self._candidate_cache.move_to_end(query)
+            self.stats["cache_hits"] += 1
+            return rows
+
+        parent = self._cached_parent(query)
+        if parent is not None and len(parent) <= len(self._snapshot) * REFINE_MAX_FRACTION:
+            # Only the previous matches can match the longer query
+            search = self._pattern(query).search
+            keys = self._snapshot.search_keys
+            rows = [row for row in _checked(parent, cancelled) if search(keys[row])]
+            self.stats["refined"] += 1
+        else:
+            rows = self._scan(query, cancelled)
+            self.stats["scanned"] += 1
+
+        self._candidate_cache[query] = rows
+        if len(self._candidate_cache) > CANDIDATE_CACHE_SIZE:
+            self._candidate_cache.popitem(last=False)
+        return rows
+
+    def _scan(self, query: str, cancelled) -> list:
+        """Finds the candidate rows for query with one pass over the joined keys."""
+        joined = self._joined
+        starts = self._key_starts
+        pattern = self._pattern(query)
+        rows = []
+        pos = 0
+        while True:
+            if cancelled is not None and len(rows) % CANCEL_CHECK_INTERVAL == 0 and cancelled():
+                raise SearchCancelled()
+            match = pattern.search(joined, pos)
+            if match is None:
+                break
+            row = bisect_right(starts, match.start()) - 1
+            rows.append(row)
+            if row + 1 >= len(starts):
+                break
+            pos = starts[row + 1] # Continue with the next key
+        return rows
+
+    def score(self, query: str, row: int, field_score: float = 0) -> float:
+        """
+        Scores how well row matches the normalized query; 0 means no match.
+
+        field_score is the row's score from the token index (GenericName,
+        Keywords, ...), used when it beats the fuzzy match of the name.
+        """
+        score = max(self._name_score(query, row), field_score)
+        if score <= 0:
+            return 0
+        key = self._snapshot.search_keys[row]
+        # Prefer shorter names within a match kind ('firefox' over 'firewall-cmd')
+        score -= min(len(key), 100) * 0.5
+        source = self._snapshot.sources[row]
+        if source.endswith(".desktop"):
+            score += DESKTOP_APP_BONUS
+        if self.usage is not None:
+            score += min(self.usage.frecency(source) * FRECENCY_BONUS_PER_LAUNCH, MAX_FRECENCY_BONUS)
+        return score
+
+    def _name_score(self, query: str, row: int) -> float:
+        """Scores the fuzzy match of query against the name of row, by match kind."""
+        key = self._snapshot.search_keys[row]
+        pos = key.find(query)
+        if pos == 0:
+            score = SCORE_EXACT if len(key) == len(query) else SCORE_PREFIX
+        elif pos > 0:
+            name = self._snapshot.names[row]
+            # The original name keeps camelCase boundaries, usable while positions line up
+            text = name if len(name) == len(key) else key
+            score = SCORE_SUBSTRING - min(pos, 50)
+            while pos != -1:
+                if _is_word_start(text, pos):
+                    score = SCORE_WORD_PREFIX
+                    break
+                pos = key.find(query, pos + 1)
+        else:
+            initials = self._initials[row]
+            if initials is None:
+                name = self._snapshot.names[row]
+                initials = self._initials[row] = normalize(''.join(name[i] for i in word_starts(name)))
+            if len(query) > 1 and initials.startswith(query):
+                score = SCORE_ACRONYM
+            elif len(query) > 1 and _is_subsequence(query, initials):
+                score = SCORE_ACRONYM - 50
+            else:
+                positions = _subsequence_positions(query, key)
+                if positions is None:
+                    return 0
+                # Tighter matches score higher
+                spread = positions[-1] - positions[0] + 1 - len(query)
+                score = SCORE_SUBSEQUENCE - min(spread * 5, 150)
+        return score
+
+    def _frecent_rows(self, limit: int) -> list:
+        """Returns up to limit indexed rows ordered by frecency, most used first."""
+        if self.usage is None:
+            return []
+        scored = []
+        for source, score in self.usage.scores().items():
+            row = self._snapshot.row_of_source(source)
+            if row is not None:
+                scored.append((score, -row))
+        return [-negated_row for _, negated_row in heapq.nlargest(limit, scored)]
+
+    def search(self, query: str, limit: int, snapshot=None, cancelled=None) -> list:
+        """
+        Returns up to limit rows matching query, best match first.
+
+        Args:
+            snapshot: The AppIndexSnapshot to search; by default a snapshot of
+                      the live index is taken, which must then happen on the
+                      main thread.
+            cancelled: Optional callable polled during long loops. Once it
+                       returns True, SearchCancelled is raised.
+        """
+        if limit <= 0:
+            return []
+        query = normalize(query.strip())
+        if snapshot is None:
+            snapshot = self.index.snapshot()
+        with self._lock:
+            self._refresh(snapshot)
+            return self._search(query, limit, cancelled)
+
+    def table_rows(self, query: str, limit: int):
+        """
+        Returns the precomputed results of query if a prefix table built for
+        the live index and the current usage answers it, else None.
+
+        Call on the thread that modifies the index. Does not take the lock, so
+        it never waits for a search or table build running on another thread.
+        """
+        table_version, table_usage_version, tables = self._prefix_tables
+        usage_version = self.usage.version if self.usage is not None else None
+        if table_version != self.index.version or table_usage_version != usage_version or limit > PREFIX_TABLE_SIZE:
+            return None
+        rows = tables.get(normalize(query.strip()))
+        if rows is None:
+            return None
+        self.stats["table_hits"] += 1
+        return rows[:limit]
+
+    def _search(self, query: str, limit: int, cancelled) -> list:
+        table_version, table_usage_version, tables = self._prefix_tables
+        if table_version == self._version and table_usage_version == self._usage_version \
+                and limit <= PREFIX_TABLE_SIZE and query in tables:
+            self.stats["table_hits"] += 1
+            return tables[query][:limit]
+
+        cache_key = (query, limit)
+        results = self._result_cache.get(cache_key)
+        if results is not None:
+            self._result_cache.move_to_end(cache_key)
+            return list(results)
+
+        results = self._rank(query, limit, cancelled)
+        self._result_cache[cache_key] = results
+        if len(self._result_cache) > CANDIDATE_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+        return list(results)
+
+    def _rank(self, query: str, limit: int, cancelled, candidates: list = None) -> list:
+        """Ranks the rows matching query. candidates, if given, replaces the candidate lookup."""
+        snapshot = self._snapshot
+        if not query:
+            # Most used entries first, then the index in its natural order
+            results = self._frecent_rows(limit)
+            used = set(results)
+            row = 0
+            while len(results) < limit and row < len(snapshot):
+                if row not in used:
+                    results.append(row)
+                row += 1
+        else:
+            # Words found in GenericName, Keywords, Comment or anywhere in the name.
+            # Without a token index matching the snapshot only names are matched,
+            # the change that moved it on triggers another search anyway.
+            field_scores = self._token_rows(snapshot.tokens.lookup, query) or {}
+            rows = set(candidates if candidates is not None else self._candidates(query, cancelled))
+            rows.update(field_scores)
+            scored = (
+                (self.score(query, row, field_scores.get(row, 0)), -row)
+                for row in _checked(rows, cancelled)
+            )
+            results = [-negated_row for score, negated_row in heapq.nlargest(limit, scored) if score > 0]
+            if len(results) < min(limit, TYPO_MIN_RESULTS):
+                results += self._typo_rows(query, limit - len(results), set(results))
+        return results
+
+    def _token_rows(self, lookup, query: str):
+        """
+        Runs a lookup of the snapshot's token index and maps the entry ids to rows.
+
+        Returns:
+            dict | None: row -> score, None if the token index was modified since
+                         the snapshot was taken, as its postings then no longer
+                         describe the snapshot's rows.
+        """
+        snapshot = self._snapshot
+        matches = lookup(query) if snapshot.tokens.version == snapshot.tokens_version else None
+        # Checked again after the lookup, a splice may have started meanwhile
+        if matches is None or snapshot.tokens.version != snapshot.tokens_version:
+            self.stats["stale_tokens"] += 1
+            return None
+        rows = {}
+        for entry_id, score in matches.items():
+            row = snapshot.row_of(entry_id)
+            if row is not None:
+                rows[row] = score
+        return rows
+
+    def _typo_rows(self, query: str, limit: int, exclude: set) -> list:
+        """Ranks up to limit rows whose names match query with typos, skipping rows in exclude."""
+        matches = self._token_rows(self._snapshot.tokens.typo_lookup, query) or {}
+        scored = [(self.score(query, row, typo_score), -row)
+                  for row, typo_score in matches.items() if row not in exclude]
+        return [-negated_row for score, negated_row in heapq.nlargest(limit, scored) if score > 0]
+
+    def prefix_table_queries(self, snapshot) -> dict:
+        """
+        Returns the short queries to precompute, grouped by first character.
+
+        Every character that starts a word gets a table, and so do the most
+        common two-character word starts.
+
+        Returns:
+            dict: char -> list of two-character queries starting with it.
+        """
+        bigram_counts = {}
+        chars = set()
+        for key in snapshot.search_keys:
+            for start in word_starts(key):
+                chars.add(key[start])
+                bigram = key[start:start + 2]
+                if len(bigram) == 2 and bigram[1].isalnum():
+                    bigram_counts[bigram] = bigram_counts.get(bigram, 0) + 1
+        common = heapq.nlargest(PREFIX_TABLE_MAX_BIGRAMS, bigram_counts, key=bigram_counts.get)
+        queries = {char: [] for char in sorted(chars)}
+        for bigram in common:
+            queries.setdefault(bigram[0], []).append(bigram)
+        return queries
+
+    def build_prefix_tables(self, snapshot, cancelled=None):
+        """
+        Precomputes the top PREFIX_TABLE_SIZE results of the empty query and of
+        short prefixes for snapshot. Meant for a worker thread: the lock is only
+        held per query, so interactive searches interleave, and the build stops
+        (raising SearchCancelled) once cancelled() returns True or the index
+        moves past snapshot.
+
+        Returns:
+            int: The number of tables built.
+        """
+        def stale():
+            return snapshot.version != self.index.version or (cancelled is not None and cancelled())
+
+        def rank(query, candidates=None):
+            with self._lock:
+                if stale():
+                    raise SearchCancelled()
+                self._refresh(snapshot)
+                return self._rank(query, PREFIX_TABLE_SIZE, stale, candidates)
+
+        usage_version = self.usage.version if self.usage is not None else None
+        tables = {"": rank("")}
+        for char, bigrams in self.prefix_table_queries(snapshot).items():
+            with self._lock:
+                if stale():
+                    raise SearchCancelled()
+                self._refresh(snapshot)
+                # Candidates are scanned once per character and narrowed for its bigrams,
+                # without going through (and flushing) the interactive candidate cache
+                char_rows = self._scan(char, stale)
+            tables[char] = rank(char, char_rows)
+            keys = snapshot.search_keys
+            for bigram in bigrams:
+                search = self._pattern(bigram).search
+                tables[bigram] = rank(bigram, [row for row in char_rows if search(keys[row])])
+
+        with self._lock:
+            self._prefix_tables = (snapshot.version, usage_version, tables)
+        return len(tables)
+
+
+def _checked(rows, cancelled):
+    """Iterates rows, raising SearchCancelled once cancelled() returns True."""
+    if cancelled is None:
+        yield from rows
+        return
+    for i, row in enumerate(rows):
+        if i % CANCEL_CHECK_INTERVAL == 0 and cancelled():
+            raise SearchCancelled()
+        yield row
+
+
+def match_ranges(name: str, query: str) -> list:
+    """
+    Returns the (start, end) character ranges of name matched by query, for highlighting.
+
+    Uses the same match kinds as SearchEngine.score(), preferring a contiguous
+    match at a word start, then any contiguous match, then the word initials,
+    then a subsequence.
+    """
+    query = normalize(query.strip())
+    if not query:
+        return []
+    key, offsets = _normalize_with_offsets(name)
+
+    def to_name_ranges(positions):
+        return _positions_to_ranges(sorted({offsets[pos] for pos in positions}))
+
+    name_starts = set(word_starts(name))
+    key_starts = [
+        i for i, offset in enumerate(offsets)
+        if offset in name_starts and (i == 0 or offsets[i - 1] != offset)
+    ]
+    for start in [0] + key_starts:
+        if key.startswith(query, start):
+            return to_name_ranges(range(start, start + len(query)))
+    pos = key.find(query)
+    if pos != -1:
+        return to_name_ranges(range(pos, pos + len(query)))
+
+    initials = ''.join(key[i] for i in key_starts)
+    initial_positions = _subsequence_positions(query, initials)
+    if initial_positions is not None and len(query) > 1:
+        return to_name_ranges(key_starts[i] for i in initial_positions)
+
+    positions = _subsequence_positions(query, key)
+    return to_name_ranges(positions) if positions else []
@@ -0,0 +1,153 @@
+import logging
+import threading
+
+from gi.repository import GLib
+
+from thunderstruck.modes.launcher_mode.search import SearchCancelled
+
+# Default quiet time after a keystroke before the query is dispatched
+DEFAULT_DEBOUNCE_MS = 40
+# Indexes up to this size are searched synchronously, a thread hop would cost more
+SYNC_THRESHOLD = 2000
+
+
+class SearchScheduler:
+    """
+    Runs launcher searches off the GTK thread.
+
+    submit() only records the query. After debounce_ms without another
+    submit() it is handed, with a snapshot of the index, to a single search
+    thread. Each submit() starts a new generation: a search still running for
+    an older one is cancelled at its next check, and results are only
+    published (through on_results, on the main thread) for the latest
+    generation, so stale result sets never reach the list. Rows are published
+    together with the snapshot they were found in, since the index may have
+    been modified by the time they arrive.
+
+    Indexes with at most sync_threshold rows are searched synchronously in
+    submit(), which is faster than any thread hop. So are queries answered by
+    the engine's prefix tables (the empty query and the first keystrokes),
+    whatever the size of the index.
+    """
+
+    def __init__(self, engine, on_results, debounce_ms: int = DEFAULT_DEBOUNCE_MS,
+                 sync_threshold: int = SYNC_THRESHOLD):
+        """
+        Args:
+            engine: The SearchEngine to run queries with.
+            on_results: Callable taking the list of result rows and the AppIndexSnapshot
+                        they refer to, called on the main thread.
+            debounce_ms: Quiet time before a query is dispatched; 0 dispatches immediately.
+            sync_threshold: Largest index size searched synchronously.
+        """
+        self.engine = engine
+        self.on_results = on_results
+        self.debounce_ms = debounce_ms
+        self.sync_threshold = sync_threshold
+        self._generation = 0
+        self._published_generation = 0
+        self._query = None # (query, limit) of the latest submit()
+        self._pending = None # (generation, query, limit) waiting for the debounce
+        self._debounce_id = None
+        self._job = None # (generation, query, limit, snapshot) for the search thread
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, query: str, limit: int):
+        """Schedules a search, superseding any earlier one. Call on the main thread."""
+        self._generation += 1
+        self._query = (query, limit)
+        if len(self.engine.index) <= self.sync_threshold:
+            # Synchronous fast path for small indexes
+            self._run_now()
+            return
+        rows = self.engine.table_rows(query, limit)
+        if rows is not None:
+            # Precomputed, so neither worth a debounce nor a thread hop
+            self._deliver(rows, self.engine.index.snapshot())
+            return
+
+        self._pending = (self._generation, query, limit)
+        self._cancel_debounce()
+        if self.debounce_ms > 0:
+            self._debounce_id = GLib.timeout_add(self.debounce_ms, self._on_debounce_timeout)
+        else:
+            self._dispatch()
+
+    def flush(self):
+        """
+        Makes sure the results of the latest submit() are published, searching
+        synchronously if they are still pending or running, e.g. before the
+        selected result is launched.
+        """
+        if self._query is not None and self._published_generation != self._generation:
+            self._generation += 1
+            self._run_now()
+
+    def _run_now(self):
+        query, limit = self._query
+        snapshot = self.engine.index.snapshot()
+        self._deliver(self.engine.search(query, limit, snapshot=snapshot), snapshot)
+
+    def _deliver(self, rows, snapshot):
+        """Publishes the results of the latest submit() right away, dropping a pending dispatch."""
+        self._cancel_debounce()
+        self._pending = None
+        self._published_generation = self._generation
+        self.on_results(rows, snapshot)
+
+    def set_debounce(self, debounce_ms: int):
+        self.debounce_ms = max(0, debounce_ms)
+
+    def _cancel_debounce(self):
+        if self._debounce_id is not None:
+            GLib.source_remove(self._debounce_id)
+            self._debounce_id = None
+
+    def _on_debounce_timeout(self):
+        self._debounce_id = None
+        self._dispatch()
+        return GLib.SOURCE_REMOVE
+
+    def _dispatch(self):
+        """Hands the pending query to the search thread (main thread)."""
+        if self._pending is None:
+            return
+        generation, query, limit = self._pending
+        self._pending = None
+        # The snapshot must be taken here, on the thread that modifies the index
+        snapshot = self.engine.index.snapshot()
+        with self._condition:
+            self._job = (generation, query, limit, snapshot) # Replaces a job not started yet
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._search_worker, name="launcher-search", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _search_worker(self):
+        """Runs the latest job, forever. Older jobs are simply overwritten."""
+        while True:
+            with self._condition:
+                while self._job is None:
+                    self._condition.wait()
+                generation, query, limit, snapshot = self._job
+                self._job = None
+            if generation != self._generation:
+                continue # Superseded while waiting
+            try:
+                rows = self.engine.search(query, limit, snapshot=snapshot,
+                                          cancelled=lambda: generation != self._generation)
+            except SearchCancelled:
+                logging.debug(f"Search for '{query}' cancelled by a newer query.")
+                continue
+            except Exception as e:
+                logging.error(f"Launcher search for '{query}' failed: {e}", exc_info=True)
+                continue
+            GLib.idle_add(self._publish, generation, rows, snapshot)
+
+    def _publish(self, generation, rows, snapshot):
+        """Delivers results on the main thread unless a newer search was submitted."""
+        if generation == self._generation:
+            self._published_generation = generation
+            self.on_results(rows, snapshot)
+        return GLib.SOURCE_REMOVE
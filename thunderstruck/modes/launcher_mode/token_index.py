@@ -0,0 +1,297 @@
+import re
+from bisect import bisect_left
+
+from thunderstruck.modes.launcher_mode.search import normalize
+
+# Searchable entry fields, as bit flags stored in the posting lists
+FIELD_NAME = 1
+FIELD_GENERIC_NAME = 2
+FIELD_KEYWORDS = 4
+FIELD_COMMENT = 8
+
+# Score of a query word found in a field; a Name hit ranks like a weak
+# substring match of the name, a Comment hit below any fuzzy name match
+FIELD_WEIGHTS = {
+    FIELD_NAME: 650,
+    FIELD_GENERIC_NAME: 550,
+    FIELD_KEYWORDS: 500,
+    FIELD_COMMENT: 300,
+}
+# Bonus when a query word is a whole token rather than a prefix of one
+EXACT_TOKEN_BONUS = 40
+# Query words shorter than this only match whole tokens, not token prefixes
+MIN_PREFIX_LENGTH = 2
+# Score of a query word matching a Name token with one typo (minus the
+# penalty per further edit), below every exact or fuzzy name match
+TYPO_SCORE = 350
+TYPO_EDIT_PENALTY = 100
+# Query words and Name tokens shorter than this are never typo-matched
+MIN_TYPO_LENGTH = 4
+# Words of at least this length may be two edits away from a token, shorter ones one
+TWO_TYPOS_LENGTH = 8
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list:
+    """Splits text into normalized word tokens."""
+    return _TOKEN_RE.findall(normalize(text)) if text else []
+
+
+def entry_field_tokens(entry: dict) -> dict:
+    """
+    Returns the tokens of an entry's searchable fields. Untranslated values
+    the entry keeps next to the localized ones are indexed under the same field.
+
+    Returns:
+        dict: token -> field bit mask, for Name, GenericName, Keywords and Comment.
+    """
+    tokens = {}
+    unlocalized = entry.get("unlocalized") or {}
+    fields = (
+        (FIELD_NAME, entry.get("name")),
+        (FIELD_GENERIC_NAME, entry.get("generic_name")),
+        (FIELD_KEYWORDS, " ".join(entry.get("keywords") or ())),
+        (FIELD_COMMENT, entry.get("comment")),
+        (FIELD_NAME, unlocalized.get("name")),
+        (FIELD_GENERIC_NAME, unlocalized.get("generic_name")),
+        (FIELD_KEYWORDS, " ".join(unlocalized.get("keywords") or ())),
+    )
+    for field, text in fields:
+        for token in tokenize(text):
+            tokens[token] = tokens.get(token, 0) | field
+    return tokens
+
+
+def max_typos(word: str) -> int:
+    """Returns how many edits a query word may be away from the token it is meant to match."""
+    if len(word) < MIN_TYPO_LENGTH:
+        return 0
+    return 2 if len(word) >= TWO_TYPOS_LENGTH else 1
+
+
+def is_typo_token(token: str) -> bool:
+    """Tells whether a Name token is indexed for typo matching."""
+    return len(token) >= MIN_TYPO_LENGTH and token.isalpha()
+
+
+def single_deletes(word: str) -> list:
+    """Returns word and every string obtained by deleting one of its characters."""
+    return [word] + [word[:i] + word[i + 1:] for i in range(len(word))]
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Returns the optimal string alignment distance between a and b: insertions,
+    deletions, substitutions and transpositions of adjacent characters each
+    count as one edit. Returns limit + 1 as soon as the distance exceeds limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _field_score(mask: int) -> int:
+    """Returns the weight of the best field in a bit mask."""
+    return max(weight for field, weight in FIELD_WEIGHTS.items() if mask & field)
+
+
+class TokenIndex:
+    """
+    Inverted index from normalized word tokens to the entries containing them.
+
+    Each posting list maps an entry id to the bit mask of the fields the token
+    occurs in. Entries are identified by ids that stay stable while rows move,
+    so the index is updated per added or removed entry instead of rebuilt.
+    Query words match tokens by prefix, found by bisecting the sorted token
+    list, and the entries of a multi-word query are the intersection of the
+    words' posting lists, smallest first.
+
+    Name tokens are also indexed for typo_lookup() the symmetric-delete way
+    (as in SymSpell): each token is stored under itself and every string one
+    deletion away from it. A misspelled query word is looked up the same way,
+    so a token sharing any of those strings is at most one deletion on each
+    side away, which covers a substitution, a transposition, an insertion or
+    a deletion; candidates are then checked with edit_distance(). Lookups
+    touch a few dozen keys instead of comparing against every token.
+
+    Lookups may run on a search thread while the main thread adds and removes
+    entries: posting lists are copied before being iterated and the sorted
+    token list is replaced, never modified in place. version is bumped as an
+    add() or remove() starts, so a reader can tell whether the index changed
+    while it looked something up.
+    """
+
+    def __init__(self):
+        self.version = 0 # Bumped by every add() and remove()
+        self._postings = {} # token -> {entry id: field mask}
+        self._name_tokens = {} # Name token -> number of entries having it in their Name
+        # Token or single-deletion variant -> the Name token, or a frozenset when several share it
+        self._deletes = {}
+        # Bumped when tokens appear or disappear; the sorted token list is rebuilt lazily after that
+        self._tokens_version = 0
+        self._sorted_tokens = (None, []) # (tokens version, sorted tokens)
+
+    def add(self, entry_id: int, tokens: dict):
+        """Adds an entry with its token -> field mask dict."""
+        self.version += 1
+        for token, mask in tokens.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                self._tokens_version += 1
+            posting[entry_id] = mask
+            if mask & FIELD_NAME and is_typo_token(token):
+                count = self._name_tokens.get(token, 0)
+                self._name_tokens[token] = count + 1
+                if not count:
+                    for variant in single_deletes(token):
+                        tokens = self._deletes.get(variant)
+                        if tokens is None:
+                            self._deletes[variant] = token # Most variants belong to one token only
+                        elif isinstance(tokens, str):
+                            self._deletes[variant] = frozenset((tokens, token))
+                        else:
+                            self._deletes[variant] = tokens | {token}
+
+    def remove(self, entry_id: int, tokens: dict):
+        """Removes an entry, given the tokens it was added with."""
+        self.version += 1
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            mask = posting.pop(entry_id, None)
+            if not posting:
+                del self._postings[token]
+                self._tokens_version += 1
+            if mask is not None and mask & FIELD_NAME and token in self._name_tokens:
+                count = self._name_tokens[token] - 1
+                if count:
+                    self._name_tokens[token] = count
+                    continue
+                del self._name_tokens[token]
+                for variant in single_deletes(token):
+                    tokens = self._deletes.get(variant)
+                    if tokens == token:
+                        del self._deletes[variant]
+                    elif isinstance(tokens, frozenset):
+                        tokens = tokens - {token}
+                        self._deletes[variant] = next(iter(tokens)) if len(tokens) == 1 else tokens
+
+    def postings(self) -> list:
+        """Returns a copy of the index as (token, [(entry id, field mask), ...]) pairs."""
+        return [(token, self._posting_items(token)) for token in list(self._postings)]
+
+    # The lookups below only read through these three methods, which
+    # mapped_index.MappedTokenIndex implements over a memory-mapped file.
+
+    def _posting_items(self, token: str) -> list:
+        """Returns the (entry id, field mask) pairs of a token, empty if it is not indexed."""
+        posting = self._postings.get(token)
+        return list(posting.items()) if posting else []
+
+    def _tokens_with_prefix(self, prefix: str):
+        """Yields the indexed tokens starting with prefix, in sorted order."""
+        version, tokens = self._sorted_tokens
+        if version != self._tokens_version:
+            version = self._tokens_version
+            tokens = sorted(list(self._postings))
+            self._sorted_tokens = (version, tokens)
+        i = bisect_left(tokens, prefix)
+        while i < len(tokens) and tokens[i].startswith(prefix):
+            yield tokens[i]
+            i += 1
+
+    def _variant_tokens(self, variant: str):
+        """Returns the Name tokens stored under a single-deletion variant."""
+        tokens = self._deletes.get(variant, ())
+        return (tokens,) if isinstance(tokens, str) else tokens
+
+    def _word_matches(self, word: str) -> dict:
+        """Returns entry id -> score for one query word, over all tokens it matches."""
+        if len(word) < MIN_PREFIX_LENGTH:
+            return {entry_id: _field_score(mask) + EXACT_TOKEN_BONUS for entry_id, mask in self._posting_items(word)}
+
+        matches = {}
+        for token in self._tokens_with_prefix(word):
+            bonus = EXACT_TOKEN_BONUS if token == word else 0
+            # Empty if the token was removed since the token list was sorted
+            for entry_id, mask in self._posting_items(token):
+                score = _field_score(mask) + bonus
+                if score > matches.get(entry_id, 0):
+                    matches[entry_id] = score
+        return matches
+
+    def _typo_matches(self, word: str) -> dict:
+        """Returns entry id -> score for the entries with a Name token a few typos away from word."""
+        limit = max_typos(word)
+        distances = {}
+        for variant in single_deletes(word):
+            for token in self._variant_tokens(variant):
+                if token not in distances:
+                    distances[token] = edit_distance(word, token, limit)
+        matches = {}
+        for token, distance in distances.items():
+            if distance > limit:
+                continue
+            score = TYPO_SCORE - TYPO_EDIT_PENALTY * max(0, distance - 1)
+            for entry_id, mask in self._posting_items(token):
+                if mask & FIELD_NAME and score > matches.get(entry_id, 0):
+                    matches[entry_id] = score
+        return matches
+
+    def typo_lookup(self, query: str) -> dict:
+        """
+        Finds the entries matching every word of query when words may be
+        misspelled. Words long enough for typos (see max_typos()) match Name
+        tokens within their edit limit, shorter words match like in lookup().
+
+        Returns:
+            dict: entry id -> score of the query's weakest word, at most TYPO_SCORE;
+                  empty if no word of query is long enough for typos.
+        """
+        words = set(tokenize(query))
+        if not any(max_typos(word) for word in words):
+            return {}
+        return _intersect(self._typo_matches(word) if max_typos(word) else self._word_matches(word)
+                          for word in words)
+
+    def lookup(self, query: str) -> dict:
+        """
+        Finds the entries containing every word of query (as a token prefix).
+
+        Returns:
+            dict: entry id -> field score, the score of the query's weakest word.
+        """
+        words = tokenize(query)
+        if not words:
+            return {}
+        return _intersect(self._word_matches(word) for word in set(words))
+
+
+def _intersect(per_word) -> dict:
+    """Intersects entry id -> score dicts, smallest first, keeping the lowest score of each entry."""
+    per_word = sorted(per_word, key=len)
+    result = per_word[0]
+    for matches in per_word[1:]:
+        if not result:
+            break
+        result = {
+            entry_id: min(score, matches[entry_id])
+            for entry_id, score in result.items() if entry_id in matches
+        }
+    return result
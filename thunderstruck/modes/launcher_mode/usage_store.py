@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+USAGE_FILENAME = "launch-history.jsonl"
+# A launch counts half as much after this many seconds (one week)
+FRECENCY_HALF_LIFE = 7 * 24 * 3600
+# Rewrite the log once it holds this many more lines than there are keys
+COMPACT_SLACK = 200
+# Seconds without new launches after which the writer considers compacting
+COMPACT_IDLE_SECONDS = 5.0
+
+
+def default_usage_path() -> str:
+    """Returns the launch history location under $XDG_DATA_HOME."""
+    data_home = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(data_home, "thunderstruck", USAGE_FILENAME)
+
+
+def _decay(score: float, elapsed: float) -> float:
+    """Decays a frecency score by the time elapsed since it was last updated."""
+    if elapsed <= 0:
+        return score
+    return score * 0.5 ** (elapsed / FRECENCY_HALF_LIFE)
+
+
+class UsageStore:
+    """
+    Remembers launched launcher entries and scores them by frecency.
+
+    Every key (the entry source, i.e. a .desktop file or executable path) has a
+    score that grows by one per launch and halves every FRECENCY_HALF_LIFE, so
+    frequently and recently used entries score highest. Scores live in a dict
+    loaded once at startup, making lookups O(1).
+
+    Launches are appended to a JSON lines log by a background writer thread,
+    so record() never touches the disk. The writer rewrites the log with one
+    line per key once it has grown enough and no launches came in for a while.
+    Each line is either a launch {"k": key, "t": time} or, after compaction,
+    a snapshot {"k": key, "t": time, "s": score}.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or default_usage_path()
+        # key -> (score, time of the score)
+        self._scores = {}
+        self._log_lines = 0
+        self._loaded = False
+        # Bumped on every change so callers can drop results ranked with old scores
+        self.version = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = None
+
+    def load(self):
+        """Reads the log into memory. Safe to call from a worker thread."""
+        if self._loaded:
+            return
+        scores = {}
+        lines = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        record = json.loads(line)
+                        key = record["k"]
+                        timestamp = float(record["t"])
+                    except (ValueError, KeyError, TypeError):
+                        continue # A torn write at the end of the log, ignore it
+                    if "s" in record:
+                        scores[key] = (float(record["s"]), timestamp)
+                    else:
+                        scores[key] = self._bumped(scores.get(key), timestamp)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Could not read launch history {self.path}: {e}")
+
+        with self._lock:
+            # Launches recorded before loading finished are kept on top
+            for key, (score, timestamp) in self._scores.items():
+                previous = scores.get(key)
+                if previous is not None:
+                    score += _decay(previous[0], timestamp - previous[1])
+                scores[key] = (score, timestamp)
+            self._scores = scores
+            self._log_lines = lines
+            self._loaded = True
+            self.version += 1
+
+    @staticmethod
+    def _bumped(previous, timestamp: float) -> tuple:
+        """Returns the (score, time) after one more launch at timestamp."""
+        if previous is None:
+            return (1.0, timestamp)
+        score, last = previous
+        return (_decay(score, timestamp - last) + 1.0, timestamp)
+
+    def frecency(self, key: str, now: float = None) -> float:
+        """Returns the current frecency score of key, 0.0 if it was never launched."""
+        entry = self._scores.get(key)
+        if entry is None:
+            return 0.0
+        if now is None:
+            now = time.time()
+        return _decay(entry[0], now - entry[1])
+
+    def scores(self, now: float = None) -> dict:
+        """Returns the current frecency of every launched key."""
+        if now is None:
+            now = time.time()
+        return {key: _decay(score, now - last) for key, (score, last) in list(self._scores.items())}
+
+    def record(self, key: str):
+        """Records a launch of key. Returns immediately, the log is written in the background."""
+        timestamp = time.time()
+        with self._lock:
+            self._scores[key] = self._bumped(self._scores.get(key), timestamp)
+            self.version += 1
+            # Queued under the lock, so a compaction snapshot never races a pending launch
+            self._queue.put({"k": key, "t": timestamp})
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, name="launch-history", daemon=True)
+                self._writer.start()
+
+    def _writer_loop(self):
+        """Appends queued launches to the log, compacts it when idle and then exits."""
+        while True:
+            try:
+                record = self._queue.get(timeout=COMPACT_IDLE_SECONDS)
+            except queue.Empty:
+                self._compact_if_needed()
+                with self._lock:
+                    if self._queue.empty():
+                        self._writer = None # Started again by the next record()
+                        return
+                continue
+            records = [record]
+            while True:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._append(records)
+
+    def _append(self, records: list):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+            self._log_lines += len(records)
+        except OSError as e:
+            logging.warning(f"Could not write launch history {self.path}: {e}")
+
+    def _compact_if_needed(self):
+        """Rewrites the log with one snapshot line per key once it has grown enough."""
+        if not self._loaded:
+            return # Compacting now would drop launches that are only on disk
+        with self._lock:
+            if not self._queue.empty() or self._log_lines - len(self._scores) < COMPACT_SLACK:
+                return
+            snapshot = [{"k": key, "t": last, "s": score} for key, (score, last) in self._scores.items()]
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write("".join(json.dumps(record) + "\n" for record in snapshot))
+            os.replace(tmp_path, self.path)
+            self._log_lines = len(snapshot)
+            logging.debug(f"Compacted launch history to {len(snapshot)} entries.")
+        except OSError as e:
+            logging.warning(f"Could not compact launch history {self.path}: {e}")